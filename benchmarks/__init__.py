@@ -0,0 +1,3 @@
+"""
+Benchmarks of the tool on synthetic workloads (see __main__.py).
+"""
@@ -0,0 +1,108 @@
+"""
+Run the benchmarks, from the root of the repository:
+
+    python -m benchmarks --scale medium --output results.json
+    python -m benchmarks --baseline benchmarks/baseline.json --threshold 0.1
+
+The results are written as JSON. If a baseline is given, the results are
+compared with it, and the exit status is 1 if any benchmark got slower (or
+used more memory) beyond the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+
+from benchmarks.generators import SCALES, generate_workloads
+from benchmarks.suite import (
+    DEFAULT_THRESHOLD,
+    RESULTS_VERSION,
+    compare_results,
+    format_regressions,
+    get_benchmarks,
+    run_benchmarks,
+)
+
+
+def get_arguments(argv=None) -> argparse.Namespace:
+    """
+    Parse the command line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Run the benchmarks on synthetic workloads.')
+    parser.add_argument(
+        '--scale',
+        choices=SCALES,
+        default='small',
+        help='Size of the generated workloads. Default is small.')
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=5,
+        help='Number of timed runs of every benchmark. Default is 5.')
+    parser.add_argument(
+        '--filter',
+        dest='names_filter',
+        help='Only run the benchmarks with this text in their name \
+            (e.g. load_config, or files_section).')
+    parser.add_argument(
+        '-o', '--output',
+        dest='output_file',
+        help='Write the results to this JSON file.')
+    parser.add_argument(
+        '--baseline',
+        dest='baseline_file',
+        help='Compare the results with the results in this JSON file.')
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help='Relative slowdown (or memory increase) allowed against the \
+            baseline, e.g. 0.2 for 20%%. Default is %(default)s.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    """
+    Generate the workloads, run the benchmarks, and compare their results
+    with the baseline.
+    """
+    args = get_arguments(argv)
+    with tempfile.TemporaryDirectory(prefix='yamelinno-benchmarks-') as directory:
+        config_files = generate_workloads(directory, args.scale)
+        benchmarks = get_benchmarks(config_files, directory)
+        results = run_benchmarks(benchmarks, args.repeat, args.names_filter, log=sys.stderr)
+    report = {
+        'version': RESULTS_VERSION,
+        'scale': args.scale,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output_file:
+        with open(args.output_file, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+    if args.baseline_file and os.path.exists(args.baseline_file):
+        with open(args.baseline_file, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline.get('scale') != args.scale:
+            print(f"The baseline was run at the {baseline.get('scale')} scale, "
+                  f"not {args.scale}", file=sys.stderr)
+            sys.exit(2)
+        regressions = compare_results(results, baseline['results'], args.threshold)
+        if regressions:
+            print("Regressions:\n" + format_regressions(regressions), end='', file=sys.stderr)
+            sys.exit(1)
+        print("No regressions", file=sys.stderr)
+    elif args.baseline_file:
+        print(f"Baseline {args.baseline_file} not found", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
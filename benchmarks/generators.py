@@ -0,0 +1,167 @@
+"""
+Generators of synthetic workloads for the benchmarks. Every generator writes
+a config (and its templates) to a directory, and returns the path to the
+config file. The configs are valid for the base schema.
+"""
+import os
+
+SETUP = "setup:\n  appName: Benchmark\n  appVersion: '1.0'\n"
+CODE = "code:\n  raw: ''\n"
+
+
+def write_file(directory, name, content) -> str:
+    """
+    Write a file of a workload.
+
+    Args:
+        directory (str): The directory of the workload.
+        name (str): The name of the file.
+        content (str): The content of the file.
+
+    Returns:
+        str: The path to the file.
+    """
+    path = os.path.join(directory, name)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(content)
+    return path
+
+
+def format_file_entry(index) -> str:
+    """
+    Format an entry of the files section.
+
+    Args:
+        index (int): The index of the entry, used in its source.
+
+    Returns:
+        str: The entry, as a YAML list item.
+    """
+    return (
+        f"  - source: 'bin\\file{index}.dll'\n"
+        "    destDir: '{app}\\bin'\n"
+        "    flags:\n      - ignoreversion\n")
+
+
+def generate_files_section(directory, entries) -> str:
+    """
+    Generate a config with a big files section.
+
+    Args:
+        directory (str): The directory to write the workload to.
+        entries (int): The number of entries of the files section.
+
+    Returns:
+        str: The path to the config file.
+    """
+    return write_file(directory, 'files.yml', SETUP + CODE + "files:\n" + ''.join(
+        format_file_entry(index) for index in range(entries)))
+
+
+def generate_deep_templates(directory, depth) -> str:
+    """
+    Generate a chain of templates, every one including the next one.
+
+    Args:
+        directory (str): The directory to write the workload to.
+        depth (int): The number of templates in the chain.
+
+    Returns:
+        str: The path to the config file.
+    """
+    for level in range(depth):
+        children = f"templates:\n  - deep{level + 1}.yml\n" if level + 1 < depth else ''
+        write_file(directory, f'deep{level}.yml',
+                   children + "files:\n" + format_file_entry(level))
+    return write_file(directory, 'deep.yml', SETUP + CODE + "templates:\n  - deep0.yml\n")
+
+
+def generate_wide_templates(directory, width) -> str:
+    """
+    Generate a config including many different templates.
+
+    Args:
+        directory (str): The directory to write the workload to.
+        width (int): The number of templates.
+
+    Returns:
+        str: The path to the config file.
+    """
+    for index in range(width):
+        write_file(directory, f'wide{index}.yml', "files:\n" + format_file_entry(index))
+    return write_file(directory, 'wide.yml', SETUP + CODE + "templates:\n" + ''.join(
+        f"  - wide{index}.yml\n" for index in range(width)))
+
+
+def generate_many_inputs(directory, inputs, instances=100) -> str:
+    """
+    Generate a template with many inputs, instantiated many times.
+
+    Args:
+        directory (str): The directory to write the workload to.
+        inputs (int): The number of inputs of the template.
+        instances (int): The number of times the template is instantiated.
+
+    Returns:
+        str: The path to the config file.
+    """
+    write_file(directory, 'inputs-template.yml', "files:\n" + ''.join(
+        f"  - source: '!input{index}'\n    destDir: '{{app}}\\!input{index}'\n"
+        for index in range(inputs)))
+    input_sets = ''.join(
+        "      - " + "\n        ".join(
+            f"input{index}: 'value{instance}_{index}'" for index in range(inputs)) + "\n"
+        for instance in range(instances))
+    return write_file(
+        directory, 'inputs.yml',
+        SETUP + CODE + "templates:\n  - path: inputs-template.yml\n    foreach:\n" + input_sets)
+
+
+def generate_large_code(directory, size) -> str:
+    """
+    Generate a config with a big [Code] section, kept in a raw file.
+
+    Args:
+        directory (str): The directory to write the workload to.
+        size (int): The approximate size of the raw file, in bytes.
+
+    Returns:
+        str: The path to the config file.
+    """
+    line = "  Log('A line of the code section, to make it big.');\n"
+    procedures = []
+    for index in range(max(1, size // (len(line) * 10))):
+        procedures.append(f"procedure Procedure{index};\nbegin\n{line * 8}end;\n")
+    write_file(directory, 'code.pas', ''.join(procedures))
+    return write_file(directory, 'code.yml', SETUP + "code:\n  raw_file: code.pas\n")
+
+
+# The workloads, with their size at every scale
+WORKLOADS = {
+    'files_section': (generate_files_section, {'small': 1000, 'medium': 20000, 'large': 200000}),
+    'deep_templates': (generate_deep_templates, {'small': 20, 'medium': 100, 'large': 200}),
+    'wide_templates': (generate_wide_templates, {'small': 50, 'medium': 500, 'large': 2000}),
+    'many_inputs': (generate_many_inputs, {'small': 20, 'medium': 100, 'large': 400}),
+    'large_code': (generate_large_code, {
+        'small': 100_000, 'medium': 5_000_000, 'large': 50_000_000}),
+}
+SCALES = ('small', 'medium', 'large')
+
+
+def generate_workloads(directory, scale='small') -> dict:
+    """
+    Generate every workload, each one in its own directory.
+
+    Args:
+        directory (str): The directory to write the workloads to.
+        scale (str): The size of the workloads (small, medium or large).
+
+    Returns:
+        dict: The path to the config file of every workload.
+    """
+    config_files = {}
+    for name, (generator, sizes) in WORKLOADS.items():
+        workload_directory = os.path.join(directory, name)
+        os.makedirs(workload_directory, exist_ok=True)
+        config_files[name] = generator(workload_directory, sizes[scale])
+    return config_files
@@ -0,0 +1,211 @@
+"""
+The benchmarks: every one of them times a step of the tool (loading,
+merging, validating, rendering, or the whole CLI) on a synthetic workload,
+and measures the peak memory it allocates. The results are compared with a
+baseline to find regressions.
+"""
+import functools
+import io
+import os
+import statistics
+import time
+import tracemalloc
+
+from src import packs, placeholders, rendering
+from src.entries import EntryTable
+from src.rendering import load_schema, render
+from src.templates import deep_merge_dicts, load_config
+from src.validation import validate_config
+from yamelinno import main
+
+SCHEMA_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'schemas', 'base-schema.yml')
+# A benchmark is slower (or uses more memory) than the baseline if the ratio
+# goes beyond 1 + threshold
+DEFAULT_THRESHOLD = 0.2
+# Slowdowns smaller than this (in seconds) are ignored, as timer noise
+MIN_SECONDS_DELTA = 0.001
+RESULTS_VERSION = 1
+
+
+def clear_caches() -> None:
+    """
+    Drop the parsed templates, packs and schemas, so every run of a
+    benchmark starts cold, as the CLI does.
+    """
+    for cache in (packs._PACKS, placeholders._PARSED_TEMPLATES, rendering._SCHEMAS):  # pylint: disable=protected-access
+        cache.clear()
+
+
+def get_benchmarks(config_files, output_directory) -> dict:
+    """
+    Get the benchmarks for the generated workloads.
+
+    Args:
+        config_files (dict): The path to the config file of every workload.
+        output_directory (str): The directory to write the rendered scripts to.
+
+    Returns:
+        dict: The setup function of every benchmark, by name. A setup
+            function prepares the inputs of a run, and returns the function
+            to measure.
+    """
+    schema = load_schema(SCHEMA_FILE)
+    loaded_configs = {}
+
+    def get_loaded_config(workload):
+        if workload not in loaded_configs:
+            loaded_configs[workload] = load_config(config_files[workload], compact=True)
+        return loaded_configs[workload]
+
+    def setup_load(config_file):
+        return lambda: load_config(config_file, compact=True)
+
+    def setup_render(workload):
+        config = get_loaded_config(workload)
+        return lambda: render(config, schema)
+
+    def setup_main(config_file, output_file):
+        return lambda: main(
+            [config_file, '-o', output_file, '-s', SCHEMA_FILE, '--result-cache', ''])
+
+    def setup_validate():
+        config = get_loaded_config('files_section')
+        return lambda: validate_config(config, schema)
+
+    def setup_merge():
+        files = get_loaded_config('files_section')['files']
+        source = {'files': EntryTable(files), 'setup': {'appName': 'Merged'}}
+        destination = {'files': EntryTable(files), 'setup': {'appVersion': '1.0'}}
+        return lambda: deep_merge_dicts(source, destination)
+
+    benchmarks = {}
+    for workload, config_file in config_files.items():
+        output_file = os.path.join(output_directory, f'{workload}.iss')
+        benchmarks[f'load_config.{workload}'] = functools.partial(setup_load, config_file)
+        benchmarks[f'render.{workload}'] = functools.partial(setup_render, workload)
+        benchmarks[f'main.{workload}'] = functools.partial(setup_main, config_file, output_file)
+    benchmarks['validate_config.files_section'] = setup_validate
+    benchmarks['deep_merge_dicts.files_section'] = setup_merge
+    return benchmarks
+
+
+def measure(setup, repeat) -> dict:
+    """
+    Run a benchmark: time it, and measure its peak memory in another run
+    (tracemalloc slows the code down, so it's not enabled while timing).
+
+    Args:
+        setup (callable): The setup function of the benchmark.
+        repeat (int): The number of timed runs.
+
+    Returns:
+        dict: The median, minimum and maximum times (in seconds), and the
+            peak memory allocated (in bytes).
+    """
+    times = []
+    for _ in range(repeat):
+        clear_caches()
+        function = setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    clear_caches()
+    function = setup()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'seconds': statistics.median(times),
+        'min_seconds': min(times),
+        'max_seconds': max(times),
+        'peak_bytes': peak,
+        'repeat': repeat,
+    }
+
+
+def run_benchmarks(benchmarks, repeat=5, names_filter=None, log=None) -> dict:
+    """
+    Run the benchmarks.
+
+    Args:
+        benchmarks (dict): The setup function of every benchmark.
+        repeat (int): The number of timed runs of every benchmark.
+        names_filter (str): Only run the benchmarks with this text in their
+            name. Default is None (run every benchmark).
+        log (file): A stream to report the progress to. Default is None.
+
+    Returns:
+        dict: The result of every benchmark, by name.
+    """
+    results = {}
+    for name, setup in benchmarks.items():
+        if names_filter and names_filter not in name:
+            continue
+        results[name] = measure(setup, repeat)
+        if log is not None:
+            print(format_result(name, results[name]), file=log)
+    return results
+
+
+def format_result(name, result) -> str:
+    """
+    Format the result of a benchmark for the report.
+
+    Args:
+        name (str): The name of the benchmark.
+        result (dict): The result.
+
+    Returns:
+        str: The formatted result.
+    """
+    return (f"{name:<40} {result['seconds'] * 1000:>10.2f} ms "
+            f"{result['peak_bytes'] / (1024 * 1024):>10.2f} MiB")
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD) -> list:
+    """
+    Compare the results with a baseline. The benchmarks which are not in
+    both are ignored, as are slowdowns below MIN_SECONDS_DELTA.
+
+    Args:
+        results (dict): The results, by name.
+        baseline (dict): The results of the baseline, by name.
+        threshold (float): The relative slowdown (or memory increase)
+            allowed, e.g. 0.2 for 20%.
+
+    Returns:
+        list: The regressions, as (name, metric, baseline value, value)
+            tuples.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in ('seconds', 'peak_bytes'):
+            baseline_value = baseline[name][metric]
+            if metric == 'seconds' and result[metric] - baseline_value < MIN_SECONDS_DELTA:
+                continue
+            if baseline_value and result[metric] > baseline_value * (1 + threshold):
+                regressions.append((name, metric, baseline_value, result[metric]))
+    return regressions
+
+
+def format_regressions(regressions) -> str:
+    """
+    Format the regressions found for the report.
+
+    Args:
+        regressions (list): The regressions, as returned by compare_results.
+
+    Returns:
+        str: The formatted regressions, one per line.
+    """
+    output = io.StringIO()
+    for name, metric, baseline_value, value in regressions:
+        print(f"{name} {metric}: {baseline_value:.6g} -> {value:.6g} "
+              f"(+{(value / baseline_value - 1) * 100:.1f}%)", file=output)
+    return output.getvalue()
@@ -0,0 +1,91 @@
+"""
+This module contains the in-memory cache used for the files parsed by the
+tool (templates, template packs and schemas). Every cached value is stored
+along with the identifier of the version of the file it was parsed from
+(its modification time, size and inode), so a file is parsed again as soon
+as it changes. The caches are bounded: the least recently used files are
+dropped, which matters for long-running processes such as `yamelinno serve`.
+"""
+from collections import OrderedDict
+import os
+import threading
+
+from src.stats import count_cache
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+def get_file_id(path) -> tuple:
+    """
+    Get an identifier of the current version of a file.
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        tuple: The modification time, size and inode of the file.
+    """
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class FileCache:
+    """
+    A bounded LRU cache of values parsed from files.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, name=None):
+        # The name of the cache, in the statistics of a run (unnamed caches
+        # are not counted)
+        self.name = name
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, file_id):
+        """
+        Get the value parsed from a file, if the file did not change.
+
+        Args:
+            path (str): The absolute path to the file.
+            file_id (tuple): The identifier of the current version of the file.
+
+        Returns:
+            The cached value, or None if it's not cached or the file changed.
+        """
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is None or cached[0] != file_id:
+                if self.name is not None:
+                    count_cache(self.name, False)
+                return None
+            self._entries.move_to_end(path)
+        if self.name is not None:
+            count_cache(self.name, True)
+        return cached[1]
+
+    def put(self, path, file_id, value) -> None:
+        """
+        Cache the value parsed from a file, dropping the least recently
+        used values beyond the size limit.
+
+        Args:
+            path (str): The absolute path to the file.
+            file_id (tuple): The identifier of the version that was parsed.
+            value: The parsed value.
+        """
+        with self._lock:
+            self._entries[path] = (file_id, value)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Drop every cached value.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
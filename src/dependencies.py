@@ -0,0 +1,103 @@
+"""
+This module is used to record the files read while loading a config (the
+templates, raw files and schema found by search_input_file), and to write
+them as a Make-style dependency file, which Make and Ninja use to know when
+the script has to be generated again:
+
+    setup.iss: setup.yml templates/base-template.yml \\
+      templates/base-code.pas schemas/base-schema.yml
+"""
+from contextlib import contextmanager
+import threading
+
+from src.packs import split_pack_path
+
+# The recorders of every thread, so a render only records the files it reads
+_LOCAL = threading.local()
+
+
+def _get_recorders() -> list:
+    recorders = getattr(_LOCAL, 'recorders', None)
+    if recorders is None:
+        recorders = _LOCAL.recorders = []
+    return recorders
+
+
+@contextmanager
+def record_dependencies():
+    """
+    Record the input files found by the current thread while the context
+    is active.
+
+    Yields:
+        list: The paths of the input files, in the order they were found.
+            It is filled as the files are found.
+    """
+    dependencies: list = []
+    recorders = _get_recorders()
+    recorders.append(dependencies)
+    try:
+        yield dependencies
+    finally:
+        recorders.remove(dependencies)
+
+
+def add_dependency(path) -> None:
+    """
+    Record an input file, if dependencies are being recorded. For a file
+    inside a template pack, the pack itself is recorded.
+
+    Args:
+        path (str): The path to the input file.
+    """
+    recorders = _get_recorders()
+    if not recorders:
+        return
+    pack_path = split_pack_path(path)
+    if pack_path is not None:
+        path = pack_path[0]
+    for dependencies in recorders:
+        dependencies.append(path)
+
+
+def escape_path(path) -> str:
+    """
+    Escape a path for a dependency file.
+
+    Args:
+        path (str): The path.
+
+    Returns:
+        str: The escaped path.
+    """
+    return path.replace('\\', '/').replace('$', '$$').replace('#', '\\#').replace(' ', '\\ ')
+
+
+def format_depfile(target, dependencies) -> str:
+    """
+    Format a Make-style dependency file.
+
+    Args:
+        target (str): The generated file.
+        dependencies (list): The files it depends on. Duplicates are removed.
+
+    Returns:
+        str: The content of the dependency file.
+    """
+    unique_dependencies = dict.fromkeys(escape_path(path) for path in dependencies)
+    lines = [f"{escape_path(target)}:"]
+    lines.extend(f" {path}" for path in unique_dependencies)
+    return " \\\n".join(lines) + "\n"
+
+
+def write_depfile(depfile, target, dependencies) -> None:
+    """
+    Write a Make-style dependency file.
+
+    Args:
+        depfile (str): The path to the dependency file.
+        target (str): The generated file.
+        dependencies (list): The files it depends on.
+    """
+    with open(depfile, 'w', encoding='utf-8') as file:
+        file.write(format_depfile(target, dependencies))
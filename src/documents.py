@@ -0,0 +1,191 @@
+"""
+This module is used to read configs from the standard input (given as `-`
+in the command line), and to render streams of YAML documents, in which
+every document is the config of a different installer:
+
+    setup:
+      appName: App
+    ---
+    setup:
+      appName: Other app
+
+The documents are parsed and rendered one at a time, so the memory used
+doesn't depend on the length of the stream. Every document is written to
+its own output file, named after a pattern with the index of the document
+(e.g. `setup-{index}.iss`) and, optionally, the value of a field of the
+document (e.g. `{name}.iss` with `--name-field setup.appName`).
+"""
+from contextlib import nullcontext
+import os
+import sys
+
+import yaml
+
+from src.reading import open_mapped
+from src.rendering import open_output, render_to_stream
+from src.stats import YAML_DOCUMENTS, CountingWriter, count, count_output_files, count_sections
+from src.templates import resolve_config
+from src.validation import validate_config
+
+STDIN = '-'
+# The name given to the config read from the standard input. Its templates
+# and raw files are searched from the current directory.
+STDIN_CONFIG_NAME = '<stdin>'
+
+
+def get_config_path(input_file) -> str:
+    """
+    Get the path the templates of a config are searched from.
+
+    Args:
+        input_file (str): The path to the input file, or '-' for the
+            standard input.
+
+    Returns:
+        str: The path to the input file, or a path in the current directory
+            for the standard input.
+    """
+    if input_file == STDIN:
+        return os.path.join(os.getcwd(), STDIN_CONFIG_NAME)
+    return input_file
+
+
+def open_input(input_file):
+    """
+    Open an input file, or the standard input, for the YAML reader.
+
+    Args:
+        input_file (str): The path to the input file, or '-' for the
+            standard input.
+
+    Returns:
+        A context manager giving the stream to read the YAML documents from.
+        The standard input is left open when it exits.
+    """
+    if input_file == STDIN:
+        return nullcontext(getattr(sys.stdin, 'buffer', sys.stdin))
+    return open_mapped(input_file)
+
+
+def load_stdin_config(compact=False) -> dict:
+    """
+    Load a config from the standard input, merging its templates.
+
+    Args:
+        compact (bool): Whether to store the lists of entries as EntryTables.
+            Default is False.
+
+    Returns:
+        dict: The merged config.
+    """
+    with open_input(STDIN) as stream:
+        config = yaml.load(stream, Loader=yaml.FullLoader)
+    count(YAML_DOCUMENTS)
+    return resolve_config(config, get_config_path(STDIN), compact)
+
+
+def load_documents(input_file):
+    """
+    Parse the documents of a YAML stream, one at a time. Empty documents
+    are skipped.
+
+    Args:
+        input_file (str): The path to the input file, or '-' for the
+            standard input.
+
+    Yields:
+        dict: The documents.
+
+    Raises:
+        ValueError: If a document is not a mapping.
+    """
+    with open_input(input_file) as stream:
+        for index, document in enumerate(yaml.load_all(stream, Loader=yaml.FullLoader)):
+            count(YAML_DOCUMENTS)
+            if document is None:
+                continue
+            if not isinstance(document, dict):
+                raise ValueError(f"Document {index} of {input_file} is not a mapping")
+            yield document
+
+
+def get_field(document, field):
+    """
+    Get the value of a field of a document.
+
+    Args:
+        document (dict): The document.
+        field (str): The path to the field, with its keys separated by dots
+            (e.g. 'setup.appName').
+
+    Returns:
+        The value of the field.
+
+    Raises:
+        KeyError: If the field is not in the document.
+    """
+    value = document
+    for key in field.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            raise KeyError(f"Field '{field}' not found in the document")
+        value = value[key]
+    return value
+
+
+def get_document_output(output_pattern, index, name=None) -> str:
+    """
+    Get the path to the output file of a document.
+
+    Args:
+        output_pattern (str): The pattern of the output files, with the
+            {index} and {name} fields (e.g. 'setup-{index:03}.iss').
+        index (int): The index of the document in the stream.
+        name (str): The value of the name field of the document.
+
+    Returns:
+        str: The path to the output file.
+    """
+    return output_pattern.format(index=index, name=name)
+
+
+def render_documents(input_file, schema, output_pattern, name_field=None) -> list:
+    """
+    Render every document of a YAML stream to its own output file, one
+    document at a time. A name field which is a top-level key of the
+    documents (and not a section of the schema) is removed before rendering.
+
+    Args:
+        input_file (str): The path to the input file, or '-' for the
+            standard input.
+        schema (Schema): The schema.
+        output_pattern (str): The pattern of the output files (see
+            get_document_output), or 'stdout' to write every script to
+            the standard output, one after another.
+        name_field (str): The path to the field giving the {name} of a
+            document. Default is None.
+
+    Returns:
+        list: The paths to the output files written.
+    """
+    config_path = get_config_path(input_file)
+    output_files = []
+    for index, document in enumerate(load_documents(input_file)):
+        name = None
+        if name_field is not None:
+            name = get_field(document, name_field)
+            if name_field in document and name_field not in schema:
+                del document[name_field]
+        config = resolve_config(document, config_path, compact=True)
+        validate_config(config, schema)
+        count_sections(config)
+        if output_pattern == 'stdout':
+            stdout = CountingWriter(sys.stdout)
+            render_to_stream(config, schema, stdout)
+            stdout.write("\n")
+            continue
+        output_file = get_document_output(output_pattern, index, name)
+        with open_output(output_file) as file:
+            render_to_stream(config, schema, file)
+        count_output_files([output_file])
+        output_files.append(output_file)
+    return output_files
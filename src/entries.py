@@ -0,0 +1,179 @@
+"""
+This module contains a compact representation for the lists of entries
+found in sections such as 'files' or 'registry'. Generated configs can hold
+hundreds of thousands of entries, and keeping each one as a dictionary repeats
+the same keys and values (e.g. '{app}' or the same flags) over and over.
+
+An EntryTable stores every entry as a row: a tuple whose first item is the
+entry's shape (the tuple of its keys, in order) followed by its values. Shapes
+and values are pooled, so repeated strings and flag lists are stored once,
+and lists are kept as shared tuples. Iterating over the table still yields
+plain dictionaries, built one at a time, while validation and rendering can
+walk the rows directly and check the keys once per shape.
+"""
+from collections.abc import Sequence
+
+
+class EntryTable(Sequence):
+    """
+    A compact, append-only list of entries.
+    """
+    __slots__ = ('_rows', '_shapes', '_pool')
+
+    def __init__(self, entries=()):
+        self._rows: list = []
+        self._shapes: dict = {}
+        self._pool: dict = {}
+        self.extend(entries)
+
+    def _pooled(self, value):
+        """
+        Get the pooled copy of a value. Lists are converted to tuples,
+        so they can be pooled (and shared) as well.
+
+        Args:
+            value: The value to pool.
+
+        Returns:
+            The pooled value.
+        """
+        if isinstance(value, list):
+            value = tuple(self._pooled(item) for item in value)
+        elif not isinstance(value, (str, tuple)):
+            return value
+        try:
+            return self._pool.setdefault(value, value)
+        except TypeError:
+            # Tuples holding unhashable items (e.g. dictionaries) are not pooled
+            return value
+
+    def append(self, entry) -> None:
+        """
+        Append an entry to the table.
+
+        Args:
+            entry (dict): The entry to append.
+
+        Raises:
+            TypeError: If the entry is not a dictionary.
+        """
+        if not isinstance(entry, dict):
+            raise TypeError(f"Entries must be dictionaries. Got: {entry}")
+        self._append_row(tuple(entry), entry.values())
+
+    def _append_row(self, shape, values) -> None:
+        """
+        Append a row, pooling its shape and values.
+
+        Args:
+            shape (tuple): The keys of the entry.
+            values (iterable): The values of the entry, in the same order.
+        """
+        shape = self._shapes.setdefault(shape, shape)
+        self._rows.append((shape,) + tuple(self._pooled(value) for value in values))
+
+    def extend(self, entries) -> None:
+        """
+        Append several entries to the table.
+
+        Args:
+            entries (list | EntryTable): The entries to append.
+        """
+        if isinstance(entries, EntryTable):
+            for shape, values in entries.rows():
+                self._append_row(shape, values)
+            return
+        for entry in entries:
+            self.append(entry)
+
+    def rows(self):
+        """
+        Iterate over the rows of the table, without building dictionaries.
+        Lists are returned as tuples.
+
+        Yields:
+            tuple: A (shape, values) tuple for each entry.
+        """
+        for row in self._rows:
+            yield row[0], row[1:]
+
+    @property
+    def shapes(self) -> tuple:
+        """
+        Get the distinct shapes (key tuples) found in the table.
+
+        Returns:
+            tuple: The shapes, in order of first appearance.
+        """
+        return tuple(self._shapes)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        row = self._rows[index]
+        return make_entry(row[0], row[1:])
+
+    def __iter__(self):
+        for shape, values in self.rows():
+            yield make_entry(shape, values)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (EntryTable, list)):
+            return len(self) == len(other) and all(
+                entry == other_entry for entry, other_entry in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"EntryTable({list(self)!r})"
+
+
+def make_entry(shape, values) -> dict:
+    """
+    Build the dictionary for a row of an EntryTable, converting the
+    pooled tuples back into lists.
+
+    Args:
+        shape (tuple): The keys of the entry.
+        values (tuple): The values of the entry.
+
+    Returns:
+        dict: The entry.
+    """
+    return dict(zip(shape, [
+        list(value) if isinstance(value, tuple) else value for value in values
+    ]))
+
+
+def is_entry_list(value) -> bool:
+    """
+    Check if a value is a list of entries, i.e. a non-empty list of dictionaries.
+
+    Args:
+        value: The value to check.
+
+    Returns:
+        bool: True if the value can be stored as an EntryTable.
+    """
+    return isinstance(value, list) and len(value) > 0 and all(
+        isinstance(item, dict) for item in value)
+
+
+def compact_entries(config) -> dict:
+    """
+    Replace every top-level list of entries in a config by an EntryTable.
+
+    Args:
+        config (dict): The config to compact. It is modified in place.
+
+    Returns:
+        dict: The compacted config.
+    """
+    for key, value in config.items():
+        if is_entry_list(value):
+            config[key] = EntryTable(value)
+    return config
@@ -0,0 +1,407 @@
+"""
+This module is used to expand the glob entries of the 'files' section.
+Instead of listing every file by hand, an entry can use 'sourceGlob':
+
+    files:
+      - sourceGlob: 'build/**/*.dll'
+        exclude:
+          - '**/test_*.dll'
+        destDir: '{app}'
+        flags:
+          - ignoreversion
+
+The directory tree is scanned with os.scandir, listing the directories of
+every level concurrently, and the entries are generated one directory at a
+time, so they can be streamed into the rendering. Every file found produces
+an entry, keeping its relative path in the 'destDir'. With 'perDirectory',
+a directory whose files all match produces a single wildcard entry instead.
+The directory listings can be cached on disk ('listingCache'), keyed by the
+modification time of every directory. Symlinks to directories are not
+followed (as by os.walk), so a symlink loop can't make the scan recurse
+forever. Relative globs are scanned from the directory of the config (or
+template) they are written in, which is kept in the 'baseDir' of the entry
+when the config is resolved, and the sources generated are the paths the
+files were found at, joined to that directory. This way, ISCC, the manifest
+and the preflight checks resolve them to the same files, wherever the
+script is written and the tool is run from.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import re
+
+# The only section whose entries can be glob entries
+GLOB_SECTION = 'files'
+# The keys used to describe a glob entry, which are not rendered
+GLOB_KEYS = ('sourceGlob', 'exclude', 'perDirectory', 'listingCache', 'baseDir')
+# The types of the glob keys written in the configs (lists are stored as
+# tuples in an EntryTable)
+GLOB_KEY_TYPES = {
+    'sourceGlob': str,
+    'exclude': (list, tuple),
+    'perDirectory': bool,
+    'listingCache': str,
+}
+WILDCARD_CHARS = ('*', '?', '[')
+
+
+def glob_to_regex(pattern) -> re.Pattern:
+    """
+    Translate a glob pattern to a regular expression. '*' and '?' do not
+    match path separators, while '**' matches any number of directories.
+
+    Args:
+        pattern (str): The glob pattern, using '/' as separator.
+
+    Returns:
+        re.Pattern: The compiled regular expression.
+    """
+    regex = []
+    index = 0
+    while index < len(pattern):
+        if pattern.startswith('**/', index):
+            regex.append('(?:.*/)?')
+            index += 3
+        elif pattern.startswith('**', index):
+            regex.append('.*')
+            index += 2
+        elif pattern[index] == '*':
+            regex.append('[^/]*')
+            index += 1
+        elif pattern[index] == '?':
+            regex.append('[^/]')
+            index += 1
+        else:
+            regex.append(re.escape(pattern[index]))
+            index += 1
+    return re.compile(''.join(regex) + r'\Z')
+
+
+def escape_brackets(pattern) -> str:
+    """
+    Escape the brackets of an InnoSetup wildcard, whose only wildcards are
+    '*' and '?', so fnmatch and glob match them literally.
+
+    Args:
+        pattern (str): The wildcard.
+
+    Returns:
+        str: The wildcard, with every '[' written as '[[]'.
+    """
+    return pattern.replace('[', '[[]')
+
+
+def split_glob(source_glob) -> tuple:
+    """
+    Split a glob into the directory to scan (its leading components without
+    wildcards) and the pattern the paths relative to it must match.
+
+    Args:
+        source_glob (str): The glob, using '/' or '\\' as separator.
+
+    Returns:
+        tuple: The root directory and the relative pattern.
+    """
+    components = source_glob.replace('\\', '/').split('/')
+    root_components = []
+    for component in components[:-1]:
+        if any(char in component for char in WILDCARD_CHARS):
+            break
+        root_components.append(component)
+    pattern = '/'.join(components[len(root_components):])
+    root = '/'.join(root_components) or '.'
+    return root, pattern
+
+
+class DirectoryScanner:
+    """
+    Scans directory trees, keeping the listings in an optional on-disk cache.
+    """
+
+    def __init__(self, cache_file=None, max_workers=None):
+        self.cache_file = cache_file
+        self.max_workers = max_workers
+        self.listings: dict = {}
+        self.modified = False
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file, 'r', encoding='utf-8') as file:
+                self.listings = json.load(file)
+
+    def list_directory(self, directory) -> tuple:
+        """
+        List a directory, using the cached listing if the directory
+        did not change since it was cached.
+
+        Args:
+            directory (str): The directory to list.
+
+        Returns:
+            tuple: The sorted lists of file names and subdirectory names.
+        """
+        mtime = os.stat(directory).st_mtime_ns
+        key = os.path.abspath(directory)
+        cached = self.listings.get(key)
+        if cached is not None and cached['mtime'] == mtime:
+            return cached['files'], cached['dirs']
+        files, dirs = [], []
+        with os.scandir(directory) as scanned_entries:
+            for scanned_entry in scanned_entries:
+                if scanned_entry.is_dir(follow_symlinks=False):
+                    dirs.append(scanned_entry.name)
+                elif not scanned_entry.is_dir():
+                    # Symlinks to directories are skipped
+                    files.append(scanned_entry.name)
+                    self.found_file(scanned_entry)
+        files.sort()
+        dirs.sort()
+        self.listings[key] = {'mtime': mtime, 'files': files, 'dirs': dirs}
+        self.modified = True
+        return files, dirs
+
+    def found_file(self, scanned_entry) -> None:
+        """
+        Called for every file listed (but not for the cached listings).
+        It does nothing, it's meant to be overridden.
+
+        Args:
+            scanned_entry (os.DirEntry): The file.
+        """
+
+    def scan(self, root, excluded=None):
+        """
+        Walk a directory tree, one level at a time, listing the directories
+        of every level concurrently.
+
+        Args:
+            root (str): The directory to scan.
+            excluded (callable): Called with the relative path of every
+                subdirectory, returns True if it must be skipped.
+
+        Yields:
+            tuple: The relative path of every directory ('' for the root),
+                with its file names.
+        """
+        level = ['']
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while level:
+                listings = executor.map(
+                    self.list_directory,
+                    [os.path.join(root, relative_dir) for relative_dir in level])
+                next_level = []
+                for relative_dir, (files, dirs) in zip(level, listings):
+                    yield relative_dir, files
+                    for name in dirs:
+                        relative_subdir = f"{relative_dir}/{name}" if relative_dir else name
+                        if excluded is None or not excluded(relative_subdir):
+                            next_level.append(relative_subdir)
+                level = next_level
+        self.save()
+
+    def save(self) -> None:
+        """
+        Write the listings to the cache file, if there is one and they changed.
+        """
+        if not self.cache_file or not self.modified:
+            return
+        temporary_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        with open(temporary_file, 'w', encoding='utf-8') as file:
+            json.dump(self.listings, file)
+        os.replace(temporary_file, self.cache_file)
+        self.modified = False
+
+
+def is_glob_entry(entry) -> bool:
+    """
+    Check if an entry is a glob entry.
+
+    Args:
+        entry (dict): The entry to check.
+
+    Returns:
+        bool: True if the entry uses 'sourceGlob'.
+    """
+    return 'sourceGlob' in entry
+
+
+def allows_glob_entries(section_definition) -> bool:
+    """
+    Check if the entries of a section can be glob entries.
+
+    Args:
+        section_definition (SectionDef): The section definition.
+
+    Returns:
+        bool: True for the 'files' section.
+    """
+    return section_definition.name == GLOB_SECTION
+
+
+def resolve_glob_entries(config, config_file) -> None:
+    """
+    Set the directory the glob entries of a config are scanned from (the
+    directory of the config file), unless it's already set.
+
+    Args:
+        config (dict): The loaded config. It is modified in place.
+        config_file (str): The path to the config file.
+    """
+    section = config.get(GLOB_SECTION) if isinstance(config, dict) else None
+    if not isinstance(section, list):
+        return
+    base_dir = os.path.dirname(os.path.abspath(config_file))
+    for entry in section:
+        if isinstance(entry, dict) and is_glob_entry(entry):
+            entry.setdefault('baseDir', base_dir)
+
+
+def validate_glob_keys(entry) -> None:
+    """
+    Validate the types of the glob keys of a glob entry.
+
+    Args:
+        entry (dict): The glob entry.
+
+    Raises:
+        TypeError: If a glob key is of the wrong type, or an 'exclude'
+            pattern is not a string.
+    """
+    for key, key_type in GLOB_KEY_TYPES.items():
+        if key in entry and not isinstance(entry[key], key_type):
+            raise TypeError(f"Key '{key}' must be of type {key_type}")
+    if not all(isinstance(pattern, str) for pattern in entry.get('exclude', ())):
+        raise TypeError("Key 'exclude' must be a list of strings")
+
+
+def get_glob_base_entry(entry) -> dict:
+    """
+    Get the entry a glob entry stands for, without the glob keys, using
+    the glob itself as 'source'. It is used to validate glob entries.
+
+    Args:
+        entry (dict): The glob entry.
+
+    Returns:
+        dict: The entry, with 'source' instead of the glob keys.
+
+    Raises:
+        TypeError: If a glob key is of the wrong type.
+    """
+    validate_glob_keys(entry)
+    base_entry = {'source': entry['sourceGlob']}
+    for key, value in entry.items():
+        if key not in GLOB_KEYS:
+            base_entry[key] = value
+    return base_entry
+
+
+def join_path(base, relative_path, separator) -> str:
+    """
+    Join a relative path, using '/' as separator, to a base path.
+
+    Args:
+        base (str): The base path.
+        relative_path (str): The relative path.
+        separator (str): The separator used in the result.
+
+    Returns:
+        str: The joined path.
+    """
+    if not relative_path:
+        return base
+    relative_path = relative_path.replace('/', separator)
+    if not base or base == '.':
+        return relative_path
+    return base.rstrip('/\\') + separator + relative_path
+
+
+def get_glob_root(entry) -> str:
+    """
+    Get the directory a glob entry scans.
+
+    Args:
+        entry (dict): The glob entry.
+
+    Returns:
+        str: The leading directory of the glob, joined to the 'baseDir' of
+            the entry if it has one.
+    """
+    root, _ = split_glob(entry['sourceGlob'])
+    if entry.get('baseDir'):
+        return os.path.join(entry['baseDir'], root)
+    return root
+
+
+def match_glob_files(entry, scanner):
+    """
+    Scan the directory tree of a glob entry, matching its files.
+
+    Args:
+        entry (dict): The glob entry.
+        scanner (DirectoryScanner): The scanner used to list the directories.
+
+    Yields:
+        tuple: The relative path of every directory with matching files,
+            the relative paths of those files, and whether all the files
+            of the directory matched.
+
+    Raises:
+        TypeError: If a glob key is of the wrong type.
+    """
+    validate_glob_keys(entry)
+    _, pattern = split_glob(entry['sourceGlob'])
+    include = glob_to_regex(pattern)
+    excludes = [glob_to_regex(exclude) for exclude in entry.get('exclude', [])]
+
+    def is_excluded(relative_path) -> bool:
+        return any(exclude.match(relative_path) for exclude in excludes)
+
+    for relative_dir, files in scanner.scan(get_glob_root(entry), is_excluded):
+        matched = []
+        for name in files:
+            relative_path = f"{relative_dir}/{name}" if relative_dir else name
+            if include.match(relative_path) and not is_excluded(relative_path):
+                matched.append(relative_path)
+        if matched:
+            yield relative_dir, matched, len(matched) == len(files)
+
+
+def expand_glob_entry(entry, scanner=None):
+    """
+    Expand a glob entry into the entries for the files it matches. Their
+    sources are the paths the files were found at: written as the glob is,
+    joined to the 'baseDir' of the entry if it has one.
+
+    Args:
+        entry (dict): The glob entry.
+        scanner (DirectoryScanner): The scanner used to list the directories.
+            If not provided, one is created using the entry's 'listingCache'.
+
+    Yields:
+        dict: The entries, one directory at a time.
+
+    Raises:
+        TypeError: If a glob key is of the wrong type.
+    """
+    source_glob = entry['sourceGlob']
+    separator = '\\' if '\\' in source_glob else '/'
+    root, _ = split_glob(source_glob)
+    source_root = source_glob[:len(root)] if root != '.' else ''
+    if entry.get('baseDir') and not os.path.isabs(source_root):
+        source_root = join_path(entry['baseDir'], source_root, separator)
+    dest_dir = entry.get('destDir', '')
+    extra_keys = {
+        key: value for key, value in entry.items()
+        if key not in GLOB_KEYS and key not in ('source', 'destDir')
+    }
+    if scanner is None:
+        scanner = DirectoryScanner(entry.get('listingCache'))
+    for relative_dir, matched, all_matched in match_glob_files(entry, scanner):
+        entry_dest_dir = join_path(dest_dir, relative_dir, '\\')
+        if entry.get('perDirectory', False) and all_matched:
+            matched = [f"{relative_dir}/*" if relative_dir else '*']
+        for relative_path in matched:
+            yield {
+                'source': join_path(source_root, relative_path, separator),
+                'destDir': entry_dest_dir,
+                **extra_keys
+            }
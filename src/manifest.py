@@ -0,0 +1,264 @@
+"""
+This module is used to build a manifest of the source files referenced by
+the 'files' section of a config. The manifest stores the size, modification
+time and SHA-256 hash of every source file, plus the hash of the rendered
+script, so a build pipeline can tell if anything changed since the last run
+(and skip compiling the installer if nothing did).
+
+The files are hashed concurrently, reading the big ones through a memory
+map. If a file has the same size and modification time it had in the
+previous manifest, its previous hash is reused instead of reading it again.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import hashlib
+import json
+import mmap
+import os
+
+from src.globbing import escape_brackets, expand_glob_entry, is_glob_entry
+
+MANIFEST_VERSION = 1
+# Files bigger than this are hashed through a memory map
+MMAP_THRESHOLD = 1024 * 1024
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def get_manifest_path(output_file) -> str:
+    """
+    Get the path of the manifest written alongside an output file.
+
+    Args:
+        output_file (str): The path to the rendered script.
+
+    Returns:
+        str: The path to the manifest.
+    """
+    return f"{output_file}.manifest.json"
+
+
+def iter_file_sources(config, expand_globs=True):
+    """
+    Iterate over the sources of the 'files' section of a config,
+    expanding the glob entries.
+
+    Args:
+        config (dict): The merged config.
+        expand_globs (bool): Whether to expand the glob entries, or to skip
+            them. Default is True.
+
+    Yields:
+        str: The source of every entry, as written in the config (or as
+            generated, for glob entries).
+    """
+    for entry in config.get('files', []):
+        if is_glob_entry(entry):
+            if not expand_globs:
+                continue
+            for expanded_entry in expand_glob_entry(entry):
+                yield expanded_entry['source']
+        elif 'source' in entry:
+            yield entry['source']
+
+
+def resolve_source(source, base_dir='.'):
+    """
+    Resolve the source of an entry to a local path.
+
+    Args:
+        source (str): The source, as written in the config.
+        base_dir (str): The directory relative sources are resolved from.
+
+    Returns:
+        str: The normalized path, or None if the source uses InnoSetup
+            constants, which can't be resolved here.
+    """
+    if '{' in source:
+        return None
+    return os.path.normpath(os.path.join(base_dir, source.replace('\\', os.sep)))
+
+
+def get_source_paths(config, base_dir='.') -> list:
+    """
+    Get the paths of the source files referenced by a config. Relative
+    sources are resolved from the base directory, wildcard sources are
+    expanded, and sources using InnoSetup constants are skipped, as they
+    can't be resolved here.
+
+    Args:
+        config (dict): The merged config.
+        base_dir (str): The directory relative sources are resolved from.
+
+    Returns:
+        list: The sorted, unique paths of the source files.
+    """
+    source_paths = set()
+    for source in iter_file_sources(config):
+        path = resolve_source(source, base_dir)
+        if path is None:
+            continue
+        if any(char in path for char in '*?'):
+            source_paths.update(
+                p for p in glob.glob(escape_brackets(path)) if os.path.isfile(p))
+        else:
+            source_paths.add(path)
+    return sorted(source_paths)
+
+
+def hash_file(path) -> str:
+    """
+    Compute the SHA-256 hash of a file.
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        str: The hash, as a hexadecimal string.
+    """
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size >= MMAP_THRESHOLD:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                file_hash.update(mapped_file)
+        else:
+            for chunk in iter(lambda: file.read(READ_CHUNK_SIZE), b''):
+                file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def get_file_record(path, previous_record=None) -> dict:
+    """
+    Get the manifest record of a file, reusing the previous hash if the
+    size and modification time of the file did not change.
+
+    Args:
+        path (str): The path to the file.
+        previous_record (dict): The record of the file in the previous manifest.
+
+    Returns:
+        dict: The size, modification time and hash of the file, or
+            {'missing': True} if the file does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return {'missing': True}
+    record = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+    if previous_record is not None and \
+            previous_record.get('size') == record['size'] and \
+            previous_record.get('mtime') == record['mtime'] and \
+            'sha256' in previous_record:
+        record['sha256'] = previous_record['sha256']
+    else:
+        record['sha256'] = hash_file(path)
+    return record
+
+
+def build_manifest(source_paths, script_hash=None, previous=None, max_workers=None) -> dict:
+    """
+    Build the manifest for a list of source files, hashing them concurrently.
+
+    Args:
+        source_paths (list): The paths to the source files.
+        script_hash (str): The hash of the rendered script.
+        previous (dict): The previous manifest, used to skip unchanged files.
+        max_workers (int): The number of threads used to hash the files.
+
+    Returns:
+        dict: The manifest.
+    """
+    previous_files = (previous or {}).get('files', {})
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        records = executor.map(
+            lambda path: get_file_record(path, previous_files.get(path)),
+            source_paths)
+        files = dict(zip(source_paths, records))
+    return {
+        'version': MANIFEST_VERSION,
+        'scriptHash': script_hash,
+        'files': files,
+    }
+
+
+def load_manifest(manifest_file):
+    """
+    Load a manifest file.
+
+    Args:
+        manifest_file (str): The path to the manifest.
+
+    Returns:
+        dict: The manifest, or None if it does not exist or is not valid.
+    """
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def write_manifest(manifest_file, manifest) -> None:
+    """
+    Write a manifest file, replacing the previous one atomically.
+
+    Args:
+        manifest_file (str): The path to the manifest.
+        manifest (dict): The manifest.
+    """
+    temporary_file = f"{manifest_file}.{os.getpid()}.tmp"
+    with open(temporary_file, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(temporary_file, manifest_file)
+
+
+def manifest_changed(previous, manifest) -> bool:
+    """
+    Check if anything changed between two manifests, i.e. if the script
+    has to be compiled again.
+
+    Args:
+        previous (dict): The previous manifest, or None.
+        manifest (dict): The new manifest.
+
+    Returns:
+        bool: True if the script or any source file changed.
+    """
+    if previous is None or previous.get('scriptHash') != manifest['scriptHash']:
+        return True
+    previous_hashes = {
+        path: record.get('sha256') for path, record in previous['files'].items()}
+    hashes = {
+        path: record.get('sha256') for path, record in manifest['files'].items()}
+    return previous_hashes != hashes
+
+
+def update_manifest(config, output_file, script_files=None) -> bool:
+    """
+    Build the manifest for a rendered config and write it alongside the
+    output file. Relative sources are resolved from the current directory.
+    The sources of the glob entries are the paths their files were found at
+    (see src.globbing).
+
+    Args:
+        config (dict): The merged config.
+        output_file (str): The path the script was written to. Its hash
+            covers the raw files copied into it as well.
+        script_files (list): All the files making up the script, when it
+            is written in several files. Default is just the output file.
+
+    Returns:
+        bool: True if anything changed since the previous manifest.
+    """
+    manifest_file = get_manifest_path(output_file)
+    previous = load_manifest(manifest_file)
+    if script_files is None:
+        script_files = [output_file]
+    script_hash = hashlib.sha256(
+        "".join(hash_file(path) for path in script_files).encode('utf-8')).hexdigest()
+    manifest = build_manifest(
+        get_source_paths(config), script_hash, previous)
+    write_manifest(manifest_file, manifest)
+    return manifest_changed(previous, manifest)
@@ -0,0 +1,309 @@
+"""
+This module is used to report the memory used by a render, and to keep it
+within a budget.
+
+The report (see format_memory_report) attributes the peak memory allocated
+by Python, as traced by tracemalloc (it doesn't include the interpreter
+itself, a few MiB), to the phases of the render (see src.profiling), and
+lists the templates and sections which used the most memory:
+
+    Peak memory: 182.40 MiB
+    Phase                                    Peak (MiB)  Added (MiB)  Retained (MiB)
+    load                                         120.31       118.02          96.55
+    ...
+    Largest templates                            Added (MiB)  Retained (MiB)
+    template:files.yml                                90.12           80.40
+    ...
+
+The budget (see memory_budget) is checked against the resident memory of
+the process (its RSS, as counted by the memory limits of the system and of
+containers), without tracing the allocations. It stops the render with a
+MemoryBudgetExceeded error as soon as the memory goes over it: when a phase
+starts or ends and, in the main thread, from a watchdog thread checking it
+every few milliseconds, so a phase using too much memory (e.g. parsing a
+huge config) is stopped before the system kills the process.
+"""
+from contextlib import contextmanager
+import io
+import os
+import signal
+import sys
+import threading
+import _thread
+
+from src.profiling import listen_phases
+
+MIB = 1024 * 1024
+# The time between two checks of the watchdog of the budget, in seconds
+WATCHDOG_INTERVAL = 0.01
+# The number of templates and sections listed in the report
+DEFAULT_TOP = 10
+
+
+def format_size(size) -> str:
+    """
+    Format a size, in MiB.
+
+    Args:
+        size (int): The size, in bytes.
+
+    Returns:
+        str: The size, in MiB, with two decimals.
+    """
+    # Adding 0 turns -0.0 (a few bytes freed) into 0.0
+    return f"{round(size / MIB, 2) + 0:.2f}"
+
+
+def get_memory_usage():
+    """
+    Get the resident memory of the process (its RSS).
+
+    It's read from /proc/self/statm where available (Linux). Elsewhere,
+    it's the peak resident memory reported by getrusage, which can't go
+    down, but is over a budget as soon as the memory is.
+
+    Returns:
+        int: The resident memory, in bytes, or None if it can't be measured
+            on this platform.
+    """
+    try:
+        with open('/proc/self/statm', 'rb') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        pass
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # In bytes on macOS, in KiB elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """
+    Raised when the memory used by a render goes over its budget.
+
+    Attributes:
+        used_bytes (int): The resident memory when it was detected.
+        max_bytes (int): The budget.
+        phases (list): The running phases, as (name, resident memory when
+            it started) tuples, from the outermost.
+    """
+
+    def __init__(self, used_bytes, max_bytes, phases):
+        super().__init__(used_bytes, max_bytes, phases)
+        self.used_bytes = used_bytes
+        self.max_bytes = max_bytes
+        self.phases = phases
+
+    def __str__(self) -> str:
+        message = (f"memory budget exceeded: {format_size(self.used_bytes)} MiB "
+                   f"used, over the budget of {format_size(self.max_bytes)} MiB")
+        if not self.phases:
+            return message
+        running = ' > '.join(
+            f"{name} (from {format_size(start)} MiB)" for name, start in self.phases)
+        return f"{message}\n  while running: {running}"
+
+
+class MemoryBudget:
+    """
+    Checks that the resident memory stays within a budget, when the phases
+    start and end, and optionally from a watchdog thread.
+    """
+
+    def __init__(self, max_bytes, interval=WATCHDOG_INTERVAL):
+        self.max_bytes = max_bytes
+        self.interval = interval
+        # The error, once the budget has been exceeded
+        self.error = None
+        # The running phases: (name, resident memory when it started)
+        self._stack: list = []
+        self._stopped = threading.Event()
+        self._watchdog = None
+
+    def start(self, watchdog=True) -> None:
+        """
+        Start the watchdog.
+
+        Args:
+            watchdog (bool): Whether to check the memory from a watchdog
+                thread, which interrupts the main thread when the budget is
+                exceeded. It's only started from the main thread. Default
+                is True.
+        """
+        if watchdog and threading.current_thread() is threading.main_thread():
+            self._watchdog = threading.Thread(
+                target=self._watch, name='yamelinno-memory-watchdog', daemon=True)
+            self._watchdog.start()
+
+    def stop(self) -> None:
+        """
+        Stop the watchdog.
+        """
+        self._stopped.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    def check(self, used=None):
+        """
+        Check the resident memory against the budget.
+
+        Args:
+            used (int): The resident memory, if already measured. Default
+                is to measure it.
+
+        Returns:
+            MemoryBudgetExceeded: The error, once the budget has been
+                exceeded (even if detected by an earlier check), or None.
+        """
+        if self.error is None:
+            if used is None:
+                used = get_memory_usage()
+            if used > self.max_bytes:
+                self.error = MemoryBudgetExceeded(used, self.max_bytes, list(self._stack))
+        return self.error
+
+    def enter(self, name) -> None:
+        """
+        Start a phase, checking the budget first.
+
+        Args:
+            name (str): The name of the phase.
+
+        Raises:
+            MemoryBudgetExceeded: If the budget is exceeded, or was exceeded
+                while the main thread couldn't be interrupted.
+        """
+        used = get_memory_usage()
+        self._stack.append((name, used))
+        error = self.check(used)
+        if error is not None:
+            # The phase doesn't start, so it doesn't end
+            self._stack.pop()
+            raise error
+
+    def exit(self) -> None:
+        """
+        End the running phase, checking the budget.
+
+        Raises:
+            MemoryBudgetExceeded: If the budget is exceeded, or was exceeded
+                while the main thread couldn't be interrupted.
+        """
+        error = self.check()
+        self._stack.pop()
+        if error is not None:
+            raise error
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval):
+            if self.check() is not None:
+                # Raises a KeyboardInterrupt in the main thread, turned into
+                # the error by memory_budget. Only a running phase is
+                # interrupted (not e.g. an import between two phases), and
+                # only if SIGINT isn't ignored or handled elsewhere: otherwise,
+                # the error is raised when the next phase starts or ends.
+                if self._stack and \
+                        signal.getsignal(signal.SIGINT) is signal.default_int_handler:
+                    _thread.interrupt_main()
+                return
+
+
+@contextmanager
+def memory_budget(max_bytes, watchdog=True):
+    """
+    Keep the resident memory of the process within a budget while the
+    current thread renders in the context (it's checked when the phases of
+    that thread start and end).
+
+    Args:
+        max_bytes (int): The budget, in bytes.
+        watchdog (bool): Whether to also check the memory from a watchdog
+            thread, so a long phase is stopped as soon as it goes over the
+            budget (only when entered from the main thread). Default is True.
+
+    Yields:
+        MemoryBudget: The budget.
+
+    Raises:
+        MemoryBudgetExceeded: If the resident memory goes over the budget.
+    """
+    budget = MemoryBudget(max_bytes)
+    budget.start(watchdog)
+    try:
+        with listen_phases(budget):
+            yield budget
+        if budget.error is not None:
+            # Exceeded after the last phase ended
+            raise budget.error
+    except KeyboardInterrupt:
+        if budget.error is None:
+            raise
+        raise budget.error from None
+    finally:
+        budget.stop()
+
+
+def get_largest_phases(profiler, prefix, top=DEFAULT_TOP) -> list:
+    """
+    Get the phases of a kind which allocated the most memory, with the
+    phases of the same name merged wherever they ran (e.g. a template
+    included by many others).
+
+    Args:
+        profiler (Profiler): The profiler of the render, tracing the memory.
+        prefix (str): The prefix of the names of the phases (e.g.
+            'template:').
+        top (int): The number of phases returned. Default is 10.
+
+    Returns:
+        list: The (name, largest added memory, total retained memory)
+            tuples, from the largest.
+    """
+    phases: dict = {}
+    for path, stats in profiler.phases.items():
+        name = path[-1]
+        if not name.startswith(prefix):
+            continue
+        added, retained = phases.get(name, (0, 0))
+        phases[name] = (max(added, stats.added_bytes), retained + stats.retained_bytes)
+    largest = sorted(phases.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [(name, added, retained) for name, (added, retained) in largest]
+
+
+def format_memory_report(profiler, top=DEFAULT_TOP) -> str:
+    """
+    Format the memory report of a render: the peak memory, the memory of
+    every top-level phase, and the templates and sections which allocated
+    the most memory.
+
+    Args:
+        profiler (Profiler): The profiler of the render, tracing the memory.
+        top (int): The number of templates and sections listed. Default
+            is 10.
+
+    Returns:
+        str: The report.
+    """
+    output = io.StringIO()
+    top_level = [(path[0], stats) for path, stats in profiler.phases.items() if len(path) == 1]
+    peak = max((stats.peak_bytes for _, stats in top_level), default=0)
+    print(f"Peak memory: {format_size(peak)} MiB", file=output)
+    print(f"{'Phase':<48} {'Peak (MiB)':>11} {'Added (MiB)':>12} {'Retained (MiB)':>15}",
+          file=output)
+    for name, stats in top_level:
+        print(f"{name:<48} {format_size(stats.peak_bytes):>11} "
+              f"{format_size(stats.added_bytes):>12} {format_size(stats.retained_bytes):>15}",
+              file=output)
+    for title, prefix in (('Largest templates', 'template:'), ('Largest sections', 'section:')):
+        largest = get_largest_phases(profiler, prefix, top)
+        if not largest:
+            continue
+        print(f"\n{title:<48} {'Added (MiB)':>12} {'Retained (MiB)':>15}", file=output)
+        for name, added, retained in largest:
+            print(f"{name:<48} {format_size(added):>12} {format_size(retained):>15}",
+                  file=output)
+    return output.getvalue()
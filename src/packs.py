@@ -0,0 +1,309 @@
+"""
+This module is used to read templates from template packs: zip archives
+(with the .ympack extension) holding a tree of templates. Besides the usual
+zip directory, a pack has a prebuilt index mapping every member name to its
+offset in the archive, so a template is found with a single lookup, and
+read (and decompressed) on its own, without extracting the archive.
+
+A template inside a pack is referenced as `<pack>!/<member>`, e.g.
+`templates.ympack!/base-template.yml`. A pack can also be used as a search
+directory (for example, in YAMELINNO_TEMPLATES).
+"""
+import json
+import os
+import struct
+import zlib
+
+from src.caching import FileCache, get_file_id
+from src.stats import BYTES_READ, count
+
+PACK_EXTENSION = '.ympack'
+PACK_SEPARATOR = '!/'
+INDEX_NAME = '.yamelinno-index.json'
+# The compression methods of the zip format (zipfile.ZIP_STORED and
+# zipfile.ZIP_DEFLATED; zipfile itself is only needed to build packs)
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+COMMENT_PREFIX = b'yamelinno-pack 1 '
+
+# Local file header: signature, version, flags, method, time, date, crc,
+# compressed size, size, name length, extra field length
+LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+END_OF_DIRECTORY_SIGNATURE = b'PK\x05\x06'
+END_OF_DIRECTORY_SIZE = 22
+MAX_COMMENT_SIZE = 0xFFFF
+
+
+def is_pack_file(path) -> bool:
+    """
+    Check if a path is a template pack.
+
+    Args:
+        path (str): The path to check.
+
+    Returns:
+        bool: True if the path is an existing file with the pack extension.
+    """
+    return path.endswith(PACK_EXTENSION) and os.path.isfile(path)
+
+
+def split_pack_path(path):
+    """
+    Split the path of a template inside a pack.
+
+    Args:
+        path (str): The path, e.g. 'templates.ympack!/dir/template.yml'.
+
+    Returns:
+        tuple: The path to the pack and the member name (which is empty
+            for the root of the pack), or None if the path is not inside
+            a pack.
+    """
+    position = path.find(PACK_EXTENSION + '!')
+    if position == -1:
+        return None
+    position += len(PACK_EXTENSION)
+    member = path[position + 1:].replace('\\', '/').strip('/')
+    return path[:position], member
+
+
+def join_input_path(directory, name) -> str:
+    """
+    Join a search directory and a file name. The directory can be a pack,
+    or a directory inside a pack.
+
+    Args:
+        directory (str): The directory.
+        name (str): The file name.
+
+    Returns:
+        str: The joined path.
+    """
+    pack_path = split_pack_path(directory)
+    if pack_path is None:
+        if not is_pack_file(directory):
+            return os.path.join(directory, name)
+        pack_path = (directory, '')
+    pack_file, member = pack_path
+    member = f"{member}/{name}" if member else name
+    return f"{pack_file}{PACK_SEPARATOR}{os.path.normpath(member).replace(os.sep, '/')}"
+
+
+def input_exists(path) -> bool:
+    """
+    Check if an input file exists, either on disk or inside a pack.
+
+    Args:
+        path (str): The path to the input file.
+
+    Returns:
+        bool: True if the file exists.
+    """
+    pack_path = split_pack_path(path)
+    if pack_path is None:
+        return os.path.exists(path)
+    pack_file, member = pack_path
+    return is_pack_file(pack_file) and member in get_pack(pack_file)
+
+
+def read_local_member(file, offset, compressed_size=None) -> tuple:
+    """
+    Read the raw data of a member, starting from its local header.
+
+    Args:
+        file (file): The pack, opened in binary mode.
+        offset (int): The offset of the local header.
+        compressed_size (int): The size of the data. If None, the size in
+            the local header is used.
+
+    Returns:
+        tuple: The compression method and the raw (compressed) data.
+    """
+    file.seek(offset)
+    header = LOCAL_HEADER.unpack(file.read(LOCAL_HEADER.size))
+    if header[0] != b'PK\x03\x04':
+        raise ValueError(f"Invalid member header at offset {offset} of {file.name}")
+    method, header_size, name_length, extra_length = header[3], header[7], header[9], header[10]
+    file.seek(name_length + extra_length, os.SEEK_CUR)
+    return method, file.read(header_size if compressed_size is None else compressed_size)
+
+
+def decompress(method, data) -> bytes:
+    """
+    Decompress the data of a member.
+
+    Args:
+        method (int): The compression method (stored or deflated).
+        data (bytes): The raw data.
+
+    Returns:
+        bytes: The decompressed data.
+    """
+    if method == ZIP_STORED:
+        return data
+    if method == ZIP_DEFLATED:
+        return zlib.decompress(data, -zlib.MAX_WBITS)
+    raise ValueError(f"Unsupported compression method: {method}")
+
+
+def read_index_offset(file) -> int:
+    """
+    Find the offset of the index of a pack, stored in the archive comment.
+
+    Args:
+        file (file): The pack, opened in binary mode.
+
+    Returns:
+        int: The offset of the local header of the index.
+
+    Raises:
+        ValueError: If the file is not an indexed pack.
+    """
+    size = file.seek(0, os.SEEK_END)
+    tail_size = min(size, END_OF_DIRECTORY_SIZE + MAX_COMMENT_SIZE)
+    file.seek(size - tail_size)
+    tail = file.read(tail_size)
+    position = tail.rfind(END_OF_DIRECTORY_SIGNATURE)
+    if position == -1:
+        raise ValueError(f"{file.name} is not a zip archive")
+    comment_length, = struct.unpack('<H', tail[position + 20:position + 22])
+    comment = tail[position + 22:position + 22 + comment_length]
+    if not comment.startswith(COMMENT_PREFIX):
+        raise ValueError(f"{file.name} has no template pack index")
+    return int(comment[len(COMMENT_PREFIX):])
+
+
+class TemplatePack:
+    """
+    A template pack, of which only the index is loaded. The members are
+    read on demand.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            method, data = read_local_member(file, read_index_offset(file))
+            # name -> [offset, compressed size, size, method, crc]
+            self.index: dict = json.loads(decompress(method, data))
+
+    def __contains__(self, member) -> bool:
+        return member in self.index
+
+    def read(self, member) -> bytes:
+        """
+        Read a member of the pack.
+
+        Args:
+            member (str): The name of the member.
+
+        Returns:
+            bytes: The content of the member.
+
+        Raises:
+            FileNotFoundError: If the member is not in the pack.
+            ValueError: If the member is corrupted.
+        """
+        if member not in self.index:
+            raise FileNotFoundError(f"{member} not found in {self.path}")
+        offset, compressed_size, size, method, crc = self.index[member]
+        with open(self.path, 'rb') as file:
+            _, data = read_local_member(file, offset, compressed_size)
+        content = decompress(method, data)
+        if len(content) != size or zlib.crc32(content) != crc:
+            raise ValueError(f"{member} is corrupted in {self.path}")
+        return content
+
+
+_PACKS = FileCache(name='packs')
+
+
+def get_pack(pack_file) -> TemplatePack:
+    """
+    Open a template pack. The packs are cached, so the index is only read
+    again if the pack changes.
+
+    Args:
+        pack_file (str): The path to the pack.
+
+    Returns:
+        TemplatePack: The pack.
+    """
+    path = os.path.abspath(pack_file)
+    file_id = get_file_id(path)
+    pack = _PACKS.get(path, file_id)
+    if pack is None:
+        pack = TemplatePack(path)
+        _PACKS.put(path, file_id, pack)
+    return pack
+
+
+def get_input_id(path) -> tuple:
+    """
+    Get an identifier of the current version of an input file, which
+    changes when the file (or the pack containing it) is modified.
+
+    Args:
+        path (str): The path to the input file.
+
+    Returns:
+        tuple: The modification time, size and inode of the file (or the
+            pack), plus the member name for files inside a pack.
+    """
+    pack_path = split_pack_path(path)
+    if pack_path is None:
+        return get_file_id(path)
+    return get_file_id(pack_path[0]) + (pack_path[1],)
+
+
+def read_pack_member(path) -> bytes:
+    """
+    Read a file inside a pack.
+
+    Args:
+        path (str): The path, e.g. 'templates.ympack!/template.yml'.
+
+    Returns:
+        bytes: The content of the file.
+    """
+    pack_file, member = split_pack_path(path)
+    content = get_pack(pack_file).read(member)
+    count(BYTES_READ, len(content))
+    return content
+
+
+def build_pack(directory, pack_file) -> int:
+    """
+    Build a template pack from every file of a directory tree.
+
+    Args:
+        directory (str): The directory with the templates.
+        pack_file (str): The path to the pack to write.
+
+    Returns:
+        int: The number of files in the pack.
+    """
+    import zipfile  # pylint: disable=import-outside-toplevel
+
+    names = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            names.append((path, os.path.relpath(path, directory).replace(os.sep, '/')))
+    temporary_file = f"{pack_file}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(temporary_file, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for path, name in names:
+            with open(path, 'rb') as file:
+                archive.writestr(name, file.read())
+        index = {
+            info.filename: [
+                info.header_offset, info.compress_size,
+                info.file_size, info.compress_type, info.CRC,
+            ]
+            for info in archive.infolist()
+        }
+        archive.writestr(
+            INDEX_NAME, json.dumps(index, sort_keys=True), zipfile.ZIP_STORED)
+        archive.comment = COMMENT_PREFIX + str(archive.getinfo(INDEX_NAME).header_offset).encode()
+    os.replace(temporary_file, pack_file)
+    return len(names)
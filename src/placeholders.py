@@ -0,0 +1,303 @@
+"""
+This module is used to parse templates once and instantiate them many times.
+A template is parsed into a regular YAML tree, in which the placeholders
+(such as !input_arg) are kept as Placeholder nodes, and the strings containing
+placeholders as TemplateString nodes. Instantiating a template is then just a
+walk over that tree, replacing the placeholders by the values of the inputs,
+without parsing the YAML again. As the values are put directly in the tree,
+they keep their type and don't need to be quoted or escaped.
+"""
+import copy
+import os
+import re
+
+import yaml
+
+from src.caching import FileCache
+from src.packs import get_input_id, read_pack_member, split_pack_path
+from src.profiling import profile_phase
+from src.reading import open_mapped
+from src.stats import YAML_DOCUMENTS, count
+
+# The placeholders found inside strings: '!' followed by a name
+PLACEHOLDER_PATTERN = re.compile(r'!(\w+)')
+
+
+class Placeholder:  # pylint: disable=too-few-public-methods
+    """
+    A value written as a YAML tag, such as `key: !input_arg`.
+    It is replaced by the value of the input, keeping its type.
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"Placeholder({self.name!r})"
+
+
+class TemplateString:
+    """
+    A string containing placeholders, such as `'{app}\\!subdir'`.
+    It is split into literal text and placeholder names.
+    """
+    __slots__ = ('parts',)
+
+    def __init__(self, parts):
+        # Literal text and placeholder names alternate, starting with text
+        self.parts = tuple(parts)
+
+    @property
+    def names(self) -> tuple:
+        """
+        Get the names of the placeholders in the string.
+
+        Returns:
+            tuple: The placeholder names, in order.
+        """
+        return self.parts[1::2]
+
+    def __repr__(self) -> str:
+        return f"TemplateString({self.parts!r})"
+
+
+class TemplateLoader(yaml.FullLoader):  # pylint: disable=too-many-ancestors
+    """
+    A YAML loader that reads unknown local tags (!name) as placeholders.
+    """
+
+
+def construct_placeholder(_loader, tag_suffix, _node) -> Placeholder:
+    """
+    Construct a Placeholder from a local tag.
+
+    Args:
+        _loader (TemplateLoader): The loader.
+        tag_suffix (str): The tag, without the leading '!'.
+        _node (yaml.Node): The tagged node. Its value is ignored.
+
+    Returns:
+        Placeholder: The placeholder for the tag.
+    """
+    return Placeholder(tag_suffix)
+
+
+TemplateLoader.add_multi_constructor('!', construct_placeholder)
+
+
+class ParsedTemplate:  # pylint: disable=too-few-public-methods
+    """
+    A template parsed once, ready to be instantiated.
+    """
+    __slots__ = ('tree', 'names')
+
+    def __init__(self, tree, names):
+        self.tree = tree
+        self.names = frozenset(names)
+
+
+def compile_node(node, names):
+    """
+    Replace the strings containing placeholders by TemplateStrings,
+    recursively, collecting the placeholder names found.
+
+    Args:
+        node: The node of the YAML tree.
+        names (set): The set the placeholder names are added to.
+
+    Returns:
+        The compiled node.
+    """
+    if isinstance(node, dict):
+        return {compile_node(k, names): compile_node(v, names) for k, v in node.items()}
+    if isinstance(node, list):
+        return [compile_node(item, names) for item in node]
+    if isinstance(node, Placeholder):
+        names.add(node.name)
+        return node
+    if isinstance(node, str) and '!' in node:
+        parts = PLACEHOLDER_PATTERN.split(node)
+        if len(parts) == 1:
+            return node
+        template_string = TemplateString(parts)
+        names.update(template_string.names)
+        return template_string
+    return node
+
+
+def parse_template_string(src_template) -> ParsedTemplate:
+    """
+    Parse a template from its text.
+
+    Args:
+        src_template (str | MappedFile): The template as YAML text, or
+            as a stream.
+
+    Returns:
+        ParsedTemplate: The parsed template.
+    """
+    tree = yaml.load(src_template, Loader=TemplateLoader)
+    count(YAML_DOCUMENTS)
+    names: set = set()
+    tree = compile_node(tree, names)
+    return ParsedTemplate(tree, names)
+
+
+_PARSED_TEMPLATES = FileCache(name='templates')
+
+
+def parse_template(template_file) -> ParsedTemplate:
+    """
+    Parse a template file. The parsed template is cached, so it's only
+    parsed again if the file changes.
+
+    Args:
+        template_file (str): The path to the template file. It can be
+            inside a template pack.
+
+    Returns:
+        ParsedTemplate: The parsed template.
+    """
+    path = os.path.abspath(template_file)
+    file_id = get_input_id(path)
+    cached = _PARSED_TEMPLATES.get(path, file_id)
+    if cached is not None:
+        return cached
+    if split_pack_path(path) is not None:
+        with profile_phase('read'):
+            source = read_pack_member(path)
+        with profile_phase('parse'):
+            parsed_template = parse_template_string(source)
+    else:
+        # The file is memory-mapped, and read as it's parsed
+        with profile_phase('parse'), open_mapped(path) as file:
+            parsed_template = parse_template_string(file)
+    _PARSED_TEMPLATES.put(path, file_id, parsed_template)
+    return parsed_template
+
+
+def copy_value(value):
+    """
+    Copy an input value put in an instance, if it's mutable, so the instances
+    (and the inputs) don't share it, and merging one doesn't change the others.
+
+    Args:
+        value: The input value.
+
+    Returns:
+        The value, or a deep copy of it for lists and dictionaries.
+    """
+    if isinstance(value, (list, dict)):
+        return copy.deepcopy(value)
+    return value
+
+
+def match_input(name, input_args):
+    """
+    Find the input for a placeholder name found inside a string. If there is
+    no input with that exact name, the longest input name the placeholder
+    starts with is used, and the rest of the name is kept as text.
+
+    Args:
+        name (str): The placeholder name.
+        input_args (dict): The input arguments.
+
+    Returns:
+        tuple: The input name (or None if there is no match) and the rest
+            of the placeholder name.
+    """
+    if name in input_args:
+        return name, ''
+    matches = [key for key in input_args if name.startswith(key)]
+    if not matches:
+        return None, name
+    key = max(matches, key=len)
+    return key, name[len(key):]
+
+
+def instantiate_string(template_string, input_args):
+    """
+    Replace the placeholders of a TemplateString. A string made of a single
+    placeholder is replaced by the input value itself, keeping its type.
+
+    Args:
+        template_string (TemplateString): The string to instantiate.
+        input_args (dict): The input arguments.
+
+    Returns:
+        The instantiated value.
+    """
+    parts = template_string.parts
+    rendered_parts = []
+    for index, part in enumerate(parts):
+        if index % 2 == 0:
+            rendered_parts.append(part)
+            continue
+        key, rest = match_input(part, input_args)
+        if key is None:
+            # Not an input: keep it as it was written
+            rendered_parts.append('!' + part)
+            continue
+        value = input_args[key]
+        if len(parts) == 3 and not parts[0] and not parts[2] and not rest:
+            return copy_value(value)
+        rendered_parts.append(str(value))
+        rendered_parts.append(rest)
+    return "".join(rendered_parts)
+
+
+def instantiate_node(node, input_args):
+    """
+    Instantiate a node of a parsed template, recursively. The containers
+    are always copied, so the parsed template is never modified.
+
+    Args:
+        node: The node to instantiate.
+        input_args (dict): The input arguments.
+
+    Returns:
+        The instantiated node.
+
+    Raises:
+        KeyError: If a placeholder has no input.
+    """
+    if isinstance(node, dict):
+        return {
+            instantiate_node(k, input_args): instantiate_node(v, input_args)
+            for k, v in node.items()
+        }
+    if isinstance(node, list):
+        return [instantiate_node(item, input_args) for item in node]
+    if isinstance(node, TemplateString):
+        return instantiate_string(node, input_args)
+    if isinstance(node, Placeholder):
+        if node.name not in input_args:
+            raise KeyError(f"Input argument {node.name} not provided")
+        return copy_value(input_args[node.name])
+    return node
+
+
+def instantiate_template(parsed_template, input_args=None):
+    """
+    Instantiate a parsed template with the provided input arguments.
+
+    Args:
+        parsed_template (ParsedTemplate): The parsed template.
+        input_args (dict): The input arguments to the template.
+
+    Returns:
+        The instantiated template.
+
+    Raises:
+        KeyError: If an input argument is not found in the template.
+        KeyError: If a placeholder has no input.
+    """
+    if input_args is None:
+        input_args = {}
+    assert isinstance(input_args, dict),\
+        f"Input arguments must be a dictionary. Got: {input_args}"
+    for key in input_args:
+        if not any(name.startswith(key) for name in parsed_template.names):
+            raise KeyError(f"Input argument {key} not found in template")
+    return instantiate_node(parsed_template.tree, input_args)
@@ -0,0 +1,251 @@
+"""
+This module is used to check, before rendering, that every source file
+referenced by the 'files' section exists. Instead of checking the sources
+one by one, they are grouped by directory, and every directory is listed
+only once (the directories are listed concurrently). Wildcard sources are
+matched against those listings. Glob entries are checked while their
+directory trees are scanned, without listing them again. The result is a
+report with every missing source, plus the number of files and the total
+size of the payload.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import fnmatch
+import glob
+import os
+
+from src.globbing import (
+    DirectoryScanner,
+    escape_brackets,
+    get_glob_root,
+    is_glob_entry,
+    match_glob_files,
+)
+from src.manifest import iter_file_sources, resolve_source
+
+# InnoSetup only uses '*' and '?' as wildcards ('[' is matched literally)
+WILDCARD_CHARS = ('*', '?')
+
+
+class SizingScanner(DirectoryScanner):
+    """
+    A directory scanner (without cache) which keeps the size of every file
+    it lists.
+    """
+
+    def __init__(self, max_workers=None):
+        super().__init__(max_workers=max_workers)
+        # The normalized path of every file listed -> its size
+        self.sizes: dict = {}
+
+    def found_file(self, scanned_entry) -> None:
+        self.sizes[os.path.normpath(scanned_entry.path)] = scanned_entry.stat().st_size
+
+
+def list_directory_sizes(directory):
+    """
+    List the files of a directory with their sizes.
+
+    Args:
+        directory (str): The directory to list.
+
+    Returns:
+        dict: The size of every file, by name, or None if the directory
+            does not exist.
+    """
+    sizes = {}
+    try:
+        with os.scandir(directory or '.') as scanned_entries:
+            for scanned_entry in scanned_entries:
+                if scanned_entry.is_file():
+                    sizes[scanned_entry.name] = scanned_entry.stat().st_size
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return sizes
+
+
+def group_sources_by_directory(config, base_dir='.') -> dict:
+    """
+    Group the sources of the 'files' section by directory (except for the
+    glob entries).
+
+    Args:
+        config (dict): The merged config.
+        base_dir (str): The directory relative sources are resolved from.
+
+    Returns:
+        dict: For every directory, a dictionary mapping the file names
+            (or wildcards) found in that directory to the sources using them.
+    """
+    sources_by_directory: dict = {}
+    # The glob entries are checked on their own, see check_glob_entries
+    for source in iter_file_sources(config, expand_globs=False):
+        path = resolve_source(source, base_dir)
+        if path is None:
+            continue
+        directory, name = os.path.split(path)
+        sources_by_directory.setdefault(directory, {}).setdefault(name, source)
+    return sources_by_directory
+
+
+def match_names(names, sizes) -> tuple:
+    """
+    Match the file names and wildcards used in a directory against its listing.
+
+    Args:
+        names (dict): The file names (or wildcards) and their sources.
+        sizes (dict): The size of every file in the directory, by name.
+
+    Returns:
+        tuple: The matched file names, and the sources that matched nothing.
+    """
+    matched = set()
+    missing = []
+    for name, source in names.items():
+        if any(char in name for char in WILDCARD_CHARS):
+            found = fnmatch.filter(sizes, escape_brackets(name))
+        else:
+            found = [name] if name in sizes else []
+        if not found:
+            missing.append(source)
+        matched.update(found)
+    return matched, missing
+
+
+def check_listed_directories(sources_by_directory, max_workers=None) -> tuple:
+    """
+    Check the sources of the directories without wildcards, listing every
+    directory once (concurrently).
+
+    Args:
+        sources_by_directory (dict): The sources of every directory, as
+            returned by group_sources_by_directory.
+        max_workers (int): The number of threads used to list the directories.
+
+    Returns:
+        tuple: The missing sources, the number of files found and their
+            total size.
+    """
+    missing = []
+    file_count = total_size = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        listings = zip(
+            sources_by_directory, executor.map(list_directory_sizes, sources_by_directory))
+        for directory, sizes in listings:
+            names = sources_by_directory[directory]
+            if sizes is None:
+                missing.extend(names.values())
+                continue
+            matched, missing_sources = match_names(names, sizes)
+            missing.extend(missing_sources)
+            file_count += len(matched)
+            total_size += sum(sizes[name] for name in matched)
+    return missing, file_count, total_size
+
+
+def check_globbed_directories(sources_by_directory) -> tuple:
+    """
+    Check the sources of the directories with wildcards, which can't be
+    listed, so they are globbed instead.
+
+    Args:
+        sources_by_directory (dict): The sources of every directory.
+
+    Returns:
+        tuple: The missing sources, the number of files found and their
+            total size.
+    """
+    missing = []
+    file_count = total_size = 0
+    for directory, names in sources_by_directory.items():
+        for name, source in names.items():
+            pattern = escape_brackets(os.path.join(directory, name))
+            paths = [p for p in glob.glob(pattern) if os.path.isfile(p)]
+            if not paths:
+                missing.append(source)
+            file_count += len(paths)
+            total_size += sum(os.path.getsize(p) for p in paths)
+    return missing, file_count, total_size
+
+
+def check_glob_entries(config, max_workers=None) -> tuple:
+    """
+    Check the glob entries of the 'files' section, while their directory
+    trees are scanned. A glob whose directory does not exist is missing.
+
+    Args:
+        config (dict): The merged config.
+        max_workers (int): The number of threads used to list the directories.
+
+    Returns:
+        tuple: The missing globs, the number of files found and their
+            total size.
+    """
+    missing = []
+    file_count = total_size = 0
+    for entry in config.get('files', []):
+        if not is_glob_entry(entry):
+            continue
+        scanner = SizingScanner(max_workers)
+        root = get_glob_root(entry)
+        try:
+            for _, matched, _ in match_glob_files(entry, scanner):
+                file_count += len(matched)
+                total_size += sum(
+                    scanner.sizes[os.path.normpath(os.path.join(root, path))]
+                    for path in matched)
+        except (FileNotFoundError, NotADirectoryError):
+            missing.append(entry['sourceGlob'])
+    return missing, file_count, total_size
+
+
+def run_preflight(config, base_dir='.', max_workers=None) -> dict:
+    """
+    Check that every source referenced by a config exists.
+
+    Args:
+        config (dict): The merged config.
+        base_dir (str): The directory relative sources are resolved from.
+        max_workers (int): The number of threads used to list the directories.
+
+    Returns:
+        dict: The report, with the 'missing' sources, and the number of
+            'files' found with their 'totalSize' in bytes.
+    """
+    sources_by_directory = group_sources_by_directory(config, base_dir)
+    globbed = {
+        directory: names for directory, names in sources_by_directory.items()
+        if any(char in directory for char in WILDCARD_CHARS)
+    }
+    listed = {
+        directory: names for directory, names in sources_by_directory.items()
+        if directory not in globbed
+    }
+    report = {'missing': [], 'files': 0, 'totalSize': 0}
+    for missing, file_count, total_size in (
+            check_listed_directories(listed, max_workers),
+            check_globbed_directories(globbed),
+            check_glob_entries(config, max_workers)):
+        report['missing'].extend(missing)
+        report['files'] += file_count
+        report['totalSize'] += total_size
+    return report
+
+
+def format_preflight_report(report) -> str:
+    """
+    Format a preflight report to be shown to the user.
+
+    Args:
+        report (dict): The report, as returned by run_preflight.
+
+    Returns:
+        str: The formatted report.
+    """
+    lines = [
+        f"Preflight: {report['files']} source files found, "
+        f"{report['totalSize']} bytes in total."
+    ]
+    if report['missing']:
+        lines.append(f"{len(report['missing'])} source files are missing:")
+        lines.extend(f"  - {source}" for source in report['missing'])
+    return "\n".join(lines)
@@ -0,0 +1,298 @@
+"""
+This module is used to profile a render: the time spent in every phase
+(loading the schema, resolving every template, merging, validating and
+rendering every section, writing the outputs), and the peak memory
+allocated while it ran. The phases are nested, so the time spent in a
+template includes the time spent in its children templates:
+
+    Phase                                    Calls   Time (ms)  Peak (MiB)
+    schema                                       1        2.10        0.41
+    load                                         1       35.72        1.90
+      template:base-template.yml                 1       30.02        1.85
+      merge                                      1        0.04        1.85
+
+The code marks its phases with profile_phase, which does nothing unless a
+profile is being recorded (see profile), so it costs next to nothing in a
+normal run. Like the dependencies, the phases are recorded while the
+context of a profiler is active, and only those of the thread which
+entered it, so renders running concurrently in other threads (e.g. the
+requests of the server) are profiled apart. Other listeners of the phases
+(such as the tracer, see src.tracing, or the memory budget, see src.memory)
+are registered with listen_phases, for the current thread or for all of
+them.
+
+The memory is traced with tracemalloc, which is process-wide: the peaks
+measured while other threads render include what they allocate.
+"""
+from contextlib import contextmanager, nullcontext
+import io
+import threading
+import time
+
+# The listeners of the phases of every thread (e.g. the tracer)
+_LISTENERS: list = []
+# The listeners of every thread, notified of the phases of that thread only
+_LOCAL = threading.local()
+_NULL_CONTEXT = nullcontext()
+
+
+def _get_thread_listeners() -> list:
+    listeners = getattr(_LOCAL, 'listeners', None)
+    if listeners is None:
+        listeners = _LOCAL.listeners = []
+    return listeners
+
+
+class PhaseStats:  # pylint: disable=too-few-public-methods
+    """
+    The statistics of a phase, over every time it ran.
+    """
+    __slots__ = ('calls', 'seconds', 'peak_bytes', 'added_bytes', 'retained_bytes')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        # The peak of the memory allocated while the phase ran
+        self.peak_bytes = 0
+        # The largest growth of the memory during a run of the phase (its
+        # peak, minus the memory allocated when it started)
+        self.added_bytes = 0
+        # The memory allocated by the phase and still held when it ended,
+        # over every run
+        self.retained_bytes = 0
+
+    def as_dict(self) -> dict:
+        """
+        Get the statistics as a dictionary.
+
+        Returns:
+            dict: The number of calls, the total time (in seconds), and the
+                peak, added and retained memory (in bytes).
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Profiler:
+    """
+    Records the time and peak memory of the phases of a render, by their
+    path in the tree of phases. The phases of every thread are nested in
+    the running phases of that thread only.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        # (phase names from the root) -> PhaseStats, in the order they ran
+        self.phases: dict = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # The tracemalloc module, imported only if the memory is traced
+        self._tracemalloc = None
+        self._started_tracing = False
+
+    def _get_stack(self) -> list:
+        # The running phases of the thread: [path, stats, start time, peak
+        # memory so far, memory at the start]
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def start(self) -> None:
+        """
+        Start tracing the memory allocations, if enabled.
+        """
+        if self.trace_memory:
+            import tracemalloc  # pylint: disable=import-outside-toplevel
+
+            self._tracemalloc = tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+
+    def stop(self) -> None:
+        """
+        Stop tracing the memory allocations, if they were traced by this
+        profiler.
+        """
+        if self._started_tracing:
+            self._tracemalloc.stop()
+            self._started_tracing = False
+
+    def get_traced_memory(self) -> tuple:
+        """
+        Get the traced memory, and its peak since the last reset.
+
+        Returns:
+            tuple: The memory allocated and the peak, in bytes, or zeros
+                if it's not traced.
+        """
+        if self._tracemalloc is None:
+            return 0, 0
+        return self._tracemalloc.get_traced_memory()
+
+    def enter(self, name) -> None:
+        """
+        Start a phase, nested in the running one.
+
+        Args:
+            name (str): The name of the phase.
+        """
+        stack = self._get_stack()
+        current, peak = self.get_traced_memory()
+        if self._tracemalloc is not None:
+            # Keep the peak of the running phase before measuring the new one
+            if stack:
+                stack[-1][3] = max(stack[-1][3], peak)
+            self._tracemalloc.reset_peak()
+        path = (stack[-1][0] if stack else ()) + (name,)
+        # The phases are listed in the order they start, parents first
+        with self._lock:
+            stats = self.phases.get(path)
+            if stats is None:
+                stats = self.phases[path] = PhaseStats()
+        stack.append([path, stats, time.perf_counter(), 0, current])
+
+    def exit(self) -> None:
+        """
+        End the running phase.
+        """
+        stack = self._get_stack()
+        _, stats, start, peak, start_memory = stack.pop()
+        seconds = time.perf_counter() - start
+        current, traced_peak = self.get_traced_memory()
+        peak = max(peak, traced_peak)
+        if stack:
+            stack[-1][3] = max(stack[-1][3], peak)
+        with self._lock:
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.peak_bytes = max(stats.peak_bytes, peak)
+            stats.added_bytes = max(stats.added_bytes, peak - start_memory)
+            stats.retained_bytes += current - start_memory
+
+    def format_report(self) -> str:
+        """
+        Format the report of the phases, as a table.
+
+        Returns:
+            str: The report.
+        """
+        output = io.StringIO()
+        print(f"{'Phase':<48} {'Calls':>7} {'Time (ms)':>11} {'Peak (MiB)':>11}", file=output)
+        for path, stats in self.phases.items():
+            name = '  ' * (len(path) - 1) + path[-1]
+            peak = f"{stats.peak_bytes / (1024 * 1024):.2f}" if self.trace_memory else '-'
+            print(f"{name:<48} {stats.calls:>7} {stats.seconds * 1000:>11.2f} {peak:>11}",
+                  file=output)
+        return output.getvalue()
+
+
+class _Phase:
+    """
+    The context of a phase, for every active profiler (or listener).
+    """
+    __slots__ = ('name', 'listeners')
+
+    def __init__(self, name):
+        self.name = name
+        self.listeners = ()
+
+    def __enter__(self):
+        # Only the listeners notified of the start are notified of the end
+        self.listeners = (*_LISTENERS, *_get_thread_listeners())
+        for index, listener in enumerate(self.listeners):
+            try:
+                listener.enter(self.name)
+            except BaseException:
+                # A listener may stop the render (e.g. the memory budget):
+                # the listeners which started the phase still end it
+                for started in reversed(self.listeners[:index]):
+                    started.exit()
+                raise
+
+    def __exit__(self, *_):
+        error = None
+        for listener in reversed(self.listeners):
+            try:
+                listener.exit()
+            except BaseException as exit_error:  # pylint: disable=broad-exception-caught
+                error = error or exit_error
+        if error is not None:
+            raise error
+
+
+def profile_phase(name):
+    """
+    Mark a phase of the render, if a profile is being recorded.
+
+    Args:
+        name (str): The name of the phase.
+
+    Returns:
+        The context of the phase (which does nothing if no profile is
+        being recorded).
+    """
+    if not _LISTENERS and not getattr(_LOCAL, 'listeners', None):
+        return _NULL_CONTEXT
+    return _Phase(name)
+
+
+@contextmanager
+def listen_phases(listener, all_threads=False):
+    """
+    Notify a listener of the phases run while the context is active.
+
+    Args:
+        listener: An object with an enter(name) method, called when a phase
+            starts, and an exit() method, called when it ends.
+        all_threads (bool): Whether to notify it of the phases of every
+            thread, or only of those of the current thread. Default is
+            False.
+
+    Yields:
+        The listener.
+    """
+    listeners = _LISTENERS if all_threads else _get_thread_listeners()
+    listeners.append(listener)
+    try:
+        yield listener
+    finally:
+        listeners.remove(listener)
+
+
+@contextmanager
+def profile(trace_memory=True, cprofile_file=None):
+    """
+    Profile the renders run by the current thread while the context is
+    active.
+
+    Args:
+        trace_memory (bool): Whether to measure the peak memory of every
+            phase, with tracemalloc. It slows the render down, so the
+            times are inflated. The memory is traced for the whole process,
+            so only one render should be profiled with it at a time.
+            Default is True.
+        cprofile_file (str): If given, the render is also profiled with
+            cProfile, and its statistics are written to this file (to be
+            read with pstats, snakeviz...).
+
+    Yields:
+        Profiler: The profiler, with the phases recorded so far.
+    """
+    profiler = Profiler(trace_memory)
+    cprofiler = None
+    if cprofile_file is not None:
+        import cProfile  # pylint: disable=import-outside-toplevel
+
+        cprofiler = cProfile.Profile()
+    profiler.start()
+    if cprofiler is not None:
+        cprofiler.enable()
+    try:
+        with listen_phases(profiler):
+            yield profiler
+    finally:
+        if cprofiler is not None:
+            cprofiler.disable()
+            cprofiler.dump_stats(cprofile_file)
+        profiler.stop()
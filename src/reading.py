@@ -0,0 +1,59 @@
+"""
+This module is used to read the input files (configs and templates)
+without loading them fully into memory. The files are memory-mapped and the
+YAML reader is fed from the mapping, decoding it incrementally, so even big
+generated configs are never held as a whole in a Python string.
+"""
+from contextlib import contextmanager, nullcontext
+import mmap
+import os
+
+from src.stats import BYTES_READ, count
+
+
+class MappedFile:  # pylint: disable=too-few-public-methods
+    """
+    A read-only view of a memory-mapped file, exposing just what the YAML
+    reader needs: a read method returning bytes, and the name of the file
+    (used in the error messages).
+    """
+    __slots__ = ('name', '_mapped_file')
+
+    def __init__(self, name, mapped_file):
+        self.name = name
+        self._mapped_file = mapped_file
+
+    def read(self, size=-1) -> bytes:
+        """
+        Read bytes from the current position of the mapping.
+
+        Args:
+            size (int): The number of bytes to read. Reads until the end
+                if negative.
+
+        Returns:
+            bytes: The bytes read.
+        """
+        if self._mapped_file is None:
+            return b''
+        return self._mapped_file.read(size)
+
+
+@contextmanager
+def open_mapped(path):
+    """
+    Open a file as a MappedFile.
+
+    Args:
+        path (str): The path to the file.
+
+    Yields:
+        MappedFile: The mapped file. It must not be used after the context exits.
+    """
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        count(BYTES_READ, size)
+        # Empty files can't be mapped
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else nullcontext()
+        with mapping as mapped_file:
+            yield MappedFile(path, mapped_file)
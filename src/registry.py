@@ -0,0 +1,361 @@
+"""
+This module is used to fetch templates from a template registry over HTTP.
+A template can be referenced as `registry://org/name@version` (the version
+defaults to 'latest'), which is fetched from
+`<YAMELINNO_REGISTRY>/org/name/version`.
+
+The fetched templates are kept in a content-addressed cache
+(YAMELINNO_CACHE, by default ~/.cache/yamelinno/registry): every template is
+stored under its SHA-256 hash, and an index maps every reference to its hash
+and ETag. Cached templates are revalidated with the ETag (so unchanged
+templates are not downloaded again), and used as they are when the registry
+can't be reached, fails with a server error (5xx) or YAMELINNO_OFFLINE is
+set. The index can be shared by several processes: it's replaced atomically,
+merging the entries written by the others since it was read, and a corrupt
+index is treated as an empty cache. The HTTP connections are kept alive and
+reused, and the references of a config can be prefetched concurrently.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import queue
+import threading
+from urllib.parse import urlsplit
+
+from src.stats import count_cache
+
+REGISTRY_SCHEME = 'registry://'
+DEFAULT_VERSION = 'latest'
+REQUEST_TIMEOUT = 30
+
+
+def is_registry_reference(path) -> bool:
+    """
+    Check if a template path is a registry reference.
+
+    Args:
+        path (str): The template path.
+
+    Returns:
+        bool: True if the path uses the registry:// scheme.
+    """
+    return isinstance(path, str) and path.startswith(REGISTRY_SCHEME)
+
+
+def parse_registry_reference(reference) -> tuple:
+    """
+    Split a registry reference into its name and version.
+
+    Args:
+        reference (str): The reference, e.g. registry://org/name@1.0.
+
+    Returns:
+        tuple: The name (e.g. 'org/name') and the version (e.g. '1.0').
+
+    Raises:
+        ValueError: If the reference has no name.
+    """
+    name = reference[len(REGISTRY_SCHEME):]
+    name, _, version = name.partition('@')
+    name = name.strip('/')
+    if not name:
+        raise ValueError(f"Invalid registry reference: {reference}")
+    return name, version or DEFAULT_VERSION
+
+
+class ConnectionPool:
+    """
+    A pool of keep-alive HTTP connections, one queue per host.
+    """
+
+    def __init__(self, timeout=REQUEST_TIMEOUT):
+        self.timeout = timeout
+        self.connections: dict = {}
+        self.lock = threading.Lock()
+
+    def _get_queue(self, scheme, netloc) -> queue.LifoQueue:
+        with self.lock:
+            return self.connections.setdefault((scheme, netloc), queue.LifoQueue())
+
+    def _connect(self, scheme, netloc):
+        # http.client is only imported when the registry is actually used
+        import http.client  # pylint: disable=import-outside-toplevel
+
+        if scheme == 'https':
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def request(self, url, headers=None) -> tuple:
+        """
+        Send a GET request, reusing an idle connection to the host if there
+        is one. A reused connection closed by the server is retried once.
+
+        Args:
+            url (str): The URL to get.
+            headers (dict): The request headers.
+
+        Returns:
+            tuple: The status, the response headers (as a dict with lowercase
+                names) and the body.
+        """
+        import http.client  # pylint: disable=import-outside-toplevel
+
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        idle_connections = self._get_queue(parts.scheme, parts.netloc)
+        try:
+            connection = idle_connections.get_nowait()
+            reused = True
+        except queue.Empty:
+            connection = self._connect(parts.scheme, parts.netloc)
+            reused = False
+        try:
+            connection.request('GET', path, headers=headers or {})
+            response = connection.getresponse()
+            body = response.read()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            connection.close()
+            if not reused:
+                raise
+            return self.request(url, headers)
+        except Exception:
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            idle_connections.put(connection)
+        response_headers = {name.lower(): value for name, value in response.getheaders()}
+        return response.status, response_headers, body
+
+    def close(self) -> None:
+        """
+        Close every idle connection.
+        """
+        with self.lock:
+            for idle_connections in self.connections.values():
+                while not idle_connections.empty():
+                    idle_connections.get_nowait().close()
+            self.connections.clear()
+
+
+class TemplateRegistry:
+    """
+    A template registry, with its content-addressed cache.
+    """
+
+    def __init__(self, base_url, cache_dir, offline=False):
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self.pool = ConnectionPool()
+        self.lock = threading.Lock()
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        self.index: dict = self._read_index()
+
+    def get_url(self, reference) -> str:
+        """
+        Get the URL of a registry reference.
+
+        Args:
+            reference (str): The registry reference.
+
+        Returns:
+            str: The URL of the template in the registry.
+        """
+        name, version = parse_registry_reference(reference)
+        return f"{self.base_url}/{name}/{version}"
+
+    def get_blob_path(self, content_hash) -> str:
+        """
+        Get the path of a cached template.
+
+        Args:
+            content_hash (str): The SHA-256 hash of the template.
+
+        Returns:
+            str: The path to the cached template.
+        """
+        return os.path.join(self.cache_dir, 'blobs', f"{content_hash}.yml")
+
+    def lookup(self, reference):
+        """
+        Get the cached template for a reference, without contacting the registry.
+
+        Args:
+            reference (str): The registry reference.
+
+        Returns:
+            str: The path to the cached template, or None if it is not cached.
+        """
+        entry = self.index.get(reference)
+        if entry is None:
+            return None
+        blob_path = self.get_blob_path(entry['sha256'])
+        return blob_path if os.path.exists(blob_path) else None
+
+    def _store(self, reference, body, etag) -> str:
+        content_hash = hashlib.sha256(body).hexdigest()
+        blob_path = self.get_blob_path(content_hash)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            temporary_file = f"{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary_file, 'wb') as file:
+                file.write(body)
+            os.replace(temporary_file, blob_path)
+        with self.lock:
+            self.index[reference] = {'sha256': content_hash, 'etag': etag}
+            self._save_index(reference)
+        return blob_path
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            # A missing or corrupt index is an empty cache
+            return {}
+        return index if isinstance(index, dict) else {}
+
+    def _save_index(self, reference) -> None:
+        # The entries written by other processes since the index was read
+        # are kept, only the entry of the reference is replaced
+        index = self._read_index()
+        index[reference] = self.index[reference]
+        self.index.update(index)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temporary_file = f"{self.index_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_file, 'w', encoding='utf-8') as file:
+            json.dump(index, file, indent=2, sort_keys=True)
+        os.replace(temporary_file, self.index_file)
+
+    def fetch(self, reference) -> str:
+        """
+        Fetch a template, revalidating the cached copy if there is one.
+        If the registry can't be reached or fails with a server error, the
+        cached copy is used.
+
+        Args:
+            reference (str): The registry reference.
+
+        Returns:
+            str: The path to the cached template.
+
+        Raises:
+            FileNotFoundError: If the template is not in the registry, or if
+                the registry can't be reached and the template is not cached.
+        """
+        count_cache('registry', self.lookup(reference) is not None)
+        return self._fetch(reference)
+
+    def _fetch(self, reference) -> str:
+        cached_path = self.lookup(reference)
+        if self.offline or self.base_url is None:
+            if cached_path is None:
+                raise FileNotFoundError(
+                    f"Input template {reference} not found in the registry cache")
+            return cached_path
+        import http.client  # pylint: disable=import-outside-toplevel
+
+        headers = {}
+        if cached_path is not None and self.index[reference].get('etag'):
+            headers['If-None-Match'] = self.index[reference]['etag']
+        try:
+            status, response_headers, body = self.pool.request(
+                self.get_url(reference), headers)
+        except (OSError, http.client.HTTPException) as error:
+            # A registry which can't be reached, or which sends a broken response
+            if cached_path is not None:
+                return cached_path
+            raise FileNotFoundError(
+                f"Input template {reference} could not be fetched: {error}") from error
+        if cached_path is not None and (status == 304 or status >= 500):
+            return cached_path
+        if status != 200:
+            raise FileNotFoundError(
+                f"Input template {reference} not found in the registry (HTTP {status})")
+        return self._store(reference, body, response_headers.get('etag'))
+
+    def prefetch(self, references, max_workers=8) -> dict:
+        """
+        Fetch several templates concurrently.
+
+        Args:
+            references (iterable): The registry references.
+            max_workers (int): The number of concurrent requests.
+
+        Returns:
+            dict: The path to the cached template of every reference.
+        """
+        references = sorted(set(references))
+        # Counted by this thread, as the statistics are collected per thread
+        for reference in references:
+            count_cache('registry', self.lookup(reference) is not None)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(references, executor.map(self._fetch, references)))
+
+
+_REGISTRIES: dict = {}
+
+
+def get_registry() -> TemplateRegistry:
+    """
+    Get the registry configured by the environment variables:
+    YAMELINNO_REGISTRY (the base URL), YAMELINNO_CACHE (the cache directory)
+    and YAMELINNO_OFFLINE (use only the cache). Registries are reused, so
+    their connections and index are shared.
+
+    Returns:
+        TemplateRegistry: The registry.
+    """
+    base_url = os.environ.get('YAMELINNO_REGISTRY')
+    cache_dir = os.environ.get(
+        'YAMELINNO_CACHE',
+        os.path.join(os.path.expanduser('~'), '.cache', 'yamelinno', 'registry'))
+    offline = os.environ.get('YAMELINNO_OFFLINE', '') not in ('', '0', 'false')
+    key = (base_url, cache_dir, offline)
+    if key not in _REGISTRIES:
+        _REGISTRIES[key] = TemplateRegistry(base_url, cache_dir, offline)
+    return _REGISTRIES[key]
+
+
+def is_registry_template(path) -> bool:
+    """
+    Check if a path is a template fetched from one of the registries used,
+    i.e. a template in the cache of a registry.
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        bool: True if the file is in the cache of a registry.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    return any(
+        directory == os.path.dirname(os.path.abspath(registry.get_blob_path('')))
+        for registry in _REGISTRIES.values()
+    )
+
+
+def get_registry_references(config) -> list:
+    """
+    Get the registry references in the 'templates' list of a config.
+
+    Args:
+        config (dict): The loaded config.
+
+    Returns:
+        list: The registry references.
+    """
+    references = []
+    if not isinstance(config, dict):
+        return references
+    for template_reference in config.get('templates') or []:
+        path = template_reference.get('path') if isinstance(template_reference, dict) \
+            else template_reference
+        if is_registry_reference(path):
+            references.append(path)
+    return references
@@ -0,0 +1,348 @@
+"""
+This module contains the Renderer class, the entry point for using the tool
+as a library. A renderer is created once, with a schema and the directories
+to search the templates in, and then renders any number of configs (given
+as files, YAML strings or dictionaries):
+
+    renderer = Renderer('base-schema.yml', template_dirs=['templates'])
+    script = renderer.render_file('setup.yml')
+
+The schema is loaded once, and the parsed templates, packs and schemas are
+kept in the caches of the tool, which are shared by every renderer and only
+parse a file again when it changes. A renderer can be used from several
+threads at once.
+
+For asyncio programs, render_file_async renders a config without blocking
+the event loop:
+
+    semaphore = asyncio.Semaphore(8)
+    await asyncio.gather(*(
+        render_file_async(path, output, renderer, semaphore)
+        for path, output in installers))
+
+The templates of the config are searched and parsed concurrently (every
+blocking step running in a thread), and the config is then merged and
+rendered in a thread. The semaphore bounds the number of threads running
+at once, across every render sharing it.
+"""
+import asyncio
+import copy
+import io
+import os
+
+import yaml
+
+from src.placeholders import parse_template
+from src.reading import open_mapped
+from src.rendering import load_schema, open_output, render_to_stream
+from src.schema import Schema, compile_schema
+from src.stats import YAML_DOCUMENTS, count
+from src.templates import load_config, resolve_config, search_template
+from src.validation import validate_config
+
+# The name given to configs which are not read from a file. Their templates
+# and raw files are searched from the base directory of the render.
+VIRTUAL_CONFIG_NAME = '<config>'
+# The number of blocking jobs (reads, parsing, renders) run at once by the
+# async API, when no semaphore is given
+DEFAULT_CONCURRENCY = min(32, (os.cpu_count() or 1) + 4)
+
+
+class Renderer:
+    """
+    Renders configs with a schema, searching the templates in a list of
+    directories (after the directory of the config itself).
+    """
+
+    def __init__(self, schema='base-schema.yml', template_dirs=None, compact=True):
+        """
+        Args:
+            schema (str | dict | Schema): The schema: a path to a schema file
+                (searched like in the CLI), or an already loaded schema.
+                Default is "base-schema.yml".
+            template_dirs (list): More directories to search the templates
+                in. Default is None.
+            compact (bool): Whether to store the lists of entries as
+                EntryTables, which use much less memory for big configs.
+                Default is True.
+
+        Raises:
+            FileNotFoundError: If the schema file is not found.
+        """
+        if isinstance(schema, (str, os.PathLike)):
+            schema = load_schema(os.fspath(schema))
+        elif not isinstance(schema, Schema):
+            schema = compile_schema(schema)
+        self.schema = schema
+        self.template_dirs = [os.fspath(directory) for directory in template_dirs or []]
+        self.compact = compact
+
+    def load_file(self, config_file) -> dict:
+        """
+        Load a config file, merging its templates, and validate it.
+
+        Args:
+            config_file (str): The path to the config file.
+
+        Returns:
+            dict: The merged config.
+
+        Raises:
+            FileNotFoundError: If the config file, or a template or raw file
+                it references, is not found.
+            KeyError: If a required section or key is missing, or if a key
+                is not in the schema.
+            TypeError: If a value doesn't have the type given by the schema.
+        """
+        config = load_config(
+            os.fspath(config_file), compact=self.compact, search_paths=self.template_dirs)
+        validate_config(config, self.schema)
+        return config
+
+    def load_dict(self, config, base_dir='.') -> dict:
+        """
+        Merge the templates of a config dictionary, and validate it. The
+        dictionary itself is left untouched.
+
+        Args:
+            config (dict): The config, as loaded from a config file.
+            base_dir (str): The directory the relative paths of the config
+                (templates and raw files) are relative to. Default is the
+                current directory.
+
+        Returns:
+            dict: The merged config.
+
+        Raises:
+            FileNotFoundError: If a template or raw file is not found.
+            KeyError: If a required section or key is missing, or if a key
+                is not in the schema.
+            TypeError: If a value doesn't have the type given by the schema.
+        """
+        return self.resolve(copy.deepcopy(config), base_dir)
+
+    def resolve(self, config, base_dir='.') -> dict:
+        """
+        Merge the templates of a config dictionary, and validate it. Unlike
+        load_dict, the dictionary is modified in place, so it must not be
+        used again.
+
+        Args:
+            config (dict): The config, as loaded from a config file.
+            base_dir (str): The directory the relative paths of the config
+                are relative to. Default is the current directory.
+
+        Returns:
+            dict: The merged config.
+
+        Raises:
+            FileNotFoundError: If a template or raw file is not found.
+            KeyError: If a required section or key is missing, or if a key
+                is not in the schema.
+            TypeError: If a value doesn't have the type given by the schema.
+        """
+        config_file = os.path.join(os.fspath(base_dir), VIRTUAL_CONFIG_NAME)
+        config = resolve_config(config, config_file, self.compact, self.template_dirs)
+        validate_config(config, self.schema)
+        return config
+
+    def render_to_stream(self, config, stream, base_dir='.') -> None:
+        """
+        Render a config dictionary, writing every section to a stream as
+        soon as it is rendered.
+
+        Args:
+            config (dict): The config, as loaded from a config file.
+            stream (io.TextIOBase): The stream to write the script to.
+            base_dir (str): The directory the relative paths of the config
+                are relative to. Default is the current directory.
+        """
+        render_to_stream(self.load_dict(config, base_dir), self.schema, stream)
+
+    def render_dict(self, config, base_dir='.') -> str:
+        """
+        Render a config dictionary.
+
+        Args:
+            config (dict): The config, as loaded from a config file.
+            base_dir (str): The directory the relative paths of the config
+                are relative to. Default is the current directory.
+
+        Returns:
+            str: The rendered script.
+        """
+        output = io.StringIO()
+        self.render_to_stream(config, output, base_dir)
+        return output.getvalue()
+
+    def render_string(self, source, base_dir='.') -> str:
+        """
+        Render a config given as a YAML string.
+
+        Args:
+            source (str): The config, in YAML.
+            base_dir (str): The directory the relative paths of the config
+                are relative to. Default is the current directory.
+
+        Returns:
+            str: The rendered script.
+
+        Raises:
+            ValueError: If the YAML document is not a mapping.
+            KeyError: If the config is not valid for the schema (see load_file).
+            TypeError: If the config is not valid for the schema (see load_file).
+        """
+        config = yaml.load(source, Loader=yaml.FullLoader)
+        count(YAML_DOCUMENTS)
+        if not isinstance(config, dict):
+            raise ValueError("The config must be a YAML mapping")
+        output = io.StringIO()
+        render_to_stream(self.resolve(config, base_dir), self.schema, output)
+        return output.getvalue()
+
+    def render_file(self, config_file, output_file=None):
+        """
+        Render a config file.
+
+        Args:
+            config_file (str): The path to the config file.
+            output_file (str): The path to write the script to. If None,
+                the script is returned instead.
+
+        Returns:
+            str: The rendered script, or None if it was written to a file.
+        """
+        config = self.load_file(config_file)
+        if output_file is None:
+            output = io.StringIO()
+            render_to_stream(config, self.schema, output)
+            return output.getvalue()
+        with open_output(output_file) as file:
+            render_to_stream(config, self.schema, file)
+        return None
+
+
+def read_config(config_file) -> dict:
+    """
+    Read a config file, without merging its templates.
+
+    Args:
+        config_file (str): The path to the config file.
+
+    Returns:
+        dict: The config.
+    """
+    with open_mapped(config_file) as file:
+        config = yaml.load(file, Loader=yaml.FullLoader)
+    count(YAML_DOCUMENTS)
+    return config
+
+
+def get_template_paths(node) -> list:
+    """
+    Get the paths of the templates referenced by a config or a template,
+    leaving out the ones that depend on template inputs.
+
+    Args:
+        node (dict): The config, or the tree of a parsed template.
+
+    Returns:
+        list: The template paths.
+    """
+    if not isinstance(node, dict) or not isinstance(node.get('templates'), list):
+        return []
+    paths = []
+    for reference in node['templates']:
+        if isinstance(reference, dict):
+            reference = reference.get('path')
+        if isinstance(reference, str):
+            paths.append(reference)
+    return paths
+
+
+async def run_blocking(semaphore, function, *args):
+    """
+    Run a blocking function in a thread, once the semaphore allows it.
+
+    Args:
+        semaphore (asyncio.Semaphore): The semaphore bounding the threads.
+        function (callable): The function.
+        *args: The arguments of the function.
+
+    Returns:
+        The result of the function.
+    """
+    async with semaphore:
+        return await asyncio.to_thread(function, *args)
+
+
+async def prefetch_templates(node, directories, semaphore, visited) -> None:
+    """
+    Search and parse the templates referenced by a config or a template,
+    and their children templates, concurrently. The parsed templates are
+    cached, so merging the config afterwards doesn't read them again.
+
+    Errors are ignored: they are raised again (with their usual context)
+    when the config is merged.
+
+    Args:
+        node (dict): The config, or the tree of a parsed template.
+        directories (list): The directories to search the templates in.
+        semaphore (asyncio.Semaphore): The semaphore bounding the threads.
+        visited (set): The templates already prefetched.
+    """
+    async def prefetch(template):
+        try:
+            path = os.path.abspath(
+                await run_blocking(semaphore, search_template, template, directories))
+            if path in visited:
+                return
+            visited.add(path)
+            parsed_template = await run_blocking(semaphore, parse_template, path)
+        except (OSError, ValueError, yaml.YAMLError):
+            return
+        await prefetch_templates(
+            parsed_template.tree, [os.path.dirname(path)] + directories[1:],
+            semaphore, visited)
+
+    await asyncio.gather(*(prefetch(template) for template in get_template_paths(node)))
+
+
+async def render_file_async(config_file, output_file=None, renderer=None, semaphore=None):
+    """
+    Render a config file without blocking the event loop.
+
+    Args:
+        config_file (str): The path to the config file.
+        output_file (str): The path to write the script to. If None, the
+            script is returned instead.
+        renderer (Renderer): The renderer. If None, a renderer with the
+            base schema is created.
+        semaphore (asyncio.Semaphore): The semaphore bounding the number
+            of threads running at once, which can be shared by concurrent
+            renders. If None, a semaphore for this render is created.
+
+    Returns:
+        str: The rendered script, or None if it was written to a file.
+    """
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(DEFAULT_CONCURRENCY)
+    if renderer is None:
+        renderer = await run_blocking(semaphore, Renderer)
+    config_file = os.fspath(config_file)
+    config = await run_blocking(semaphore, read_config, config_file)
+    base_dir = os.path.dirname(os.path.abspath(config_file))
+    await prefetch_templates(
+        config, [base_dir] + renderer.template_dirs, semaphore, set())
+
+    def render_config():
+        resolved_config = renderer.resolve(config, base_dir)
+        if output_file is None:
+            output = io.StringIO()
+            render_to_stream(resolved_config, renderer.schema, output)
+            return output.getvalue()
+        with open_output(output_file) as file:
+            render_to_stream(resolved_config, renderer.schema, file)
+        return None
+
+    return await run_blocking(semaphore, render_config)
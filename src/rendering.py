@@ -2,8 +2,19 @@
 This module is used to render the config file, from yaml to the
 iss format. The iss format is expressed in yaml.
 """
-import yaml
-
+from contextlib import contextmanager
+import io
+import os
+import shutil
+import threading
+
+from src.caching import FileCache
+from src.entries import EntryTable, make_entry
+from src.globbing import allows_glob_entries, expand_glob_entry, is_glob_entry
+from src.packs import get_input_id, read_pack_member, split_pack_path
+from src.profiling import profile_phase
+from src.schema import Schema, as_section_def, compile_schema, parse_schema
+from src.stats import BYTES_READ, count
 from src.validation import search_input_file
 
 def search_schema(schema_file) -> str:
@@ -22,24 +33,39 @@ def search_schema(schema_file) -> str:
     """
     return search_input_file(input_file=schema_file, kind='schema')
 
-def load_schema(schema_file) -> dict:
+_SCHEMAS = FileCache(name='schemas')
+
+
+def load_schema(schema_file) -> Schema:
     """
-    Load the schema file.
+    Load the schema file. Its sections are compiled into SectionDef nodes
+    the first time they are used (see parse_schema). The loaded schema is
+    cached, so it's only loaded again if the file changes.
 
     Args:
-        schema_file (str): The path to the schema file.
+        schema_file (str): The path to the schema file. It can be inside a
+            template pack.
 
     Returns:
-        dict: The loaded schema as a dictionary.
+        Schema: The loaded schema, a dictionary of compiled section definitions.
 
     Raises:
         FileNotFoundError: If the schema file does not exist.
         yaml.YAMLError: If there is an error parsing the schema file.
     """
-    schema_file = search_schema(schema_file)
-    with open(schema_file, 'r', encoding='utf-8') as file:
-        schema = yaml.load(file, Loader=yaml.FullLoader)
-        return schema
+    path = os.path.abspath(search_schema(schema_file))
+    file_id = get_input_id(path)
+    schema = _SCHEMAS.get(path, file_id)
+    if schema is None:
+        if split_pack_path(path) is not None:
+            source = read_pack_member(path).decode('utf-8')
+        else:
+            with open(path, 'r', encoding='utf-8') as file:
+                source = file.read()
+            count(BYTES_READ, len(source.encode('utf-8')))
+        schema = parse_schema(source)
+        _SCHEMAS.put(path, file_id, schema)
+    return schema
 
 
 def render_value(value, target_type=None) -> str:
@@ -64,7 +90,7 @@ def render_value(value, target_type=None) -> str:
     """
     if target_type:
         print(f"Target type specifying is not supported yet. Value: {value}")
-    if isinstance(value, list):
+    if isinstance(value, (list, tuple)):
         # If the value is a list, render it as space-separated values
         return " ".join(value)
     if isinstance(value, str):
@@ -91,12 +117,14 @@ def render_key(key, value, section_definition) -> str:
     Returns:
         str: The rendered key-value pair in the format <rendered_name>=<value>.
     """
-    key_definition = section_definition['keys'][key]
+    section_definition = as_section_def(section_definition)
+    if section_definition.keys is None or key not in section_definition.keys:
+        raise KeyError(f"Key '{key}' not found in section definition")
 
     # Render the key
     # Every key has a 'renderedName' field, which must be used as:
     # <renderedName>=<value>\
-    rendered_name = key_definition['renderedName']
+    rendered_name = section_definition.keys[key].rendered_name
     return f"{rendered_name}={render_value(value)}"
 
 
@@ -116,27 +144,92 @@ def render_entry(entry, section_definition) -> str:
         KeyError: If a key in the entry is not found in the section definition.
         KeyError: If a required key is missing in the entry.
     """
-    # An entry is a dictionary. We need to verify that all keys in the entry
-    # are present in the section_definition
-    for key, value in entry.items():
-        if key not in section_definition['entry']:
+    section_definition = as_section_def(section_definition)
+    # An entry is a dictionary. We need to verify that all its keys are
+    # present in the section_definition, and that no required key is missing
+    rendered_names = get_rendered_names(tuple(entry), section_definition)
+    return "; ".join(
+        f"{rendered_name}: {render_value(value)}"
+        for rendered_name, value in zip(rendered_names, entry.values())
+    )
+
+
+def get_rendered_names(shape, section_definition) -> tuple:
+    """
+    Validate the keys of an entry shape (the tuple of keys of an entry)
+    and get their rendered names.
+
+    Args:
+        shape (tuple): The keys of the entry, in order.
+        section_definition (SectionDef): The section definition.
+
+    Returns:
+        tuple: The rendered names of the keys, in the same order.
+
+    Raises:
+        KeyError: If a key in the shape is not found in the section definition.
+        KeyError: If a required key is missing in the shape.
+    """
+    entry_definition = section_definition.entry or {}
+    for key in shape:
+        if key not in entry_definition:
             raise KeyError(f"Key '{key}' not found in entry definition")
-        # Now that we know that all keys are present in the section_definition
-        # we need to check if every required key is present in the entry
-        required_keys = [
-            k for k, v in section_definition['entry'].items()
-            if v.get('required', False)
-        ]
-        for required_key in required_keys:
-            if required_key not in entry:
-                raise KeyError(f"Required key '{required_key}' not found in entry")
-        rendered_entry = ""
-        for key, value in entry.items():
-            rendered_name = section_definition['entry'][key]['renderedName']
-            rendered_entry += f"{rendered_name}: {render_value(value)}"
-            rendered_entry += "; "
-        rendered_entry = rendered_entry[:-2]  # Remove the last space and semicolon
-        return rendered_entry
+    for required_key in section_definition.required_keys:
+        if required_key not in shape:
+            raise KeyError(f"Required key '{required_key}' not found in entry")
+    return tuple(entry_definition[key].rendered_name for key in shape)
+
+
+def render_entry_table(entry_table, section_definition) -> str:
+    """
+    Render the entries of an EntryTable, one per line. The keys are checked
+    and their rendered names looked up once for every distinct shape.
+
+    Args:
+        entry_table (EntryTable): The entries to be rendered.
+        section_definition (dict): The section definition.
+
+    Returns:
+        str: The rendered entries, each one followed by a newline.
+    """
+    section_definition = as_section_def(section_definition)
+    glob_entries = allows_glob_entries(section_definition)
+    names_by_shape = {}
+    rendered_entries = []
+    for shape, values in entry_table.rows():
+        if glob_entries and 'sourceGlob' in shape:
+            rendered_entries.append(
+                render_glob_entry(make_entry(shape, values), section_definition))
+            continue
+        rendered_names = names_by_shape.get(shape)
+        if rendered_names is None:
+            rendered_names = names_by_shape[shape] = \
+                get_rendered_names(shape, section_definition)
+        rendered_entries.append("; ".join(
+            f"{rendered_name}: {render_value(value)}"
+            for rendered_name, value in zip(rendered_names, values)
+        ))
+        rendered_entries.append("\n")
+    return "".join(rendered_entries)
+
+
+def render_glob_entry(entry, section_definition) -> str:
+    """
+    Render the entries a glob entry expands to, one per line. The entries
+    are generated while the directories are scanned, and rendered as they
+    are generated.
+
+    Args:
+        entry (dict): The glob entry.
+        section_definition (dict): The section definition.
+
+    Returns:
+        str: The rendered entries, each one followed by a newline.
+    """
+    return "".join(
+        render_entry(expanded_entry, section_definition) + "\n"
+        for expanded_entry in expand_glob_entry(entry)
+    )
 
 
 def render_raw(raw_str, section_definition) -> str:
@@ -154,12 +247,67 @@ def render_raw(raw_str, section_definition) -> str:
         KeyError: If the section has incompatible children type.
     """
     # Check if the section has a raw field
-    if section_definition['children'] != 'raw':
+    if as_section_def(section_definition).children != 'raw':
         raise KeyError("Incompatible children type found.")
     # Render the raw field
     return raw_str
 
 
+def copy_raw_file(raw_file, stream) -> None:
+    """
+    Copy a raw file into a stream, in chunks, without loading it fully.
+    Its bytes are copied unchanged, newlines included: into the binary
+    buffer of a file, or untranslated into other text streams. Files inside
+    a template pack are read as a whole.
+
+    Args:
+        raw_file (str): The path to the raw file.
+        stream (io.TextIOBase): The stream to copy the file to.
+    """
+    buffer = getattr(stream, 'buffer', None)
+    if buffer is not None:
+        # The text written so far goes first
+        stream.flush()
+    if split_pack_path(raw_file) is not None:
+        content = read_pack_member(raw_file)
+        if buffer is not None:
+            buffer.write(content)
+        else:
+            stream.write(content.decode('utf-8'))
+        return
+    if buffer is not None:
+        with open(raw_file, 'rb') as file:
+            count(BYTES_READ, os.fstat(file.fileno()).st_size)
+            shutil.copyfileobj(file, buffer)
+        return
+    with open(raw_file, 'r', encoding='utf-8', newline='') as file:
+        count(BYTES_READ, os.fstat(file.fileno()).st_size)
+        shutil.copyfileobj(file, stream)
+
+
+@contextmanager
+def open_output(output_file):
+    """
+    Open an output file to render a script into. The script is written to
+    a temporary file next to it, which replaces the output file once it's
+    complete, so a render failing halfway leaves the previous script intact.
+
+    Args:
+        output_file (str): The path to the output file.
+
+    Yields:
+        io.TextIOWrapper: The stream to write the script to.
+    """
+    temporary_file = f"{output_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary_file, 'w', encoding='utf-8') as file:
+            yield file
+        os.replace(temporary_file, output_file)
+    finally:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+
+
 def render_section(section, section_definition) -> str:
     """
     Renders a section based on its definition.
@@ -171,33 +319,70 @@ def render_section(section, section_definition) -> str:
     Returns:
         str: The rendered section as a string.
     """
+    section_definition = as_section_def(section_definition)
     # A section can be a list of key-value pairs or a list of entries
     # We need to check the type of the section
-    if 'children' not in section_definition:
-        raise KeyError(f"No children definition found for section {section['name']}")
+    if section_definition.children is None:
+        raise KeyError(
+            f"No children definition found for section {section_definition.name}")
 
     rendered_section: str = ""
     # Get the rendered name of the section
-    rendered_section += f"[{section_definition['renderedName']}]\n"
+    rendered_section += f"[{section_definition.rendered_name}]\n"
     # Check if the section has keys, entries or raw field
-    if section_definition['children'] == 'keys':
+    if section_definition.children == 'keys':
         # Render the keys
         for key, value in section.items():
             rendered_section += render_key(key, value, section_definition)
             rendered_section += "\n"
-    elif section_definition['children'] == 'entries':
+    elif section_definition.children == 'entries' and isinstance(section, EntryTable):
+        # Render the compact entries
+        rendered_section += render_entry_table(section, section_definition)
+    elif section_definition.children == 'entries':
         # Render the entries
+        glob_entries = allows_glob_entries(section_definition)
         for entry in section:
+            if glob_entries and is_glob_entry(entry):
+                rendered_section += render_glob_entry(entry, section_definition)
+                continue
             rendered_section += render_entry(entry, section_definition)
             rendered_section += "\n"
-    elif section_definition['children'] == 'raw':
-        # Render the raw field
-        raw_str = section.get('raw', '')
+    elif section_definition.children == 'raw':
+        # Render the raw field, or the content of the raw file
+        if 'raw_file' in section:
+            raw_output = io.StringIO()
+            copy_raw_file(section['raw_file'], raw_output)
+            raw_str = raw_output.getvalue()
+        else:
+            raw_str = section.get('raw', '')
         rendered_section += render_raw(raw_str, section_definition)
     rendered_section += "\n"
     return rendered_section
 
 
+def render_to_stream(config, schema, stream) -> None:
+    """
+    Render the config file using the provided schema, writing every
+    section to a stream as soon as it is rendered. Raw files are copied
+    into the stream in chunks.
+
+    Args:
+        config (dict): The configuration dictionary.
+        schema (dict): The schema dictionary.
+        stream (io.TextIOBase): The stream to write the rendered config to.
+    """
+    schema = compile_schema(schema)
+    for section_name, section in config.items():
+        with profile_phase(f"section:{section_name}"):
+            section_definition = schema[section_name]
+            if section_definition.children == 'raw' and 'raw_file' in section:
+                stream.write(f"[{section_definition.rendered_name}]\n")
+                copy_raw_file(section['raw_file'], stream)
+                stream.write("\n")
+                continue
+            stream.write(render_section(section, section_definition))
+
+
 def render(config, schema) -> str:
     """
     Render the config file using the provided schema.
@@ -209,9 +394,6 @@ def render(config, schema) -> str:
     Returns:
         str: The rendered config file.
     """
-    rendered_config = ""
-    for section_name, section in config.items():
-        section_definition = schema[section_name]
-        rendered_section = render_section(section, section_definition)
-        rendered_config += rendered_section
-    return rendered_config
+    rendered_config = io.StringIO()
+    render_to_stream(config, schema, rendered_config)
+    return rendered_config.getvalue()
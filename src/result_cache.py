@@ -0,0 +1,378 @@
+"""
+This module is used to cache whole rendered scripts, the way ccache caches
+compilations. Before loading anything, a key is computed from the tool
+version, the hash of the input file, the schema argument and the search
+settings. That key points to a manifest listing the previous renders of the
+same input: the files each one read (templates, raw files and schema) with
+their hashes, and the hash of the resulting script. If every file of an
+entry still has the same hash, the cached script is copied into place
+without even parsing the YAML.
+
+The dependencies are stored relative to the directory of the input file,
+like the key, and resolved again on every lookup, so a copy of the tree in
+another place checks its own files. They are checked cheaply: a file with
+the same size and modification time is assumed unchanged, and it's only
+hashed otherwise. Renders using glob entries or registry templates are not
+cached, as they depend on more than the files they read.
+The cache directory can be shared by many processes (e.g. CI workers): all
+files are written to a temporary file and then renamed, and the oldest
+results are evicted when the cache grows beyond its size limit.
+
+    <cache_dir>/manifests/<ab>/<key>.json
+    <cache_dir>/results/<ab>/<script hash>.iss
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from src.entries import EntryTable
+from src.globbing import GLOB_SECTION, is_glob_entry
+from src.manifest import get_file_record, hash_file
+from src.registry import is_registry_template
+
+PACKAGE_NAME = 'yamelinno'
+RESULT_CACHE_VERSION = 2
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+# The caches are trimmed to this fraction of their size limit
+EVICTION_TARGET = 0.9
+# Renders of the same input kept in a manifest (with different dependencies)
+MAX_MANIFEST_ENTRIES = 16
+# The environment variables that change which files are found
+KEY_ENVIRONMENT = ('YAMELINNO_TEMPLATES', 'YAMELINNO_SCHEMAS', 'YAMELINNO_REGISTRY')
+
+
+def get_tool_version() -> str:
+    """
+    Get the version of the tool: from the pyproject.toml of the source tree
+    when running from one, or else from the metadata of the installed
+    package (importlib.metadata is much slower to import).
+
+    Returns:
+        str: The version, or None if it can't be found.
+    """
+    import tomllib  # pylint: disable=import-outside-toplevel
+
+    pyproject_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'pyproject.toml')
+    try:
+        with open(pyproject_file, 'rb') as file:
+            return tomllib.load(file)['project']['version']
+    except (OSError, tomllib.TOMLDecodeError, KeyError):
+        pass
+    from importlib import metadata  # pylint: disable=import-outside-toplevel
+
+    try:
+        return metadata.version(PACKAGE_NAME)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def get_cache_key(input_file, schema_file, tool_version=None) -> str:
+    """
+    Compute the key of the manifest of an input file. The paths in the key
+    are relative to the input file, so copies of the same tree in other
+    places (e.g. the checkouts of several CI workers) share the key.
+
+    Args:
+        input_file (str): The path to the input file.
+        schema_file (str): The schema, as given in the command line.
+        tool_version (str): The version of the tool. Default is the version
+            of the package (see get_tool_version).
+
+    Returns:
+        str: The key, as a hexadecimal string.
+    """
+    input_directory = os.path.dirname(os.path.abspath(input_file))
+    key_data = [
+        RESULT_CACHE_VERSION,
+        tool_version or get_tool_version(),
+        hash_file(input_file),
+        schema_file,
+        # The relative paths (of the schema, the search directories and the
+        # dependencies) are relative to the working directory
+        os.path.relpath(os.getcwd(), input_directory),
+        [os.environ.get(name) for name in KEY_ENVIRONMENT],
+    ]
+    return hashlib.sha256(json.dumps(key_data).encode('utf-8')).hexdigest()
+
+
+def uses_glob_entries(config) -> bool:
+    """
+    Check if a config has glob entries. The output of those configs
+    depends on the directory trees they scan, so it can't be cached.
+
+    Args:
+        config (dict): The merged config.
+
+    Returns:
+        bool: True if the 'files' section has a glob entry.
+    """
+    section = config.get(GLOB_SECTION)
+    if isinstance(section, EntryTable):
+        return any('sourceGlob' in shape for shape in section.shapes)
+    if isinstance(section, list):
+        return any(isinstance(entry, dict) and is_glob_entry(entry) for entry in section)
+    return False
+
+
+def uses_registry_templates(dependencies) -> bool:
+    """
+    Check if a render used templates of a registry. A reference such as
+    'latest' can point to another template without any local file
+    changing, so those renders can't be cached.
+
+    Args:
+        dependencies (list): The paths of the files read by the render.
+
+    Returns:
+        bool: True if a dependency is a template fetched from a registry.
+    """
+    return any(is_registry_template(path) for path in dependencies)
+
+
+def get_relative_path(path, base_dir) -> str:
+    """
+    Get the path of a dependency relative to a directory, as it's stored.
+
+    Args:
+        path (str): The path to the dependency.
+        base_dir (str): The directory, usually the one of the input file.
+
+    Returns:
+        str: The relative path, or the absolute path if it's on another
+            drive.
+    """
+    try:
+        return os.path.relpath(os.path.abspath(path), base_dir)
+    except ValueError:
+        return os.path.abspath(path)
+
+
+def resolve_dependency(record, base_dir) -> str:
+    """
+    Resolve the path of a stored dependency.
+
+    Args:
+        record (dict): The record of the dependency.
+        base_dir (str): The directory its path is relative to.
+
+    Returns:
+        str: The path to the dependency.
+    """
+    return os.path.normpath(os.path.join(base_dir, record['path']))
+
+
+def dependencies_match(dependencies, base_dir='.') -> bool:
+    """
+    Check if the dependencies of a cached render are unchanged.
+
+    Args:
+        dependencies (list): The records of the dependencies, each with
+            its 'path', 'size', 'mtime' and 'sha256'.
+        base_dir (str): The directory the paths are relative to. Default
+            is the current directory.
+
+    Returns:
+        bool: True if every dependency still has the same hash.
+    """
+    for record in dependencies:
+        current_record = get_file_record(resolve_dependency(record, base_dir), record)
+        if current_record.get('sha256') != record['sha256']:
+            return False
+    return True
+
+
+def replace_file(path, write) -> None:
+    """
+    Write a file atomically: it's written to a temporary file next to it,
+    which is then renamed, so concurrent readers never see a partial file.
+
+    Args:
+        path (str): The path to the file.
+        write (callable): A function writing the content to a binary file.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporary_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary_file, 'wb') as file:
+            write(file)
+        os.replace(temporary_file, path)
+    finally:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+
+
+class ResultCache:
+    """
+    A cache of rendered scripts, stored in a directory.
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def get_manifest_path(self, key) -> str:
+        """
+        Get the path of the manifest of a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            str: The path to the manifest.
+        """
+        return os.path.join(self.cache_dir, 'manifests', key[:2], f"{key}.json")
+
+    def get_result_path(self, script_hash) -> str:
+        """
+        Get the path of a cached script.
+
+        Args:
+            script_hash (str): The SHA-256 hash of the script.
+
+        Returns:
+            str: The path to the cached script.
+        """
+        return os.path.join(self.cache_dir, 'results', script_hash[:2], f"{script_hash}.iss")
+
+    def load_entries(self, key) -> list:
+        """
+        Load the entries of the manifest of a key.
+
+        Args:
+            key (str): The key.
+
+        Returns:
+            list: The entries, oldest first. Empty if there is no manifest.
+        """
+        try:
+            with open(self.get_manifest_path(key), 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+        if manifest.get('version') != RESULT_CACHE_VERSION:
+            return []
+        return manifest['entries']
+
+    def lookup(self, key, base_dir='.'):
+        """
+        Find a cached script whose dependencies are unchanged.
+
+        Args:
+            key (str): The key of the input file.
+            base_dir (str): The directory the paths of the dependencies are
+                relative to: the directory of the input file. Default is
+                the current directory.
+
+        Returns:
+            dict: The matching entry, with the 'result' hash and the
+                'dependencies', or None if there is none.
+        """
+        for entry in reversed(self.load_entries(key)):
+            result_path = self.get_result_path(entry['result'])
+            if os.path.exists(result_path) and \
+                    dependencies_match(entry['dependencies'], base_dir):
+                try:
+                    # Mark the result as recently used, for the eviction
+                    os.utime(result_path)
+                except FileNotFoundError:
+                    continue
+                return entry
+        return None
+
+    def copy_result(self, entry, output_file) -> bool:
+        """
+        Copy a cached script to the output file.
+
+        Args:
+            entry (dict): The entry, as returned by lookup.
+            output_file (str): The path to the output file.
+
+        Returns:
+            bool: True if the script was copied, False if it was evicted
+                in the meantime.
+        """
+        try:
+            cached_file = open(self.get_result_path(entry['result']), 'rb')  # pylint: disable=consider-using-with
+        except FileNotFoundError:
+            return False
+        with cached_file:
+            replace_file(output_file, lambda file: shutil.copyfileobj(cached_file, file))
+        return True
+
+    def store(self, key, output_file, dependencies, base_dir='.') -> dict:
+        """
+        Store a rendered script, along with its dependencies.
+
+        Args:
+            key (str): The key of the input file.
+            output_file (str): The path to the rendered script.
+            dependencies (list): The paths of the files read to render it.
+            base_dir (str): The directory the paths of the dependencies are
+                stored relative to: the directory of the input file. Default
+                is the current directory.
+
+        Returns:
+            dict: The new entry, or None if a dependency is missing.
+        """
+        records = []
+        for path in dict.fromkeys(dependencies):
+            record = get_file_record(path)
+            if record.get('missing'):
+                # The script can't be reproduced from the cache
+                return None
+            records.append(dict(record, path=get_relative_path(path, base_dir)))
+        script_hash = hash_file(output_file)
+        result_path = self.get_result_path(script_hash)
+        if not os.path.exists(result_path):
+            with open(output_file, 'rb') as rendered_file:
+                replace_file(result_path, lambda file: shutil.copyfileobj(rendered_file, file))
+        entry = {'result': script_hash, 'dependencies': records}
+        hashes = [record['sha256'] for record in records]
+        entries = [
+            e for e in self.load_entries(key)
+            if [record['sha256'] for record in e['dependencies']] != hashes
+        ]
+        entries = (entries + [entry])[-MAX_MANIFEST_ENTRIES:]
+        manifest = json.dumps({'version': RESULT_CACHE_VERSION, 'entries': entries})
+        replace_file(
+            self.get_manifest_path(key), lambda file: file.write(manifest.encode('utf-8')))
+        self.evict()
+        return entry
+
+    def evict(self) -> int:
+        """
+        Remove the least recently used files until the cache is below its
+        size limit. Files removed concurrently by other processes are ignored.
+
+        Returns:
+            int: The number of files removed.
+        """
+        cached_files = []
+        total_size = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                cached_files.append((stat.st_mtime_ns, stat.st_size, path))
+                total_size += stat.st_size
+        if total_size <= self.max_size:
+            return 0
+        removed = 0
+        target_size = self.max_size * EVICTION_TARGET
+        for _, size, path in sorted(cached_files):
+            if total_size <= target_size:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total_size -= size
+        return removed
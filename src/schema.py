@@ -0,0 +1,583 @@
+"""
+This module contains the compiled representation of a schema. Instead of
+walking nested dictionaries, the schema is turned into small node classes
+(SectionDef and KeyDef) with interned names and pre-resolved types, which
+are cheaper to keep in memory and faster to access in the validation and
+rendering loops. The nodes still support dictionary-style access, so code
+written against the raw schema dictionaries keeps working.
+
+Schema files can also be loaded lazily (see parse_schema): the offsets of the
+top-level sections are indexed once, and every section is only parsed and
+compiled the first time it's used.
+"""
+import re
+import sys
+import threading
+
+import yaml
+
+from src.stats import YAML_DOCUMENTS, count
+
+
+def get_python_type(value: str) -> type:
+    # pylint: disable=too-many-return-statements
+    """
+    Get the Python type of a string value.
+
+    Args:
+        value (str): The string value to get the Python type of.
+
+    Returns:
+        type: The Python type of the value.
+    """
+    if value is None:
+        return None
+    if value.lower() in ['str', 'string']:
+        return str
+    if value.lower() in ['int', 'integer']:
+        return int
+    if value.lower() in ['float', 'double']:
+        return float
+    if value.lower() in ['bool', 'boolean']:
+        return bool
+    if value.lower() in ['dict', 'dictionary', 'object', 'map']:
+        return dict
+    if value.lower() in  ['list', 'array', 'sequence', 'tuple', 'collection']:
+        return list
+    raise ValueError("Invalid type")
+
+
+def _intern(value):
+    """
+    Intern a value if it is a string, so repeated names share memory.
+
+    Args:
+        value: The value to intern.
+
+    Returns:
+        The interned string, or the value unchanged.
+    """
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class SchemaNode:
+    """
+    Base class for the schema nodes. It maps the field names used in the
+    schema files (e.g. 'renderedName') to the slots of the node, so nodes
+    can be read like the dictionaries they were compiled from.
+    """
+    __slots__ = ()
+    FIELDS: dict = {}
+
+    def __getitem__(self, field):
+        value = getattr(self, self.FIELDS[field]) if field in self.FIELDS else None
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def __contains__(self, field) -> bool:
+        return field in self.FIELDS and getattr(self, self.FIELDS[field]) is not None
+
+    def get(self, field, default=None):
+        """
+        Get a field of the node, like dict.get.
+
+        Args:
+            field (str): The field name, as written in the schema file.
+            default: The value returned if the field is not set.
+
+        Returns:
+            The value of the field, or the default.
+        """
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def items(self) -> list:
+        """
+        Get the fields that are set in the node, like dict.items.
+
+        Returns:
+            list: A list of (field, value) tuples.
+        """
+        return [(field, self[field]) for field in self.FIELDS if field in self]
+
+    def to_dict(self) -> dict:
+        """
+        Convert the node back to the dictionary it was compiled from.
+
+        Returns:
+            dict: The node as a dictionary.
+        """
+        node_dict = {}
+        for field, value in self.items():
+            if isinstance(value, dict):
+                value = {k: v.to_dict() for k, v in value.items()}
+            node_dict[field] = value
+        return node_dict
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, SchemaNode):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class KeyDef(SchemaNode):
+    """
+    The definition of a key, either in a 'keys' section or in an entry.
+    """
+    __slots__ = ('name', 'rendered_name', 'type_name', 'python_type', 'required')
+    FIELDS = {
+        'renderedName': 'rendered_name',
+        'type': 'type_name',
+        'required': 'required',
+    }
+
+    def __init__(self, name, rendered_name=None, type_name=None, required=None):
+        self.name = _intern(name)
+        self.rendered_name = _intern(rendered_name)
+        self.type_name = type_name
+        self.python_type = get_python_type(type_name)
+        self.required = required
+
+    @classmethod
+    def from_dict(cls, name, definition) -> 'KeyDef':
+        """
+        Compile a key definition from its dictionary form.
+
+        Args:
+            name (str): The name of the key.
+            definition (dict): The definition of the key.
+
+        Returns:
+            KeyDef: The compiled key definition.
+        """
+        if isinstance(definition, KeyDef):
+            return definition
+        return cls(
+            name,
+            rendered_name=definition.get('renderedName'),
+            type_name=definition.get('type'),
+            required=definition.get('required'))
+
+
+# The fields of the schema, plus the key types computed for the validation
+class SectionDef(SchemaNode):  # pylint: disable=too-many-instance-attributes
+    """
+    The definition of a section. Depending on its children type, it holds
+    the definitions of its keys or of the keys of its entries. The key types
+    used by the validation are computed once, when the section is compiled.
+    """
+    __slots__ = (
+        'name', 'rendered_name', 'children', 'required', 'keys', 'entry',
+        'key_types', 'required_keys')
+    FIELDS = {
+        'renderedName': 'rendered_name',
+        'children': 'children',
+        'required': 'required',
+        'keys': 'keys',
+        'entry': 'entry',
+    }
+
+    def __init__(self, name, rendered_name=None, children=None, required=None,
+                 keys=None, entry=None):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self.name = _intern(name)
+        self.rendered_name = _intern(rendered_name)
+        self.children = _intern(children)
+        self.required = required
+        self.keys = keys
+        self.entry = entry
+        key_defs = self.key_defs
+        self.key_types = tuple(
+            (key, key_def.python_type, bool(key_def.required))
+            for key, key_def in key_defs.items())
+        self.required_keys = tuple(
+            key for key, key_def in key_defs.items() if key_def.required)
+
+    @property
+    def key_defs(self) -> dict:
+        """
+        Get the key definitions relevant for the children type of the section.
+
+        Returns:
+            dict: The definitions of the keys for 'keys' sections, the
+                definitions of the entry keys otherwise.
+        """
+        if self.children == 'keys' or self.entry is None:
+            return self.keys or {}
+        return self.entry
+
+    @classmethod
+    def from_dict(cls, name, definition) -> 'SectionDef':
+        """
+        Compile a section definition from its dictionary form.
+
+        Args:
+            name (str): The name of the section.
+            definition (dict): The definition of the section.
+
+        Returns:
+            SectionDef: The compiled section definition.
+        """
+        if isinstance(definition, SectionDef):
+            return definition
+        keys = definition.get('keys')
+        entry = definition.get('entry')
+        return cls(
+            name,
+            rendered_name=definition.get('renderedName'),
+            children=definition.get('children'),
+            required=definition.get('required'),
+            keys=None if keys is None else compile_key_defs(keys),
+            entry=None if entry is None else compile_key_defs(entry))
+
+
+class Schema(dict):
+    """
+    A compiled schema. It is a dictionary mapping section names to their
+    SectionDef, so it can be used wherever the raw schema dictionary was.
+    """
+
+
+def compile_key_defs(key_definitions) -> dict:
+    """
+    Compile a dictionary of key definitions.
+
+    Args:
+        key_definitions (dict): The key definitions, indexed by key name.
+
+    Returns:
+        dict: The compiled KeyDef objects, indexed by interned key name.
+    """
+    return {
+        _intern(key): KeyDef.from_dict(key, definition)
+        for key, definition in key_definitions.items()
+    }
+
+
+def compile_schema(schema) -> Schema:
+    """
+    Compile a schema dictionary into SectionDef nodes.
+
+    Args:
+        schema (dict): The schema as loaded from the schema file.
+
+    Returns:
+        Schema: The compiled schema.
+    """
+    if isinstance(schema, Schema):
+        return schema
+    return Schema(
+        (_intern(name), SectionDef.from_dict(name, definition))
+        for name, definition in schema.items()
+    )
+
+
+def as_section_def(section_definition, name='') -> SectionDef:
+    """
+    Get the compiled form of a section definition, compiling it if
+    it is still a dictionary.
+
+    Args:
+        section_definition (dict | SectionDef): The section definition.
+        name (str): The name of the section, used if it has to be compiled.
+
+    Returns:
+        SectionDef: The compiled section definition.
+    """
+    if isinstance(section_definition, SectionDef):
+        return section_definition
+    return SectionDef.from_dict(name, section_definition)
+
+
+# A top-level key with no inline value, optionally followed by a comment
+TOP_LEVEL_KEY_PATTERN = re.compile(r'([A-Za-z_][\w-]*)[ \t]*:[ \t]*(?:#.*)?')
+# The 'required' field of a section, and its value
+REQUIRED_PATTERN = re.compile(r'required[ \t]*:[ \t]*([^#]*?)[ \t]*(?:#.*)?')
+# Anchors and aliases can refer to other sections, so those files are not indexed
+ANCHOR_PATTERN = re.compile(r'(?:^|[\s\[{,])[&*][^\s,\]}]', re.MULTILINE)
+
+
+def get_indentation(line) -> int:
+    """
+    Get the indentation of a line.
+
+    Args:
+        line (str): The line.
+
+    Returns:
+        int: The number of leading spaces.
+    """
+    return len(line) - len(line.lstrip(' '))
+
+
+def is_blank_or_comment(line) -> bool:
+    """
+    Check if a line is blank or only has a comment.
+
+    Args:
+        line (str): The line.
+
+    Returns:
+        bool: True if the line has no YAML content.
+    """
+    stripped = line.strip()
+    return not stripped or stripped.startswith('#')
+
+
+def index_sections(source):
+    """
+    Find the top-level sections of a schema file, without parsing it.
+
+    Args:
+        source (str): The content of the schema file.
+
+    Returns:
+        dict: The (start, end) offsets of every section, by name, in order,
+            or None if the file can't be indexed safely (e.g. it uses
+            anchors, several documents, or inline section values).
+    """
+    if ANCHOR_PATTERN.search(source):
+        return None
+    starts = []
+    position = 0
+    for line in source.splitlines(keepends=True):
+        if not is_blank_or_comment(line) and line[0] != ' ':
+            match = TOP_LEVEL_KEY_PATTERN.fullmatch(line.rstrip('\r\n'))
+            if match is None:
+                return None
+            starts.append((match.group(1), position))
+        position += len(line)
+    names = [name for name, _ in starts]
+    if not names or len(set(names)) != len(names):
+        return None
+    ends = [start for _, start in starts[1:]] + [len(source)]
+    return {name: (start, end) for (name, start), end in zip(starts, ends)}
+
+
+def is_section_required(section_source) -> bool:
+    """
+    Read the 'required' field of a section from its text, without parsing it.
+
+    Args:
+        section_source (str): The text of the section, starting with its name.
+
+    Returns:
+        bool: True if the section is required.
+    """
+    lines = [
+        line.rstrip('\r\n') for line in section_source.splitlines()[1:]
+        if not is_blank_or_comment(line)
+    ]
+    if not lines:
+        return False
+    indentation = get_indentation(lines[0])
+    for line in lines:
+        if get_indentation(line) != indentation:
+            continue
+        match = REQUIRED_PATTERN.fullmatch(line[indentation:])
+        if match is not None:
+            return bool(yaml.load(match.group(1), Loader=yaml.FullLoader))
+    return False
+
+
+class LazySchema(Schema):
+    """
+    A compiled schema whose sections are parsed and compiled on first use.
+    Only the required flags are read upfront, so the required sections can
+    be checked without compiling anything. Copies (copy(), the copy module,
+    pickle, the | operator) compile every section, and are plain Schemas.
+    Every method of dict reading or changing the sections is overridden, so
+    the sections not compiled yet are handled like the others.
+    """
+
+    def __init__(self, source, sections):
+        super().__init__()
+        self._source = source
+        self._pending = dict(sections)
+        self._names = [_intern(name) for name in sections]
+        self._lock = threading.Lock()
+        self.required_sections = [
+            name for name, (start, end) in sections.items()
+            if is_section_required(source[start:end])
+        ]
+
+    def _compile_section(self, name) -> None:
+        with self._lock:
+            if name not in self._pending:
+                return
+            start, end = self._pending[name]
+            definition = yaml.load(self._source[start:end], Loader=yaml.FullLoader)[name]
+            count(YAML_DOCUMENTS)
+            dict.__setitem__(self, name, SectionDef.from_dict(name, definition))
+            del self._pending[name]
+
+    def compile_all(self) -> None:
+        """
+        Compile the sections that were not used yet.
+        """
+        for name in list(self._pending):
+            self._compile_section(name)
+
+    def __getitem__(self, name):
+        if name in self._pending:
+            self._compile_section(name)
+        return dict.__getitem__(self, name)
+
+    def __setitem__(self, name, section_definition):
+        if name not in self:
+            self._names.append(name)
+        with self._lock:
+            self._pending.pop(name, None)
+            dict.__setitem__(self, name, section_definition)
+        required = section_definition is not None and section_definition.get('required', False)
+        if required and name not in self.required_sections:
+            self.required_sections.append(name)
+        elif not required and name in self.required_sections:
+            self.required_sections.remove(name)
+
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        with self._lock:
+            self._pending.pop(name, None)
+            if dict.__contains__(self, name):
+                dict.__delitem__(self, name)
+        self._names.remove(name)
+        if name in self.required_sections:
+            self.required_sections.remove(name)
+
+    def __contains__(self, name) -> bool:
+        return name in self._pending or dict.__contains__(self, name)
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __eq__(self, other) -> bool:
+        self.compile_all()
+        return dict.__eq__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"LazySchema({self._names!r})"
+
+    def __reduce__(self):
+        return (Schema, (self.items(),))
+
+    def __or__(self, other):
+        merged = self.copy()
+        merged.update(other)
+        return merged
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def copy(self) -> Schema:
+        """
+        Copy the schema, compiling all the sections.
+        """
+        return Schema(self.items())
+
+    def update(self, *args, **kwargs) -> None:
+        """
+        Set several section definitions, like dict.update.
+        """
+        for name, section_definition in dict(*args, **kwargs).items():
+            self[name] = section_definition
+
+    def get(self, name, default=None):
+        """
+        Get a section definition, like dict.get, compiling it if needed.
+        """
+        return self[name] if name in self else default
+
+    def pop(self, name, *default):
+        """
+        Remove a section and get its definition, like dict.pop, compiling
+        it if needed.
+        """
+        if name not in self:
+            if default:
+                return default[0]
+            raise KeyError(name)
+        section_definition = self[name]
+        del self[name]
+        return section_definition
+
+    def popitem(self) -> tuple:
+        """
+        Remove the last section, like dict.popitem, compiling it if needed.
+        """
+        if not self._names:
+            raise KeyError('popitem(): schema is empty')
+        name = self._names[-1]
+        return name, self.pop(name)
+
+    def setdefault(self, name, default=None):
+        """
+        Get a section definition, setting it first if the section is
+        missing, like dict.setdefault.
+        """
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def clear(self) -> None:
+        """
+        Remove every section, like dict.clear.
+        """
+        with self._lock:
+            self._pending.clear()
+            dict.clear(self)
+        self._names.clear()
+        self.required_sections.clear()
+
+    def keys(self) -> list:
+        """
+        Get the section names, without compiling the sections.
+        """
+        return list(self._names)
+
+    def values(self) -> list:
+        """
+        Get the section definitions, compiling all of them.
+        """
+        return [self[name] for name in self._names]
+
+    def items(self) -> list:
+        """
+        Get the (name, definition) tuples, compiling all the sections.
+        """
+        return [(name, self[name]) for name in self._names]
+
+
+def parse_schema(source) -> Schema:
+    """
+    Parse a schema from its text. If possible, the schema is indexed and
+    loaded lazily; otherwise, it's fully parsed and compiled.
+
+    Args:
+        source (str): The content of the schema file.
+
+    Returns:
+        Schema: The schema.
+    """
+    sections = index_sections(source)
+    if sections is None:
+        count(YAML_DOCUMENTS)
+        return compile_schema(yaml.load(source, Loader=yaml.FullLoader))
+    return LazySchema(source, sections)
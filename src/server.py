@@ -0,0 +1,280 @@
+"""
+This module contains the render server (`yamelinno serve`): a resident
+process, listening on a Unix domain socket, which renders configs on behalf
+of thin clients. As the server keeps running, the schemas and templates it
+parsed stay cached between requests (and are parsed again only when their
+files change), and the tool is only imported once.
+
+The requests are rendered by a pool of worker processes, each running one
+request at a time in the working directory and environment of the client.
+The protocol is one JSON line each way:
+
+    request:  {"argv": [...], "cwd": "/path", "env": {"YAMELINNO_...": ...},
+               "input": "setup:\n  appName: App\n..."}
+    response: {"status": 0, "stdout": "...", "stderr": "..."}
+
+The optional "input" is the standard input of the render, so a config can be
+sent inline (with '-' as the input file) instead of as a path.
+
+The client is enabled by setting YAMELINNO_SERVER to the path of the socket.
+If the server can't be reached, the CLI renders locally instead.
+"""
+from contextlib import redirect_stderr, redirect_stdout
+import io
+import json
+import os
+import socket
+import sys
+import tempfile
+import traceback
+
+ENV_PREFIX = 'YAMELINNO_'
+SERVER_ENV_VAR = 'YAMELINNO_SERVER'
+DEFAULT_WORKERS = os.cpu_count() or 1
+DEFAULT_CACHE_ENTRIES = 256
+
+
+def get_default_socket_path() -> str:
+    """
+    Get the default path of the server socket, in the temporary directory.
+
+    Returns:
+        str: The path to the socket.
+    """
+    user_id = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(tempfile.gettempdir(), f"yamelinno-{user_id}.sock")
+
+
+def get_request_environment() -> dict:
+    """
+    Get the environment variables of the tool, to be sent with a request.
+
+    Returns:
+        dict: The YAMELINNO_* variables, except the one enabling the client.
+    """
+    return {
+        name: value for name, value in os.environ.items()
+        if name.startswith(ENV_PREFIX) and name != SERVER_ENV_VAR
+    }
+
+
+def send_message(connection, message) -> None:
+    """
+    Send a message as a JSON line.
+
+    Args:
+        connection (socket.socket): The connection.
+        message (dict): The message.
+    """
+    connection.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+
+def receive_message(stream):
+    """
+    Receive a message sent as a JSON line.
+
+    Args:
+        stream (file): The connection, as a binary file.
+
+    Returns:
+        dict: The message, or None if the connection was closed.
+    """
+    line = stream.readline()
+    return json.loads(line) if line else None
+
+
+def init_worker(cache_entries) -> None:
+    """
+    Set up a worker process: the caches of parsed files are bounded to
+    the given number of entries. Interrupts are left to the server, which
+    stops the workers itself.
+
+    Args:
+        cache_entries (int): The number of files kept in every cache.
+    """
+    # pylint: disable=import-outside-toplevel
+    import signal
+
+    from src import packs, placeholders, rendering
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    for cache in (packs._PACKS, placeholders._PARSED_TEMPLATES, rendering._SCHEMAS):  # pylint: disable=protected-access
+        cache.max_entries = cache_entries
+
+
+def run_request(main, request) -> dict:
+    """
+    Run a request in a worker process, in the working directory and with
+    the environment of the client, and its inline input as the standard
+    input.
+
+    Args:
+        main (callable): The main function of the CLI.
+        request (dict): The request.
+
+    Returns:
+        dict: The response, with the exit status and the output.
+    """
+    os.chdir(request['cwd'])
+    for name in [name for name in os.environ if name.startswith(ENV_PREFIX)]:
+        del os.environ[name]
+    os.environ.update(request['env'])
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    status = 0
+    stdin = sys.stdin
+    sys.stdin = io.StringIO(request.get('input') or '')
+    with redirect_stdout(stdout), redirect_stderr(stderr):
+        try:
+            main(request['argv'])
+        except SystemExit as error:
+            if isinstance(error.code, int):
+                status = error.code
+            elif error.code is not None:
+                print(error.code, file=stderr)
+                status = 1
+        except Exception:  # pylint: disable=broad-exception-caught
+            traceback.print_exc(file=stderr)
+            status = 1
+        finally:
+            sys.stdin = stdin
+    return {'status': status, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+
+class RenderServer:
+    """
+    The render server, listening on a Unix domain socket.
+    """
+
+    def __init__(self, socket_path, main, workers=DEFAULT_WORKERS,
+                 cache_entries=DEFAULT_CACHE_ENTRIES):
+        self.socket_path = socket_path
+        self.main = main
+        self.workers = workers
+        self.cache_entries = cache_entries
+        self.server = None
+        self.executor = None
+
+    def start(self) -> None:
+        """
+        Start the worker pool and listen on the socket. A socket file left
+        by a server that is no longer running is replaced.
+
+        Raises:
+            OSError: If another server is already listening on the socket.
+        """
+        # pylint: disable=import-outside-toplevel
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+        import socketserver
+
+        if os.path.exists(self.socket_path):
+            if connect(self.socket_path) is not None:
+                raise OSError(f"A server is already listening on {self.socket_path}")
+            os.remove(self.socket_path)
+        # The workers are started from a clean process, not forked from
+        # this one, which runs a thread per connection
+        context = multiprocessing.get_context(
+            'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods()
+            else 'spawn')
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=context,
+            initializer=init_worker, initargs=(self.cache_entries,))
+        render_server = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            """
+            Handle a connection: read the request, run it in the pool, and
+            send the response.
+            """
+            def handle(self):
+                request = receive_message(self.rfile)
+                if request is None:
+                    return
+                response = render_server.executor.submit(
+                    run_request, render_server.main, request).result()
+                send_message(self.connection, response)
+
+        # The socket is only accessible by the user from the start
+        umask = os.umask(0o177)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(
+                self.socket_path, RequestHandler)
+        finally:
+            os.umask(umask)
+        self.server.daemon_threads = True
+
+    def serve_forever(self) -> None:
+        """
+        Handle requests until the server is shut down.
+        """
+        self.server.serve_forever()
+
+    def shutdown(self) -> None:
+        """
+        Stop the server (from another thread), the worker pool, and remove
+        the socket.
+        """
+        self.server.shutdown()
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the socket and stop the worker pool.
+        """
+        self.server.server_close()
+        self.executor.shutdown()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def connect(socket_path):
+    """
+    Connect to the server.
+
+    Args:
+        socket_path (str): The path to the socket.
+
+    Returns:
+        socket.socket: The connection, or None if the server is not running.
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except OSError:
+        connection.close()
+        return None
+    return connection
+
+
+def run_client(socket_path, argv, input_text=None):
+    """
+    Send the command line to the server, and print its output.
+
+    Args:
+        socket_path (str): The path to the socket.
+        argv (list): The command line arguments.
+        input_text (str): The standard input of the render, e.g. an inline
+            config read with '-' as the input file. Default is None.
+
+    Returns:
+        int: The exit status, or None if the server is not running (and
+            the command has to be run locally).
+    """
+    connection = connect(socket_path)
+    if connection is None:
+        return None
+    request = {'argv': argv, 'cwd': os.getcwd(), 'env': get_request_environment()}
+    if input_text is not None:
+        request['input'] = input_text
+    with connection, connection.makefile('rb') as stream:
+        send_message(connection, request)
+        response = receive_message(stream)
+    if response is None:
+        return None
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    return response['status']
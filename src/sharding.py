@@ -0,0 +1,81 @@
+"""
+This module is used to write the rendered config as several files: every
+section is written to its own fragment, and the output file becomes a small
+master script that includes them (using the #include directive of the
+InnoSetup preprocessor). A fragment is only rewritten if its content
+changed, so regenerating the script leaves the untouched sections (and
+their modification times) alone.
+"""
+import io
+import os
+
+from src.rendering import render_to_stream
+from src.schema import compile_schema
+
+
+def get_fragment_path(output_file, section_name) -> str:
+    """
+    Get the path of the fragment of a section, next to the master script.
+    For example, the 'files' section of 'setup.iss' goes to 'setup.files.iss'.
+
+    Args:
+        output_file (str): The path to the master script.
+        section_name (str): The name of the section.
+
+    Returns:
+        str: The path to the fragment.
+    """
+    stem, extension = os.path.splitext(output_file)
+    return f"{stem}.{section_name}{extension or '.iss'}"
+
+
+def write_if_changed(path, content) -> bool:
+    """
+    Write a file, unless it already has the same content.
+
+    Args:
+        path (str): The path to the file.
+        content (str): The content to write.
+
+    Returns:
+        bool: True if the file was written.
+    """
+    encoded_content = content.encode('utf-8')
+    if os.path.exists(path) and os.path.getsize(path) == len(encoded_content):
+        with open(path, 'rb') as file:
+            if file.read() == encoded_content:
+                return False
+    temporary_file = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_file, 'wb') as file:
+        file.write(encoded_content)
+    os.replace(temporary_file, path)
+    return True
+
+
+def render_sharded(config, schema, output_file) -> list:
+    """
+    Render every section of the config to its own fragment, and write a
+    master script including all of them to the output file.
+
+    Args:
+        config (dict): The configuration dictionary.
+        schema (dict): The schema dictionary.
+        output_file (str): The path to the master script.
+
+    Returns:
+        list: The paths of the files that were written, i.e. whose content
+            changed (including the master script).
+    """
+    schema = compile_schema(schema)
+    written = []
+    includes = []
+    for section_name, section in config.items():
+        fragment_path = get_fragment_path(output_file, section_name)
+        rendered_section = io.StringIO()
+        render_to_stream({section_name: section}, schema, rendered_section)
+        if write_if_changed(fragment_path, rendered_section.getvalue()):
+            written.append(fragment_path)
+        includes.append(f'#include "{os.path.basename(fragment_path)}"\n')
+    if write_if_changed(output_file, "".join(includes)):
+        written.append(output_file)
+    return written
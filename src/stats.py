@@ -0,0 +1,224 @@
+"""
+This module is used to collect the statistics of a run, written as JSON
+with --stats-json: the templates resolved, the bytes read, the YAML
+documents parsed, the hits and misses of every cache, the entries of every
+section, the bytes written and the time of every phase.
+
+The code counts its events with count, count_unique and count_cache, which
+do nothing unless the statistics are being collected (see collect_stats).
+Like the dependencies, they are collected while the context is active, for
+the thread which entered it only, so renders running concurrently in other
+threads (e.g. the requests of the server) are counted apart.
+"""
+from collections import Counter
+from contextlib import contextmanager
+import json
+import os
+import threading
+
+STATS_VERSION = 1
+TEMPLATES = 'templates'
+BYTES_READ = 'bytes_read'
+YAML_DOCUMENTS = 'yaml_documents'
+OUTPUT_BYTES = 'output_bytes'
+CACHE_PREFIX = 'cache.'
+
+# The collectors of every thread, so a render only counts its own events
+_LOCAL = threading.local()
+
+
+def _get_collectors() -> list:
+    collectors = getattr(_LOCAL, 'collectors', None)
+    if collectors is None:
+        collectors = _LOCAL.collectors = []
+    return collectors
+
+
+class RunStats:
+    """
+    The statistics collected during a run.
+    """
+
+    def __init__(self):
+        self.counters: Counter = Counter()
+        # name -> the distinct values counted
+        self.unique: dict = {}
+        # section name -> number of entries (or keys)
+        self.sections: Counter = Counter()
+
+    def get_caches(self) -> dict:
+        """
+        Get the hits and misses of every cache.
+
+        Returns:
+            dict: The hits and misses, by cache name.
+        """
+        caches: dict = {}
+        for name, value in self.counters.items():
+            if name.startswith(CACHE_PREFIX):
+                cache_name, result = name[len(CACHE_PREFIX):].rsplit('.', 1)
+                caches.setdefault(cache_name, {'hits': 0, 'misses': 0})[result] = value
+        return caches
+
+    def as_dict(self, profiler=None) -> dict:
+        """
+        Get the statistics as a dictionary, ready to be written as JSON.
+
+        Args:
+            profiler (Profiler): The profiler of the run, whose phases are
+                added to the statistics. Default is None.
+
+        Returns:
+            dict: The statistics.
+        """
+        stats = {
+            'version': STATS_VERSION,
+            'templates': {
+                'resolved': self.counters[TEMPLATES],
+                'unique': len(self.unique.get(TEMPLATES, ())),
+            },
+            'bytes_read': self.counters[BYTES_READ],
+            'yaml_documents': self.counters[YAML_DOCUMENTS],
+            'caches': self.get_caches(),
+            'sections': dict(self.sections),
+            'output_bytes': self.counters[OUTPUT_BYTES],
+        }
+        if profiler is not None:
+            stats['phases'] = {
+                '/'.join(path): {'calls': phase.calls, 'seconds': phase.seconds}
+                for path, phase in profiler.phases.items()
+            }
+        return stats
+
+
+@contextmanager
+def collect_stats():
+    """
+    Collect the statistics of the code run by the current thread while the
+    context is active.
+
+    Yields:
+        RunStats: The statistics. They are updated as the events happen.
+    """
+    stats = RunStats()
+    collectors = _get_collectors()
+    collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        collectors.remove(stats)
+
+
+def is_collecting() -> bool:
+    """
+    Check if the statistics are being collected by the current thread.
+
+    Returns:
+        bool: True if a collector is active.
+    """
+    return bool(_get_collectors())
+
+
+def count(name, amount=1) -> None:
+    """
+    Count an event, if the statistics are being collected.
+
+    Args:
+        name (str): The name of the counter.
+        amount (int): The amount to add. Default is 1.
+    """
+    for stats in _get_collectors():
+        stats.counters[name] += amount
+
+
+def count_unique(name, value) -> None:
+    """
+    Count an event, keeping track of the distinct values counted.
+
+    Args:
+        name (str): The name of the counter.
+        value: The value of the event (e.g. the path to a template).
+    """
+    for stats in _get_collectors():
+        stats.counters[name] += 1
+        stats.unique.setdefault(name, set()).add(value)
+
+
+def count_cache(cache_name, hit) -> None:
+    """
+    Count a lookup in a cache.
+
+    Args:
+        cache_name (str): The name of the cache.
+        hit (bool): Whether the value was found in the cache.
+    """
+    if is_collecting():
+        count(f"{CACHE_PREFIX}{cache_name}.{'hits' if hit else 'misses'}")
+
+
+def count_sections(config) -> None:
+    """
+    Count the entries of every section of a rendered config (the keys, for
+    the sections made of keys).
+
+    Args:
+        config (dict): The config.
+    """
+    for stats in _get_collectors():
+        for name, section in config.items():
+            stats.sections[name] += len(section) if hasattr(section, '__len__') else 1
+
+
+def count_output_files(paths) -> None:
+    """
+    Count the bytes of the output files written.
+
+    Args:
+        paths (list): The paths to the output files.
+    """
+    if is_collecting():
+        count(OUTPUT_BYTES, sum(os.path.getsize(path) for path in paths if os.path.exists(path)))
+
+
+class CountingWriter:
+    """
+    A text stream counting the bytes (in UTF-8) written to another one.
+    """
+    __slots__ = ('stream',)
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text) -> int:
+        """
+        Write text to the stream.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            int: The number of characters written.
+        """
+        count(OUTPUT_BYTES, len(text.encode('utf-8')))
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        """
+        Flush the stream.
+        """
+        self.stream.flush()
+
+
+def write_stats(stats_file, stats, profiler=None, succeeded=True) -> None:
+    """
+    Write the statistics of a run as JSON.
+
+    Args:
+        stats_file (str): The path to the file.
+        stats (RunStats): The statistics.
+        profiler (Profiler): The profiler of the run. Default is None.
+        succeeded (bool): Whether the run succeeded. Default is True.
+    """
+    with open(stats_file, 'w', encoding='utf-8') as file:
+        json.dump({**stats.as_dict(profiler), 'succeeded': succeeded}, file, indent=2)
+        file.write("\n")
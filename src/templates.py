@@ -5,10 +5,19 @@ merged in order, and the values from the last template
 are used if there are conflicts.
 """
 from typing import Dict
+import itertools
 import os
 
 import yaml
 
+from src.dependencies import add_dependency
+from src.entries import EntryTable, compact_entries
+from src.globbing import resolve_glob_entries
+from src.placeholders import instantiate_template, parse_template
+from src.profiling import profile_phase
+from src.reading import open_mapped
+from src.registry import get_registry, get_registry_references
+from src.stats import TEMPLATES, YAML_DOCUMENTS, count, count_unique
 from src.validation import search_input_file
 
 def search_template(template, directories=None):
@@ -28,91 +37,135 @@ def search_template(template, directories=None):
     return search_input_file(template, 'template', directories)
 
 
-def load_config(config_file, as_template=False, input_args=None) -> dict:
+def load_config(config_file, as_template=False, input_args=None, compact=False,
+                search_paths=None) -> dict:
     """
     Load a config file with or without templates.
     If a template has children templates, they are loaded recursively.
+    Templates are parsed only once, and then instantiated with their inputs.
 
     Args:
         config_file (str): The path to the config file.
         overwrite (bool): Whether to overwrite values from templates, instead of
             merging them. Default is False.
         as_template (bool): Whether to treat the config file as a template or not.
+        compact (bool): Whether to store the lists of entries as EntryTables,
+            which use much less memory for big configs. Default is False.
+        search_paths (list): More directories to search the templates in,
+            after the directory of the config file. Default is None.
 
     Returns:
         list: The loaded config as a dict.
 
     """
-    with open(config_file, 'r', encoding='utf-8') as file:
-        file_content = file.read()
-        if as_template:
-            file_content = render_template(file_content, input_args)
-        config = yaml.load(file_content, Loader=yaml.FullLoader)
-        if as_template:
+    if as_template:
+        parsed_template = parse_template(config_file)
+        with profile_phase('substitute'):
+            config = instantiate_template(parsed_template, input_args)
             validate_template(config)
-        # Parse the templates
-        if 'templates' not in config:
-            # This is a simple config file
-            # with no referenced templates
-            return config
-        # There are templates to parse
-        merged_config: Dict[str, str] = {}
-        for t in config['templates']:
-            # Compatibility with old templates
-            if isinstance(t, str):
-                t = {'path': t, 'inputs': None}
-            if 'path' not in t:
-                raise KeyError("Template path not specified")
-            template_args = t.get('inputs', None)
-            overwrite_destination = t.get('overwrite', False)
+    else:
+        # The file is memory-mapped, and read as it's parsed
+        with profile_phase('parse'), open_mapped(config_file) as file:
+            config = yaml.load(file, Loader=yaml.FullLoader)
+        count(YAML_DOCUMENTS)
+    return resolve_config(config, config_file, compact, search_paths)
+
+
+def resolve_config(config, config_file, compact=False, search_paths=None) -> dict:
+    """
+    Resolve the templates and raw files referenced by a loaded config,
+    merging the templates into it.
+
+    Args:
+        config (dict): The loaded config. It is modified in place.
+        config_file (str): The path to the config file. The templates are
+            searched in its directory.
+        compact (bool): Whether to store the lists of entries as EntryTables.
+            Default is False.
+        search_paths (list): More directories to search the templates in.
+            Default is None.
+
+    Returns:
+        dict: The merged config.
+    """
+    search_directories = [os.path.dirname(os.path.abspath(config_file))]
+    search_directories.extend(search_paths or [])
+    resolve_raw_files(config, config_file, search_paths)
+    resolve_glob_entries(config, config_file)
+    # Parse the templates
+    if 'templates' not in config:
+        # This is a simple config file
+        # with no referenced templates
+        return compact_entries(config) if compact else config
+    # There are templates to parse
+    merged_config: Dict[str, str] = {}
+    # Fetch the templates from the registry all at once, instead of one by one
+    registry_references = get_registry_references(config)
+    prefetched_paths = get_registry().prefetch(registry_references) \
+        if registry_references else {}
+    for t in config['templates']:
+        # Compatibility with old templates
+        if isinstance(t, str):
+            t = {'path': t, 'inputs': None}
+        if 'path' not in t:
+            raise KeyError("Template path not specified")
+        template_args = t.get('inputs', None)
+        overwrite_destination = t.get('overwrite', False)
+        with profile_phase(f"template:{t['path']}"):
             # Search for the template file, including the
             # location where the config file is
-            template_path = search_template(
-                t['path'],
-                [os.path.dirname(os.path.abspath(config_file))]
-            )
-            template = load_template(template_path, template_args)
+            with profile_phase('search'):
+                template_path = prefetched_paths.get(t['path'])
+                if template_path is None:
+                    template_path = search_template(t['path'], search_directories)
+                else:
+                    add_dependency(template_path)
+            if 'foreach' in t or 'matrix' in t:
+                template = load_template_instances(
+                    template_path, get_input_sets(t), compact, search_paths,
+                    overwrite_destination)
+            else:
+                template = load_template(template_path, template_args, compact, search_paths)
+        with profile_phase('merge'):
             merged_config = deep_merge_dicts(template, merged_config, overwrite_destination)
-        config.pop('templates', None)
+    config.pop('templates', None)
+    if compact:
+        compact_entries(config)
+    with profile_phase('merge'):
         merged_config = deep_merge_dicts(config, merged_config)
-        # Fix to move the "code" section to the end
-        if 'code' in merged_config:
-            code = merged_config.pop('code')
-            merged_config['code'] = code
-        return merged_config
+    # Fix to move the "code" section to the end
+    if 'code' in merged_config:
+        code = merged_config.pop('code')
+        merged_config['code'] = code
+    return merged_config
 
 
-def render_template(src_template, input_args=None) -> str:
+def resolve_raw_files(config, config_file, search_paths=None) -> None:
     """
-    Render a template with the provided input arguments.
-    It works by replacing the placeholders in the template,
-    such as !input_arg, with the values from the input arguments.
-    It does so reading the template as raw text and using the
-    Python string format method.
+    Resolve the 'raw_file' references of the raw sections of a config.
+    They are searched like templates, including the directory of the
+    config file, and replaced by the path found.
 
     Args:
-        src_template (dict): The source template to render.
-        input_args (dict): The input arguments to the template.
-    
-    Returns:
-        str: The rendered template as a string.
-    # TODO: Add support for !! escaping in the template
-    """
-    if input_args is None:
-        return src_template
-
-    assert isinstance(input_args, (dict, type(None))),\
-        f"Input arguments must be a dictionary. Got: {input_args}"
+        config (dict): The loaded config. It is modified in place.
+        config_file (str): The path to the config file.
+        search_paths (list): More directories to search the raw files in.
+            Default is None.
 
-    for key, value in input_args.items():
-        if "!" + key in src_template:
-            src_template = src_template.replace("!" + key, str(value))
-        else:
-            raise KeyError(f"Input argument {key} not found in template")
-    return src_template
+    Raises:
+        FileNotFoundError: If a raw file is not found.
+    """
+    if not isinstance(config, dict):
+        return
+    for section in config.values():
+        if isinstance(section, dict) and isinstance(section.get('raw_file'), str):
+            section['raw_file'] = search_template(
+                section['raw_file'],
+                [os.path.dirname(os.path.abspath(config_file))] + list(search_paths or [])
+            )
 
 
-def load_template(template_file, input_args=None) -> dict:
+def load_template(template_file, input_args=None, compact=False, search_paths=None) -> dict:
     """
     Load a template file with or without children templates.
     If a template has children templates, they are loaded recursively.
@@ -120,14 +173,98 @@ def load_template(template_file, input_args=None) -> dict:
     Args:
         template_file (str): The path to the template file.
         input_args (dict): The input arguments to the template
-        overwrite_destination (bool): Whether to overwrite values in the destination,
-            instead of merging them. Default is False.
+        compact (bool): Whether to store the lists of entries as EntryTables.
+            Default is False.
+        search_paths (list): More directories to search the children
+            templates in. Default is None.
 
     Returns:
         list: The loaded template as a dict.
 
     """
-    return load_config(template_file, as_template=True, input_args=input_args)
+    count_unique(TEMPLATES, os.path.abspath(template_file))
+    return load_config(
+        template_file, as_template=True, input_args=input_args, compact=compact,
+        search_paths=search_paths)
+
+
+def get_input_sets(template_reference) -> list:
+    """
+    Get the input sets of a template reference using 'foreach' or 'matrix'.
+    'foreach' is a list of input sets, while 'matrix' maps every input to a
+    list of values, and expands to all their combinations. In both cases,
+    the 'inputs' of the reference are shared by every input set.
+
+    Args:
+        template_reference (dict): The template reference, as found in
+            the 'templates' list.
+
+    Returns:
+        list: The input sets, one for every instance of the template.
+
+    Raises:
+        ValueError: If both 'foreach' and 'matrix' are used.
+        TypeError: If 'foreach' is not a list of dictionaries.
+        TypeError: If 'matrix' is not a dictionary of lists.
+    """
+    if 'foreach' in template_reference and 'matrix' in template_reference:
+        raise ValueError("A template can use either 'foreach' or 'matrix', not both")
+    common_args = template_reference.get('inputs') or {}
+    if 'foreach' in template_reference:
+        foreach = template_reference['foreach']
+        if not isinstance(foreach, list) or \
+                not all(isinstance(item, dict) for item in foreach):
+            raise TypeError("'foreach' must be a list of input dictionaries")
+        return [{**common_args, **item} for item in foreach]
+    matrix = template_reference['matrix']
+    if not isinstance(matrix, dict) or \
+            not all(isinstance(values, list) for values in matrix.values()):
+        raise TypeError("'matrix' must map every input to a list of values")
+    return [
+        {**common_args, **dict(zip(matrix, combination))}
+        for combination in itertools.product(*matrix.values())
+    ]
+
+
+def load_template_instances(template_file, input_sets, compact=False,
+                            search_paths=None, overwrite=False) -> dict:
+    """
+    Load several instances of the same template, one for every input set,
+    and merge them in order. The template is parsed once, and the instances
+    are merged among themselves before being merged into the config, which
+    gives the same result as including every instance on its own.
+
+    Args:
+        template_file (str): The path to the template file.
+        input_sets (list): The input arguments for every instance.
+        compact (bool): Whether to store the lists of entries as EntryTables.
+            Default is False.
+        search_paths (list): More directories to search the children
+            templates in. Default is None.
+        overwrite (bool): Whether every instance overwrites the values of
+            the previous ones, as it then overwrites the values of the
+            config. Default is False.
+
+    Returns:
+        dict: The merged instances.
+    """
+    parsed_template = parse_template(template_file)
+    merged_instances: dict = {}
+    for input_args in input_sets:
+        if isinstance(parsed_template.tree, dict) and 'templates' in parsed_template.tree:
+            # Templates with children templates are resolved one by one
+            instance = load_template(template_file, input_args, compact, search_paths)
+        else:
+            count_unique(TEMPLATES, os.path.abspath(template_file))
+            with profile_phase('substitute'):
+                instance = instantiate_template(parsed_template, input_args)
+                validate_template(instance)
+            resolve_raw_files(instance, template_file, search_paths)
+            resolve_glob_entries(instance, template_file)
+            if compact:
+                compact_entries(instance)
+        merged_instances = deep_merge_dicts(instance, merged_instances, overwrite)
+    return merged_instances
 
 
 def deep_merge_dicts(source: dict, destination: dict, overwrite: bool = False) -> dict:
@@ -151,7 +288,19 @@ def deep_merge_dicts(source: dict, destination: dict, overwrite: bool = False) -
         if isinstance(value, dict):
             # Get node or create one
             node = destination.setdefault(key, {})
+            # A raw section is given either as 'raw' or as 'raw_file': the
+            # one merged last replaces the other
+            for raw_key, other_key in (('raw', 'raw_file'), ('raw_file', 'raw')):
+                if raw_key in value and isinstance(node, dict):
+                    node.pop(other_key, None)
             deep_merge_dicts(value, node)
+        elif isinstance(value, EntryTable):
+            # Get node or create one, keeping it compact
+            node = destination.setdefault(key, EntryTable())
+            if isinstance(node, list) and all(isinstance(item, dict) for item in node):
+                node = destination[key] = EntryTable(node)
+            # A list of other items is merged as a plain list
+            node.extend(value)
         elif isinstance(value, list):
             # Get node or create one
             node = destination.setdefault(key, [])
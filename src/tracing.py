@@ -0,0 +1,111 @@
+"""
+This module is used to trace a render: every phase (see src.profiling) is
+recorded as a span, with its start and duration, and written in the Chrome
+trace event format, which can be opened with Perfetto (ui.perfetto.dev) or
+chrome://tracing. Every template gets its own span, with the spans of its
+steps nested inside it, and is then merged next to it:
+
+    load
+      template:base-template.yml
+        search
+        read / parse     (only when the template is not cached yet)
+        substitute
+        template:...     (its children templates, each followed by its merge)
+      merge              (of the template into the config)
+
+The spans of every thread are kept apart, so the renders run concurrently
+(e.g. with render_file_async) show up as separate tracks.
+"""
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+
+from src.profiling import listen_phases
+
+
+class Tracer:
+    """
+    Records the phases of a render as complete trace events.
+    """
+
+    def __init__(self):
+        self.events: list = []
+        self._start_ns = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._local = threading.local()
+
+    def _get_stack(self) -> list:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def enter(self, name) -> None:
+        """
+        Start a span, nested in the running span of the thread.
+
+        Args:
+            name (str): The name of the span.
+        """
+        self._get_stack().append((name, time.perf_counter_ns()))
+
+    def exit(self) -> None:
+        """
+        End the running span of the thread.
+        """
+        name, start_ns = self._get_stack().pop()
+        self.events.append({
+            'name': name,
+            'cat': name.split(':', 1)[0],
+            'ph': 'X',
+            'ts': (start_ns - self._start_ns) / 1000,
+            'dur': (time.perf_counter_ns() - start_ns) / 1000,
+            'pid': self._pid,
+            'tid': threading.get_ident(),
+        })
+
+    def as_dict(self) -> dict:
+        """
+        Get the trace, in the Chrome trace event format.
+
+        Returns:
+            dict: The trace, with the events sorted by start time (parents
+                first).
+        """
+        return {
+            'traceEvents': sorted(self.events, key=lambda event: (event['ts'], -event['dur'])),
+            'displayTimeUnit': 'ms',
+        }
+
+    def write(self, trace_file) -> None:
+        """
+        Write the trace as JSON.
+
+        Args:
+            trace_file (str): The path to the file.
+        """
+        with open(trace_file, 'w', encoding='utf-8') as file:
+            json.dump(self.as_dict(), file)
+
+
+@contextmanager
+def trace(trace_file=None):
+    """
+    Trace the renders run while the context is active, by every thread.
+
+    Args:
+        trace_file (str): If given, the trace is written to this file when
+            the context exits (even if the render failed).
+
+    Yields:
+        Tracer: The tracer, with the spans recorded so far.
+    """
+    tracer = Tracer()
+    try:
+        with listen_phases(tracer, all_threads=True):
+            yield tracer
+    finally:
+        if trace_file is not None:
+            tracer.write(trace_file)
@@ -6,34 +6,22 @@ and by checking for required fields.
 """
 import os
 
-SUPPORTED_TYPES = (str, int, float, bool, dict, list)
+from src.dependencies import add_dependency
+from src.entries import EntryTable, make_entry
+from src.globbing import allows_glob_entries, get_glob_base_entry, is_glob_entry
+from src.packs import input_exists, is_pack_file, join_input_path
+from src.profiling import profile_phase
+from src.registry import get_registry, is_registry_reference
+# get_python_type is re-exported, as it used to live in this module
+from src.schema import (  # pylint: disable=unused-import
+    KeyDef,
+    LazySchema,
+    as_section_def,
+    compile_schema,
+    get_python_type,
+)
 
-def get_python_type(value: str) -> type:
-    # pylint: disable=too-many-return-statements
-    """
-    Get the Python type of a string value.
-    
-    Args:
-        value (str): The string value to get the Python type of.
-    
-    Returns:
-        type: The Python type of the value.
-    """
-    if value is None:
-        return None
-    if value.lower() in ['str', 'string']:
-        return str
-    if value.lower() in ['int', 'integer']:
-        return int
-    if value.lower() in ['float', 'double']:
-        return float
-    if value.lower() in ['bool', 'boolean']:
-        return bool
-    if value.lower() in ['dict', 'dictionary', 'object', 'map']:
-        return dict
-    if value.lower() in  ['list', 'array', 'sequence', 'tuple', 'collection']:
-        return list
-    raise ValueError("Invalid type")
+SUPPORTED_TYPES = (str, int, float, bool, dict, list)
 
 def search_input_file(input_file: str, kind='schema', directories=None) -> str:
     """
@@ -45,7 +33,33 @@ def search_input_file(input_file: str, kind='schema', directories=None) -> str:
     3. The directories specified in the directories argument. This is useful for
          specifying directories in the command line or to make sure the search
          includes the directory where another file which sourced this input file
-         is located.
+         is located. In 2 and 3, a directory can also be a template pack
+         (see src.packs), or a directory inside a pack.
+    4. The template registry (see src.registry), for registry:// references.
+         The fetched files are kept in a local cache, which is used when the
+         registry can't be reached.
+    The file found is recorded as a dependency (see src.dependencies).
+
+    Args:
+        input_file (str): The path to the input file.
+        kind (str): The kind of file being searched for. Default is 'schema'.
+        directories (list): A list of directories to search in. Default is None.
+
+    Returns:
+        str: The path to the input file.
+
+    Raises:
+        FileNotFoundError: If the input file is not found.
+    """
+    input_file_path = find_input_file(input_file, kind, directories)
+    add_dependency(input_file_path)
+    return input_file_path
+
+
+def find_input_file(input_file: str, kind='schema', directories=None) -> str:
+    """
+    Search for an input file, as described in search_input_file, without
+    recording it as a dependency.
 
     Args:
         input_file (str): The path to the input file.
@@ -60,7 +74,7 @@ def search_input_file(input_file: str, kind='schema', directories=None) -> str:
     """
     searched_locations = []
     env_var = f"YAMELINNO_{kind.upper() + 'S'}"
-    if os.path.exists(input_file):
+    if input_exists(input_file):
         return input_file
     searched_locations.append(input_file)
     # If the YAMELINNO_<kind> environment variable is set,
@@ -71,21 +85,23 @@ def search_input_file(input_file: str, kind='schema', directories=None) -> str:
             else os.environ[env_var].strip().strip(':').split(':')
         # Check if the directories are valid
         for directory in env_directories:
-            if not os.path.isdir(directory):
+            if not os.path.isdir(directory) and not is_pack_file(directory):
                 raise FileNotFoundError(
                     f"Directory {directory} not found. env_var: {env_var}")
-            input_file_path = os.path.join(directory, input_file)
-            if os.path.exists(input_file_path):
+            input_file_path = join_input_path(directory, input_file)
+            if input_exists(input_file_path):
                 return input_file_path
             searched_locations.append(input_file_path)
     # If the directories argument is provided, search in them
     if directories is None:
         directories = []
     for directory in directories:
-        input_file_path = os.path.join(directory, input_file)
-        if os.path.isdir(directory) and os.path.exists(input_file_path):
+        input_file_path = join_input_path(directory, input_file)
+        if input_exists(input_file_path):
             return input_file_path
         searched_locations.append(input_file_path)
+    if is_registry_reference(input_file):
+        return get_registry().fetch(input_file)
     raise FileNotFoundError(
         f"Input {kind} {input_file} not found. Searched in: {searched_locations}")
 
@@ -126,6 +142,9 @@ def get_required_sections(schema) -> list:
     Returns:
         list: A list of required sections.
     """
+    if isinstance(schema, LazySchema):
+        # Read from the schema file, without compiling every section
+        return list(schema.required_sections)
     required_sections = []
     for key, value in schema.items():
         if value.get('required', False):
@@ -145,11 +164,8 @@ def get_key_types(key_definition) -> list:
     """
     key_types = []
     for key, value in key_definition.items():
-        if 'type' not in value:
-            key_type = None
-        else:
-            key_type = get_python_type(value['type'])
-        key_types.append((key, key_type, value.get('required', False)))
+        key_def = KeyDef.from_dict(key, value)
+        key_types.append((key, key_def.python_type, key_def.get('required', False)))
     return key_types
 
 
@@ -173,15 +189,84 @@ def validate_key_types(key_types, keys_dict) -> None:
                     f"key_types: {key_types}"
                 ])
                 raise KeyError(output_error)
+            # Optional keys can be missing, so there is nothing to check
+            continue
         if key_type is None:
             # No type specified, so we can't validate
             continue
         if not isinstance(keys_dict[key], key_type):
             raise TypeError(f"Key '{key}' must be of type {key_type}")
     # Now check the other way around
+    key_names = {k for k, _, _ in key_types}
     for key in keys_dict:
-        if key not in [k for k, _, _ in key_types]:
+        if key not in key_names:
+            raise KeyError(f"Key '{key}' not found in schema")
+
+
+def get_shape_checks(shape, key_types) -> list:
+    """
+    Validate the keys of an entry shape (the tuple of keys of an entry) and
+    get the type checks needed for the values of every entry with that shape.
+
+    Args:
+        shape (tuple): The keys of the entry, in order.
+        key_types (list): A list of tuples in the form (key, type, required).
+
+    Returns:
+        list: A list of tuples in the form (index, key, type), one for each
+            typed key in the shape.
+
+    Raises:
+        KeyError: If a required key is missing.
+        KeyError: If a key is not found in the schema.
+    """
+    key_names = {key for key, _, _ in key_types}
+    for key in shape:
+        if key not in key_names:
             raise KeyError(f"Key '{key}' not found in schema")
+    shape_checks = []
+    for key, key_type, required in key_types:
+        if key not in shape:
+            if required:
+                raise KeyError(f"Required key '{key}' missing. Entry keys: {shape}")
+            continue
+        if key_type is not None:
+            shape_checks.append((shape.index(key), key, key_type))
+    return shape_checks
+
+
+def validate_entry_table(entry_table, key_types, glob_entries=False) -> None:
+    """
+    Validate the entries of an EntryTable. The keys are validated once for
+    every distinct shape, so only the value types are checked per entry.
+
+    Args:
+        entry_table (EntryTable): The entries to validate.
+        key_types (list): A list of tuples in the form (key, type, required).
+        glob_entries (bool): Whether the entries can be glob entries.
+            Default is False.
+
+    Raises:
+        KeyError: If a required key is missing.
+        KeyError: If a key is not found in the schema.
+        TypeError: If a key is of the wrong type.
+    """
+    checks_by_shape = {}
+    for shape, values in entry_table.rows():
+        if glob_entries and 'sourceGlob' in shape:
+            entry = get_glob_base_entry(make_entry(shape, values))
+            validate_key_types(key_types, entry)
+            continue
+        shape_checks = checks_by_shape.get(shape)
+        if shape_checks is None:
+            shape_checks = checks_by_shape[shape] = get_shape_checks(shape, key_types)
+        for index, key, key_type in shape_checks:
+            value = values[index]
+            # Lists are stored as tuples in the table
+            if key_type is list and isinstance(value, tuple):
+                continue
+            if not isinstance(value, key_type):
+                raise TypeError(f"Key '{key}' must be of type {key_type}")
 
 
 def validate_keys(keys_dict, section_definition, entry=False) -> None:
@@ -198,11 +283,42 @@ def validate_keys(keys_dict, section_definition, entry=False) -> None:
         KeyError: If a required key is missing.
         TypeError: If a key is of the wrong type.
     """
-    section_def = section_definition['keys'] if not entry else section_definition['entry']
-    key_types = get_key_types(section_def)
+    section_definition = as_section_def(section_definition)
+    if entry:
+        key_types = get_key_types(section_definition.entry)
+    elif section_definition.children == 'keys':
+        key_types = section_definition.key_types
+    else:
+        key_types = get_key_types(section_definition.keys)
     validate_key_types(key_types, keys_dict)
 
 
+def validate_entries(section, section_definition) -> None:
+    """
+    Validate the entries of a section, computing the key types only once.
+    Glob entries (only allowed in the 'files' section) are validated as the
+    entries they expand to.
+
+    Args:
+        section (list | EntryTable): The entries to validate.
+        section_definition (SectionDef): The definition of the section.
+
+    Raises:
+        KeyError: If a required entry key is missing.
+        KeyError: If a key is not found in the schema.
+        TypeError: If a key is of the wrong type.
+    """
+    key_types = section_definition.key_types
+    glob_entries = allows_glob_entries(section_definition)
+    if isinstance(section, EntryTable):
+        validate_entry_table(section, key_types, glob_entries)
+        return
+    for entry in section:
+        if glob_entries and is_glob_entry(entry):
+            entry = get_glob_base_entry(entry)
+        validate_key_types(key_types, entry)
+
+
 def validate_section(section, section_definition) -> None:
     """
     Validate a section against its definition.
@@ -216,23 +332,27 @@ def validate_section(section, section_definition) -> None:
         KeyError: If a required key is missing.
         KeyError: If a required entry key is missing.
     """
-    if section_definition['children'] == 'keys':
+    section_definition = as_section_def(section_definition)
+    if section_definition.children == 'keys':
         # Validate required keys
         validate_keys(section, section_definition)
 
-    elif section_definition['children'] == 'entries':
-        # Validate required entry keys
-        for entry in section:
-            validate_keys(entry, section_definition, entry=True)
+    elif section_definition.children == 'entries':
+        validate_entries(section, section_definition)
 
-    elif section_definition['children'] == 'raw':
-        # Validate required raw field
-        if section_definition.get('required', False):
-            if 'raw' not in section:
+    elif section_definition.children == 'raw':
+        # Validate required raw field, which can also be given as a file
+        if section_definition.required:
+            if 'raw' not in section and 'raw_file' not in section:
                 raise KeyError("Required raw field missing")
+        if 'raw' in section and 'raw_file' in section:
+            raise KeyError("Use either 'raw' or 'raw_file', not both")
         if 'raw' in section:
             if not isinstance(section['raw'], str):
                 raise TypeError("Raw field must be a string")
+        if 'raw_file' in section:
+            if not isinstance(section['raw_file'], str):
+                raise TypeError("Raw file must be a path")
 
 def validate_config(config, schema) -> None:
     """
@@ -248,6 +368,7 @@ def validate_config(config, schema) -> None:
         KeyError: If a required entry key is missing.
         TypeError: If a key is of the wrong type.
     """
+    schema = compile_schema(schema)
     # Validate if the required sections are present
     required_sections = get_required_sections(schema)
     for section_name in required_sections:
@@ -255,4 +376,5 @@ def validate_config(config, schema) -> None:
             raise KeyError(f"Required section '{section_name}' missing")
     # Validate section content
     for section_name, section in config.items():
-        validate_section(section, schema[section_name])
+        with profile_phase(f"section:{section_name}"):
+            validate_section(section, schema[section_name])
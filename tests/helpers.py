@@ -0,0 +1,40 @@
+"""
+Helpers shared by the tests.
+"""
+import os
+
+# A config including the files.yml template next to it
+TREE_CONFIG = (
+    "templates:\n  - files.yml\n"
+    "setup:\n  appName: App\n  appVersion: '1.0'\n"
+    "code:\n  raw: ''\n"
+)
+
+
+def write_files_template(tree_root, sources) -> None:
+    """
+    Write the files.yml template of a config tree.
+
+    Args:
+        tree_root (str): The directory of the tree.
+        sources (iterable): The source of every entry of the 'files' section.
+    """
+    with open(os.path.join(tree_root, 'files.yml'), 'w', encoding='utf-8') as file:
+        file.write("files:\n")
+        for source in sources:
+            file.write(f"  - source: {source}\n    destDir: '{{app}}'\n")
+
+
+def write_config_tree(tree_root, sources=('app.exe',)) -> None:
+    """
+    Write a config tree: a setup.yml config, including a files.yml template.
+
+    Args:
+        tree_root (str): The directory of the tree. It must not exist.
+        sources (iterable): The source of every entry of the 'files' section.
+            Default is a single app.exe.
+    """
+    os.makedirs(tree_root)
+    write_files_template(tree_root, sources)
+    with open(os.path.join(tree_root, 'setup.yml'), 'w', encoding='utf-8') as file:
+        file.write(TREE_CONFIG)
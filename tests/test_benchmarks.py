@@ -0,0 +1,67 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the benchmarks: the generated workloads must be valid configs,
+and the comparison with the baseline must find the regressions.
+"""
+import os
+import shutil
+import unittest
+
+from benchmarks.generators import WORKLOADS, generate_workloads
+from benchmarks.suite import SCHEMA_FILE, compare_results, get_benchmarks, run_benchmarks
+from src.rendering import load_schema, render
+from src.templates import load_config
+from src.validation import validate_config
+
+TREE_ROOT = os.path.abspath('benchmarks_tree')
+
+
+def get_result(seconds, peak_bytes):
+    return {'seconds': seconds, 'peak_bytes': peak_bytes}
+
+
+class TestBenchmarks(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(TREE_ROOT)
+
+    def tearDown(self):
+        shutil.rmtree(TREE_ROOT)
+
+    def test_workloads_are_valid(self):
+        config_files = generate_workloads(TREE_ROOT)
+        self.assertEqual(set(config_files), set(WORKLOADS))
+        schema = load_schema(SCHEMA_FILE)
+        for config_file in config_files.values():
+            config = load_config(config_file, compact=True)
+            validate_config(config, schema)
+            self.assertIn('[Setup]', render(config, schema))
+
+    def test_run_benchmarks(self):
+        benchmarks = get_benchmarks(generate_workloads(TREE_ROOT), TREE_ROOT)
+        results = run_benchmarks(benchmarks, repeat=1, names_filter='deep_templates')
+        self.assertEqual(set(results), {
+            'load_config.deep_templates', 'render.deep_templates', 'main.deep_templates'})
+        self.assertGreater(results['load_config.deep_templates']['peak_bytes'], 0)
+
+    def test_compare_results(self):
+        baseline = {
+            'a': get_result(1.0, 1000),
+            'b': get_result(1.0, 1000),
+            'c': get_result(0.0001, 1000),
+            'd': get_result(1.0, 1000),
+        }
+        results = {
+            'a': get_result(1.1, 1100),
+            'b': get_result(1.5, 1000),
+            # Below the timer noise
+            'c': get_result(0.0005, 1000),
+            # Not in the baseline
+            'e': get_result(9.0, 9000),
+        }
+        self.assertEqual(compare_results(results, baseline, threshold=0.2), [
+            ('b', 'seconds', 1.0, 1.5)])
+        self.assertEqual(len(compare_results(results, baseline, threshold=0.05)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
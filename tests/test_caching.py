@@ -0,0 +1,46 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the caching module.
+"""
+import os
+import unittest
+
+from src.caching import FileCache, get_file_id
+
+FILE_NAME = 'caching_file.txt'
+
+
+class TestFileCache(unittest.TestCase):
+    def tearDown(self):
+        if os.path.exists(FILE_NAME):
+            os.remove(FILE_NAME)
+
+    def test_get_file_id(self):
+        with open(FILE_NAME, 'w', encoding='utf-8') as file:
+            file.write('a')
+        file_id = get_file_id(FILE_NAME)
+        with open(FILE_NAME, 'w', encoding='utf-8') as file:
+            file.write('ab')
+        self.assertNotEqual(get_file_id(FILE_NAME), file_id)
+
+    def test_get_put(self):
+        cache = FileCache()
+        self.assertIsNone(cache.get('a', (1, 1, 1)))
+        cache.put('a', (1, 1, 1), 'value')
+        self.assertEqual(cache.get('a', (1, 1, 1)), 'value')
+        # The file changed
+        self.assertIsNone(cache.get('a', (2, 1, 1)))
+
+    def test_least_recently_used_are_dropped(self):
+        cache = FileCache(max_entries=2)
+        cache.put('a', 1, 'a')
+        cache.put('b', 1, 'b')
+        cache.get('a', 1)
+        cache.put('c', 1, 'c')
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a', 1), 'a')
+        self.assertIsNone(cache.get('b', 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the dependencies module.
+"""
+import os
+import threading
+import unittest
+from unittest import mock
+
+from src.dependencies import (
+    add_dependency,
+    format_depfile,
+    record_dependencies,
+)
+from src.templates import search_template
+from yamelinno import main
+
+OUTPUT_FILE = 'dependencies_output.iss'
+DEPFILE = 'dependencies_output.d'
+CONFIG_FILE = 'dependencies_config.yml'
+
+
+class TestDependencies(unittest.TestCase):
+    def tearDown(self):
+        for path in (OUTPUT_FILE, DEPFILE, CONFIG_FILE):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_format_depfile(self):
+        self.assertEqual(
+            format_depfile('setup.iss', ['setup.yml', 'my templates/a.yml', 'setup.yml']),
+            "setup.iss: \\\n setup.yml \\\n my\\ templates/a.yml\n")
+
+    def test_format_depfile_escapes(self):
+        self.assertEqual(
+            format_depfile('out$.iss', ['dir\\#1.yml']),
+            "out$$.iss: \\\n dir/\\#1.yml\n")
+
+    def test_record_dependencies(self):
+        add_dependency('ignored.yml')
+        with record_dependencies() as dependencies:
+            add_dependency('a.yml')
+            add_dependency('templates.ympack!/b.yml')
+        add_dependency('ignored.yml')
+        self.assertEqual(dependencies, ['a.yml', 'templates.ympack'])
+
+    def test_record_dependencies_of_the_thread(self):
+        with record_dependencies() as dependencies:
+            thread = threading.Thread(target=add_dependency, args=('other.yml',))
+            thread.start()
+            thread.join()
+            add_dependency('a.yml')
+        self.assertEqual(dependencies, ['a.yml'])
+
+    def test_search_records_dependencies(self):
+        with record_dependencies() as dependencies:
+            path = search_template('base-template.yml', ['templates'])
+        self.assertEqual(dependencies, [path])
+
+    def test_main_writes_depfile(self):
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as file:
+            file.write(
+                "templates:\n  - base-template.yml\n"
+                "setup:\n  appName: App\n  appVersion: '1.0'\n")
+        environment = {'YAMELINNO_TEMPLATES': 'templates', 'YAMELINNO_SCHEMAS': 'schemas'}
+        with mock.patch.dict(os.environ, environment):
+            main([CONFIG_FILE, '-o', OUTPUT_FILE, '-MD'])
+        with open(DEPFILE, 'r', encoding='utf-8') as file:
+            self.assertEqual(file.read(), format_depfile(OUTPUT_FILE, [
+                CONFIG_FILE,
+                'templates/base-template.yml',
+                'templates/base-code.pas',
+                'schemas/base-schema.yml',
+            ]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the documents module.
+"""
+import io
+import os
+import shutil
+import sys
+import unittest
+from unittest import mock
+
+from src.documents import (
+    get_document_output,
+    get_field,
+    load_documents,
+    load_stdin_config,
+    render_documents,
+)
+from src.rendering import load_schema
+
+TREE_ROOT = os.path.abspath('documents_tree')
+STREAM_FILE = os.path.join(TREE_ROOT, 'setups.yml')
+SCHEMA_FILE = os.path.abspath('schemas/base-schema.yml')
+DOCUMENT = (
+    "output: {name}\n"
+    "setup:\n  appName: {name}\n  appVersion: '1.0'\n"
+    "code:\n  raw: ''\n")
+
+
+def write_stream(*names):
+    with open(STREAM_FILE, 'w', encoding='utf-8') as file:
+        file.write("---\n".join(DOCUMENT.format(name=name) for name in names))
+
+
+def mock_stdin(text):
+    return mock.patch.object(sys, 'stdin', io.TextIOWrapper(io.BytesIO(text.encode())))
+
+
+class TestDocuments(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(TREE_ROOT)
+        self.schema = load_schema(SCHEMA_FILE)
+
+    def tearDown(self):
+        shutil.rmtree(TREE_ROOT)
+
+    def test_load_documents(self):
+        write_stream('A', 'B')
+        with open(STREAM_FILE, 'a', encoding='utf-8') as file:
+            file.write("---\n")
+        documents = load_documents(STREAM_FILE)
+        self.assertEqual(next(documents)['setup']['appName'], 'A')
+        self.assertEqual([document['output'] for document in documents], ['B'])
+
+    def test_load_documents_must_be_mappings(self):
+        with open(STREAM_FILE, 'w', encoding='utf-8') as file:
+            file.write("- a\n")
+        with self.assertRaises(ValueError):
+            list(load_documents(STREAM_FILE))
+
+    def test_get_field(self):
+        document = {'setup': {'appName': 'App'}}
+        self.assertEqual(get_field(document, 'setup.appName'), 'App')
+        with self.assertRaises(KeyError):
+            get_field(document, 'setup.appVersion')
+
+    def test_get_document_output(self):
+        self.assertEqual(get_document_output('setup-{index:03}.iss', 7), 'setup-007.iss')
+        self.assertEqual(get_document_output('{name}.iss', 0, 'App'), 'App.iss')
+
+    def test_render_documents(self):
+        write_stream('A', 'B', 'C')
+        pattern = os.path.join(TREE_ROOT, '{index}-{name}.iss')
+        output_files = render_documents(STREAM_FILE, self.schema, pattern, 'output')
+        self.assertEqual(output_files, [
+            os.path.join(TREE_ROOT, name) for name in ('0-A.iss', '1-B.iss', '2-C.iss')])
+        with open(output_files[1], 'r', encoding='utf-8') as file:
+            self.assertIn('AppName="B"', file.read())
+
+    def test_render_documents_from_stdin(self):
+        pattern = os.path.join(TREE_ROOT, 'setup-{index}.iss')
+        with mock_stdin("---\n".join(DOCUMENT.format(name=name) for name in 'AB')):
+            output_files = render_documents('-', self.schema, pattern, 'output')
+        self.assertEqual(len(output_files), 2)
+
+    def test_load_stdin_config(self):
+        with mock_stdin("setup:\n  appName: App\n"):
+            self.assertEqual(load_stdin_config(), {'setup': {'appName': 'App'}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+# pylint: disable=missing-docstring
+import unittest
+
+from src.entries import (
+    EntryTable,
+    is_entry_list,
+    compact_entries,
+)
+
+ENTRIES = [
+    {'source': 'file0.dll', 'destDir': '{app}', 'flags': ['ignoreversion']},
+    {'source': 'file1.dll', 'destDir': '{app}', 'flags': ['ignoreversion']},
+    {'destDir': '{app}', 'source': 'file2.dll'},
+]
+
+
+class TestEntryTable(unittest.TestCase):
+    def test_entry_table_round_trip(self):
+        entry_table = EntryTable(ENTRIES)
+        self.assertEqual(len(entry_table), 3)
+        self.assertEqual(list(entry_table), ENTRIES)
+        self.assertEqual(entry_table[1], ENTRIES[1])
+        self.assertEqual(entry_table[-1], ENTRIES[-1])
+        self.assertEqual(entry_table[:2], ENTRIES[:2])
+        self.assertEqual(entry_table, ENTRIES)
+
+    def test_entry_table_keeps_key_order(self):
+        entry_table = EntryTable(ENTRIES)
+        self.assertEqual(list(entry_table[2]), ['destDir', 'source'])
+        self.assertEqual(entry_table.shapes, (
+            ('source', 'destDir', 'flags'),
+            ('destDir', 'source')
+        ))
+
+    def test_entry_table_shares_values(self):
+        entries = [
+            {'destDir': "".join(['{', 'app', '}']), 'flags': ['ignoreversion']}
+            for _ in range(2)
+        ]
+        entry_table = EntryTable(entries)
+        (shape0, values0), (shape1, values1) = entry_table.rows()
+        self.assertIs(shape0, shape1)
+        self.assertIs(values0[0], values1[0])
+        self.assertIs(values0[1], values1[1])
+        self.assertEqual(values0[1], ('ignoreversion',))
+
+    def test_entry_table_extend(self):
+        entry_table = EntryTable(ENTRIES[:1])
+        entry_table.extend(EntryTable(ENTRIES[1:]))
+        self.assertEqual(entry_table, ENTRIES)
+
+    def test_entry_table_nested_dicts(self):
+        entries = [{'key0': [{'subkey0': 'value0'}]}]
+        self.assertEqual(EntryTable(entries), entries)
+
+    def test_entry_table_invalid_entry(self):
+        with self.assertRaises(TypeError):
+            EntryTable(['value0'])
+
+
+class TestCompactEntries(unittest.TestCase):
+    def test_is_entry_list(self):
+        self.assertTrue(is_entry_list(ENTRIES))
+        self.assertFalse(is_entry_list([]))
+        self.assertFalse(is_entry_list(['value0', {'key0': 'value0'}]))
+        self.assertFalse(is_entry_list({'key0': 'value0'}))
+
+    def test_compact_entries(self):
+        config = {
+            'setup': {'appName': 'MyApp'},
+            'files': list(ENTRIES),
+            'code': {'raw': 'begin end;'}
+        }
+        compacted = compact_entries(config)
+        self.assertIsInstance(compacted['files'], EntryTable)
+        self.assertIsInstance(compacted['setup'], dict)
+        self.assertEqual(compacted['files'], ENTRIES)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the globbing module.
+"""
+import os
+import shutil
+import unittest
+
+from src.globbing import (
+    glob_to_regex,
+    split_glob,
+    DirectoryScanner,
+    get_glob_base_entry,
+    expand_glob_entry,
+)
+from src.rendering import render_section
+from src.schema import SectionDef
+from src.templates import load_config
+from src.validation import validate_section
+
+TREE_ROOT = 'glob_tree'
+TREE_FILES = [
+    'app.exe',
+    'app.pdb',
+    'lib/core.dll',
+    'lib/extra.dll',
+    'lib/plugins/plugin.dll',
+    'lib/plugins/readme.txt',
+]
+
+
+def create_tree():
+    for relative_path in TREE_FILES:
+        path = os.path.join(TREE_ROOT, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(relative_path)
+
+
+class TestGlobPatterns(unittest.TestCase):
+    def test_glob_to_regex(self):
+        regex = glob_to_regex('**/*.dll')
+        self.assertTrue(regex.match('core.dll'))
+        self.assertTrue(regex.match('lib/plugins/plugin.dll'))
+        self.assertFalse(regex.match('lib/core.dll.bak'))
+        regex = glob_to_regex('lib/*.dll')
+        self.assertTrue(regex.match('lib/core.dll'))
+        self.assertFalse(regex.match('lib/plugins/plugin.dll'))
+
+    def test_split_glob(self):
+        self.assertEqual(split_glob('build/bin/**/*.dll'), ('build/bin', '**/*.dll'))
+        self.assertEqual(split_glob('build\\*.exe'), ('build', '*.exe'))
+        self.assertEqual(split_glob('*.exe'), ('.', '*.exe'))
+
+
+class TestDirectoryScanner(unittest.TestCase):
+    def setUp(self):
+        create_tree()
+
+    def tearDown(self):
+        shutil.rmtree(TREE_ROOT)
+
+    def test_scan(self):
+        scanner = DirectoryScanner()
+        listing = list(scanner.scan(TREE_ROOT))
+        self.assertEqual(listing, [
+            ('', ['app.exe', 'app.pdb']),
+            ('lib', ['core.dll', 'extra.dll']),
+            ('lib/plugins', ['plugin.dll', 'readme.txt']),
+        ])
+
+    def test_scan_excluded(self):
+        scanner = DirectoryScanner()
+        listing = list(scanner.scan(TREE_ROOT, lambda path: path == 'lib/plugins'))
+        self.assertEqual([relative_dir for relative_dir, _ in listing], ['', 'lib'])
+
+    def test_scan_cache(self):
+        cache_file = os.path.join(TREE_ROOT, 'listing-cache.json')
+        list(DirectoryScanner(cache_file).scan(os.path.join(TREE_ROOT, 'lib')))
+        self.assertTrue(os.path.exists(cache_file))
+        scanner = DirectoryScanner(cache_file)
+        list(scanner.scan(os.path.join(TREE_ROOT, 'lib')))
+        self.assertFalse(scanner.modified)
+        # Adding a file changes the directory, so it is listed again
+        with open(os.path.join(TREE_ROOT, 'lib', 'new.dll'), 'w', encoding='utf-8') as file:
+            file.write('new')
+        scanner = DirectoryScanner(cache_file)
+        files, _ = scanner.list_directory(os.path.join(TREE_ROOT, 'lib'))
+        self.assertIn('new.dll', files)
+
+    @unittest.skipUnless(hasattr(os, 'symlink'), "requires symlinks")
+    def test_scan_symlink_loop(self):
+        os.symlink(os.path.abspath(TREE_ROOT), os.path.join(TREE_ROOT, 'lib', 'loop'))
+        listing = list(DirectoryScanner().scan(TREE_ROOT))
+        self.assertEqual([relative_dir for relative_dir, _ in listing],
+                         ['', 'lib', 'lib/plugins'])
+        self.assertNotIn('loop', listing[1][1])
+
+
+def get_section_definition(name) -> SectionDef:
+    return SectionDef.from_dict(name, {
+        'renderedName': name.capitalize(),
+        'children': 'entries',
+        'entry': {
+            'source': {'renderedName': 'Source', 'required': True},
+            'destDir': {'renderedName': 'DestDir', 'required': True},
+        }
+    })
+
+
+class TestExpandGlobEntry(unittest.TestCase):
+    def setUp(self):
+        create_tree()
+
+    def tearDown(self):
+        shutil.rmtree(TREE_ROOT)
+
+    def test_expand_glob_entry(self):
+        entry = {
+            'sourceGlob': f'{TREE_ROOT}/**/*.dll',
+            'exclude': ['**/extra.dll'],
+            'destDir': '{app}',
+            'flags': ['ignoreversion'],
+        }
+        self.assertEqual(list(expand_glob_entry(entry)), [
+            {'source': f'{TREE_ROOT}/lib/core.dll', 'destDir': '{app}\\lib',
+             'flags': ['ignoreversion']},
+            {'source': f'{TREE_ROOT}/lib/plugins/plugin.dll',
+             'destDir': '{app}\\lib\\plugins', 'flags': ['ignoreversion']},
+        ])
+
+    def test_expand_glob_entry_per_directory(self):
+        entry = {
+            'sourceGlob': f'{TREE_ROOT}\\**',
+            'exclude': ['*.pdb'],
+            'destDir': '{app}',
+            'perDirectory': True,
+        }
+        self.assertEqual(list(expand_glob_entry(entry)), [
+            {'source': f'{TREE_ROOT}\\app.exe', 'destDir': '{app}'},
+            {'source': f'{TREE_ROOT}\\lib\\*', 'destDir': '{app}\\lib'},
+            {'source': f'{TREE_ROOT}\\lib\\plugins\\*', 'destDir': '{app}\\lib\\plugins'},
+        ])
+
+    def test_get_glob_base_entry(self):
+        entry = {'destDir': '{app}', 'sourceGlob': 'bin/*', 'perDirectory': True}
+        self.assertEqual(get_glob_base_entry(entry), {'source': 'bin/*', 'destDir': '{app}'})
+
+    def test_glob_entry_section(self):
+        section = [{'sourceGlob': f'{TREE_ROOT}/*.exe', 'destDir': '{app}'}]
+        expected_output = "".join([
+            '[Files]\n',
+            f'Source: "{TREE_ROOT}/app.exe"; DestDir: "{{app}}"\n\n'
+        ])
+        validate_section(section, get_section_definition('files'))
+        self.assertEqual(
+            render_section(section, get_section_definition('files')), expected_output)
+
+    def test_glob_entry_only_in_files(self):
+        section = [{'sourceGlob': f'{TREE_ROOT}/*.exe', 'destDir': '{app}'}]
+        with self.assertRaises(KeyError):
+            validate_section(section, get_section_definition('icons'))
+
+    def test_glob_entry_relative_to_config(self):
+        config_file = os.path.join(TREE_ROOT, 'setup.yml')
+        with open(config_file, 'w', encoding='utf-8') as file:
+            file.write("files:\n  - sourceGlob: 'lib/*.dll'\n    destDir: '{app}'\n")
+        config = load_config(config_file)
+        # The sources are the paths the files were found at
+        tree_root = os.path.abspath(TREE_ROOT)
+        self.assertEqual(
+            [entry['source'] for entry in expand_glob_entry(config['files'][0])],
+            [f'{tree_root}/lib/core.dll', f'{tree_root}/lib/extra.dll'])
+
+    def test_glob_keys_validated(self):
+        section = [{'sourceGlob': f'{TREE_ROOT}/*', 'exclude': '*.pdb', 'destDir': '{app}'}]
+        with self.assertRaises(TypeError):
+            validate_section(section, get_section_definition('files'))
+        with self.assertRaises(TypeError):
+            list(expand_glob_entry(section[0]))
+        section[0]['exclude'] = ['*.pdb']
+        section[0]['perDirectory'] = 'yes'
+        with self.assertRaises(TypeError):
+            validate_section(section, get_section_definition('files'))
+
+
+if __name__ == '__main__':
+    unittest.main()
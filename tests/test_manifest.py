@@ -0,0 +1,115 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the manifest module.
+"""
+from contextlib import redirect_stderr
+import hashlib
+import io
+import os
+import shutil
+import unittest
+from unittest import mock
+
+from src import manifest
+from src.manifest import (
+    get_source_paths,
+    hash_file,
+    build_manifest,
+    load_manifest,
+    manifest_changed,
+    update_manifest,
+    get_manifest_path,
+)
+from yamelinno import main
+
+TREE_ROOT = 'manifest_tree'
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(os.path.join(TREE_ROOT, 'lib'))
+        for name, content in [('app.exe', 'app'), ('lib/a.dll', 'a'), ('lib/b.dll', 'b')]:
+            with open(os.path.join(TREE_ROOT, name), 'w', encoding='utf-8') as file:
+                file.write(content)
+        self.config = {
+            'files': [
+                {'source': f'{TREE_ROOT}\\app.exe', 'destDir': '{app}'},
+                {'source': f'{TREE_ROOT}/lib/*.dll', 'destDir': '{app}'},
+                {'source': '{src}\\other.dll', 'destDir': '{app}'},
+                {'sourceGlob': f'{TREE_ROOT}/**/a.dll', 'destDir': '{app}'},
+            ]
+        }
+
+    def tearDown(self):
+        shutil.rmtree(TREE_ROOT)
+
+    def test_get_source_paths(self):
+        expected_paths = sorted([
+            os.path.join(TREE_ROOT, 'app.exe'),
+            os.path.join(TREE_ROOT, 'lib', 'a.dll'),
+            os.path.join(TREE_ROOT, 'lib', 'b.dll'),
+        ])
+        self.assertEqual(get_source_paths(self.config), expected_paths)
+
+    def test_hash_file(self):
+        path = os.path.join(TREE_ROOT, 'app.exe')
+        expected_hash = hashlib.sha256(b'app').hexdigest()
+        self.assertEqual(hash_file(path), expected_hash)
+        # Big files are hashed through a memory map
+        with mock.patch.object(manifest, 'MMAP_THRESHOLD', 1):
+            self.assertEqual(hash_file(path), expected_hash)
+
+    def test_build_manifest_reuses_unchanged_hashes(self):
+        paths = get_source_paths(self.config)
+        previous = build_manifest(paths, 'script')
+        with mock.patch.object(manifest, 'hash_file') as mocked_hash_file:
+            current = build_manifest(paths, 'script', previous)
+        mocked_hash_file.assert_not_called()
+        self.assertFalse(manifest_changed(previous, current))
+
+    def test_build_manifest_missing_file(self):
+        missing = os.path.join(TREE_ROOT, 'missing.dll')
+        self.assertEqual(build_manifest([missing])['files'][missing], {'missing': True})
+
+    def test_manifest_changed(self):
+        paths = get_source_paths(self.config)
+        previous = build_manifest(paths, 'script')
+        self.assertTrue(manifest_changed(None, previous))
+        self.assertTrue(manifest_changed(previous, build_manifest(paths, 'other')))
+        with open(paths[0], 'w', encoding='utf-8') as file:
+            file.write('changed content')
+        self.assertTrue(manifest_changed(previous, build_manifest(paths, 'script', previous)))
+
+    def test_update_manifest(self):
+        output_file = os.path.join(TREE_ROOT, 'output.iss')
+        with open(output_file, 'w', encoding='utf-8') as file:
+            file.write('rendered')
+        self.assertTrue(update_manifest(self.config, output_file))
+        self.assertIsNotNone(load_manifest(get_manifest_path(output_file)))
+        self.assertFalse(update_manifest(self.config, output_file))
+        with open(output_file, 'w', encoding='utf-8') as file:
+            file.write('rendered again')
+        self.assertTrue(update_manifest(self.config, output_file))
+
+    def test_main_unchanged_status(self):
+        config_file = os.path.join(TREE_ROOT, 'setup.yml')
+        output_file = os.path.join(TREE_ROOT, 'setup.iss')
+        with open(config_file, 'w', encoding='utf-8') as file:
+            file.write(
+                "setup:\n  appName: App\n  appVersion: '1.0'\n"
+                f"files:\n  - source: {TREE_ROOT}/app.exe\n    destDir: '{{app}}'\n"
+                "code:\n  raw: ''\n")
+        argv = [config_file, '-o', output_file, '-s', 'schemas/base-schema.yml',
+                '--manifest', '--unchanged-status', '3']
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            main(argv)
+            with self.assertRaises(SystemExit) as context:
+                main(argv)
+        self.assertEqual(context.exception.code, 3)
+        self.assertIn('Manifest changed', stderr.getvalue())
+        self.assertIn('Manifest unchanged', stderr.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the memory module.
+"""
+from contextlib import redirect_stderr
+import io
+import os
+import shutil
+import signal
+import time
+import unittest
+
+from src.memory import (MIB, MemoryBudgetExceeded, format_memory_report, format_size,
+                        get_memory_usage, memory_budget)
+from src.profiling import profile, profile_phase
+from tests.helpers import write_config_tree
+from yamelinno import main
+
+TREE_ROOT = os.path.abspath('memory_tree')
+CONFIG_FILE = os.path.join(TREE_ROOT, 'setup.yml')
+OUTPUT_FILE = os.path.join(TREE_ROOT, 'setup.iss')
+SCHEMA_FILE = os.path.abspath('schemas/base-schema.yml')
+
+
+class TestMemory(unittest.TestCase):
+    def setUp(self):
+        write_config_tree(TREE_ROOT, [f'app{index}.exe' for index in range(2000)])
+
+    def tearDown(self):
+        shutil.rmtree(TREE_ROOT)
+
+    def test_format_size(self):
+        self.assertEqual(format_size(3 * MIB // 2), '1.50')
+        self.assertEqual(format_size(-10), '0.00')
+
+    def test_report(self):
+        with profile() as profiler:
+            with profile_phase('load'):
+                with profile_phase('template:big.yml'):
+                    kept = [0] * 200000
+                with profile_phase('template:small.yml'):
+                    data = [0] * 1000
+                    del data
+        report = format_memory_report(profiler)
+        self.assertIn("\nload ", report)
+        templates = report.split('Largest templates')[1].splitlines()
+        # The largest template first, retaining its list
+        self.assertTrue(templates[1].startswith('template:big.yml '))
+        self.assertEqual(templates[1].split()[-1], format_size(len(kept) * 8))
+        self.assertTrue(templates[2].startswith('template:small.yml '))
+        self.assertNotIn('Largest sections', report)
+
+    def test_memory_usage(self):
+        used = get_memory_usage()
+        data = b'x' * (40 * MIB)
+        self.assertGreater(get_memory_usage(), used + 30 * MIB)
+        del data
+
+    def test_budget_checked_between_phases(self):
+        max_bytes = get_memory_usage() + 20 * MIB
+        with self.assertRaises(MemoryBudgetExceeded) as context:
+            with memory_budget(max_bytes, watchdog=False):
+                with profile_phase('load'):
+                    with profile_phase('template:big.yml'):
+                        data = b'x' * (40 * MIB)
+                    del data
+        error = context.exception
+        self.assertGreater(error.used_bytes, max_bytes)
+        self.assertEqual([name for name, _ in error.phases], ['load', 'template:big.yml'])
+        self.assertIn('while running: load (from ', str(error))
+
+    def test_watchdog_stops_a_long_phase(self):
+        data = []
+        with self.assertRaises(MemoryBudgetExceeded):
+            with memory_budget(get_memory_usage() + 20 * MIB):
+                with profile_phase('parse'):
+                    # Doesn't end in time, unless the watchdog stops it
+                    for _ in range(200):
+                        data.append(b'x' * MIB)
+                        time.sleep(0.01)
+        self.assertLess(len(data), 200)
+
+    def test_watchdog_with_sigint_ignored(self):
+        handler = signal.signal(signal.SIGINT, signal.SIG_IGN)
+        try:
+            with self.assertRaises(MemoryBudgetExceeded) as context:
+                with memory_budget(get_memory_usage() + 20 * MIB):
+                    with profile_phase('parse'):
+                        data = b'x' * (40 * MIB)
+                        time.sleep(0.2)
+                        # Freed before the phase ends: only the watchdog saw it
+                        del data
+        finally:
+            signal.signal(signal.SIGINT, handler)
+        self.assertEqual([name for name, _ in context.exception.phases], ['parse'])
+
+    def test_profile_ends_phases_stopped_by_the_budget(self):
+        with profile() as profiler:
+            with self.assertRaises(MemoryBudgetExceeded):
+                with memory_budget(get_memory_usage() + 20 * MIB, watchdog=False):
+                    data = b'x' * (40 * MIB)
+                    with profile_phase('load'):
+                        pass
+            del data
+            with profile_phase('render'):
+                pass
+        # The phase stopped when it started is ended for the profiler
+        self.assertEqual(list(profiler.phases), [('load',), ('render',)])
+
+    def test_main_memory_report(self):
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            main([CONFIG_FILE, '-o', OUTPUT_FILE, '-s', SCHEMA_FILE,
+                  '--memory-report', '--max-memory', '1024'])
+        report = stderr.getvalue()
+        self.assertTrue(report.startswith('Peak memory: '))
+        self.assertIn('\ntemplate:files.yml ', report)
+        self.assertIn('\nsection:files ', report)
+        self.assertTrue(os.path.exists(OUTPUT_FILE))
+
+    def test_main_max_memory(self):
+        with self.assertRaises(SystemExit) as context:
+            main([CONFIG_FILE, '-o', OUTPUT_FILE, '-s', SCHEMA_FILE, '--max-memory', '1'])
+        self.assertIn('memory budget exceeded', str(context.exception.code))
+
+    def test_main_invalid_max_memory(self):
+        with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            main([CONFIG_FILE, '-s', SCHEMA_FILE, '--max-memory', '0'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the packs module.
+"""
+import os
+import shutil
+import unittest
+import zipfile
+from unittest import mock
+
+from src.packs import (
+    build_pack,
+    get_pack,
+    input_exists,
+    join_input_path,
+    read_pack_member,
+    split_pack_path,
+)
+from src.rendering import load_schema
+from src.templates import load_config, search_template
+from yamelinno import main
+
+TREE_ROOT = 'pack_tree'
+PACK_FILE = 'pack_tree.ympack'
+CONFIG_FILE = 'pack_config.yml'
+OUTPUT_FILE = 'pack_setup.iss'
+SCHEMA_FILE = os.path.abspath('schemas/base-schema.yml')
+
+
+class TestPacks(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(os.path.join(TREE_ROOT, 'sub'))
+        files = [
+            ('setup.yml', "templates:\n  - sub/license.yml\nsetup:\n  appName: Packed App\n"),
+            ('sub/license.yml', "files:\n  - source: LICENSE\n    destDir: '{app}'\n"),
+            ('sub/files.yml', "files:\n  - source: !source\n    destDir: '{app}'\n"),
+        ]
+        for name, content in files:
+            with open(os.path.join(TREE_ROOT, name), 'w', encoding='utf-8') as file:
+                file.write(content)
+        build_pack(TREE_ROOT, PACK_FILE)
+
+    def tearDown(self):
+        shutil.rmtree(TREE_ROOT)
+        for path in (PACK_FILE, CONFIG_FILE, OUTPUT_FILE):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_pack_is_a_zip_archive(self):
+        with zipfile.ZipFile(PACK_FILE) as archive:
+            self.assertIn('sub/files.yml', archive.namelist())
+            self.assertEqual(
+                archive.read('setup.yml').decode('utf-8'),
+                "templates:\n  - sub/license.yml\nsetup:\n  appName: Packed App\n")
+
+    def test_index(self):
+        pack = get_pack(PACK_FILE)
+        self.assertEqual(set(pack.index), {'setup.yml', 'sub/files.yml', 'sub/license.yml'})
+        self.assertIn('sub/files.yml', pack)
+        self.assertNotIn('files.yml', pack)
+        with self.assertRaises(FileNotFoundError):
+            pack.read('files.yml')
+
+    def test_split_pack_path(self):
+        self.assertEqual(split_pack_path('a.ympack!/sub/t.yml'), ('a.ympack', 'sub/t.yml'))
+        self.assertEqual(split_pack_path('a.ympack!'), ('a.ympack', ''))
+        self.assertIsNone(split_pack_path('templates/t.yml'))
+
+    def test_join_input_path(self):
+        self.assertEqual(join_input_path(PACK_FILE, 'setup.yml'), f'{PACK_FILE}!/setup.yml')
+        self.assertEqual(
+            join_input_path(f'{PACK_FILE}!/sub', 'files.yml'), f'{PACK_FILE}!/sub/files.yml')
+        self.assertEqual(join_input_path('templates', 'a.yml'), os.path.join('templates', 'a.yml'))
+
+    def test_input_exists(self):
+        self.assertTrue(input_exists(f'{PACK_FILE}!/sub/files.yml'))
+        self.assertFalse(input_exists(f'{PACK_FILE}!/files.yml'))
+        self.assertFalse(input_exists('missing.ympack!/files.yml'))
+
+    def test_read_pack_member(self):
+        self.assertEqual(
+            read_pack_member(f'{PACK_FILE}!/sub/files.yml'),
+            b"files:\n  - source: !source\n    destDir: '{app}'\n")
+
+    def test_search_template_in_pack(self):
+        with mock.patch.dict(os.environ, {'YAMELINNO_TEMPLATES': PACK_FILE}):
+            self.assertEqual(search_template('setup.yml'), f'{PACK_FILE}!/setup.yml')
+
+    def test_load_config_from_pack(self):
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as file:
+            file.write(
+                "templates:\n"
+                f"  - {PACK_FILE}!/setup.yml\n"
+                f"  - path: {PACK_FILE}!/sub/files.yml\n"
+                "    inputs:\n"
+                "      source: app.exe\n")
+        with mock.patch.dict(os.environ):
+            os.environ.pop('YAMELINNO_TEMPLATES', None)
+            config = load_config(CONFIG_FILE)
+        self.assertEqual(config['setup'], {'appName': 'Packed App'})
+        # The template of setup.yml is found next to it, inside the pack
+        self.assertEqual(config['files'], [
+            {'source': 'LICENSE', 'destDir': '{app}'},
+            {'source': 'app.exe', 'destDir': '{app}'},
+        ])
+
+    def test_load_schema_from_pack(self):
+        shutil.copy(SCHEMA_FILE, os.path.join(TREE_ROOT, 'schema.yml'))
+        build_pack(TREE_ROOT, PACK_FILE)
+        with mock.patch.dict(os.environ, {'YAMELINNO_SCHEMAS': PACK_FILE}):
+            schema = load_schema('schema.yml')
+        self.assertEqual(schema['setup']['renderedName'], 'Setup')
+
+    def test_input_file_named_like_a_subcommand(self):
+        with open('pack', 'w', encoding='utf-8') as file:
+            file.write("setup:\n  appName: App\n  appVersion: '1.0'\ncode:\n  raw: ''\n")
+        try:
+            main(['pack', '-o', OUTPUT_FILE, '-s', SCHEMA_FILE])
+        finally:
+            os.remove('pack')
+        with open(OUTPUT_FILE, 'r', encoding='utf-8') as file:
+            self.assertIn('AppName="App"', file.read())
+
+    def test_pack_build_command(self):
+        os.remove(PACK_FILE)
+        main(['pack', 'build', TREE_ROOT])
+        self.assertIn('setup.yml', get_pack(PACK_FILE))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the placeholders module.
+"""
+import os
+import unittest
+
+from src.placeholders import (
+    Placeholder,
+    TemplateString,
+    parse_template,
+    parse_template_string,
+    instantiate_template,
+    match_input,
+)
+
+
+class TestParseTemplate(unittest.TestCase):
+    def test_parse_template_string_placeholders(self):
+        parsed_template = parse_template_string("".join([
+            'key0: !input0\n',
+            'key1: "{app}\\\\!input1"\n',
+            'key2: value2\n',
+        ]))
+        self.assertIsInstance(parsed_template.tree['key0'], Placeholder)
+        self.assertIsInstance(parsed_template.tree['key1'], TemplateString)
+        self.assertEqual(parsed_template.tree['key2'], 'value2')
+        self.assertEqual(parsed_template.names, {'input0', 'input1'})
+
+    def test_parse_template_cached(self):
+        template_file = 'cached_template.yml'
+        with open(template_file, 'w', encoding='utf-8') as file:
+            file.write('key0: !input0\n')
+        first = parse_template(template_file)
+        second = parse_template(template_file)
+        # Rewrite the file, so it is parsed again
+        with open(template_file, 'w', encoding='utf-8') as file:
+            file.write('key0: !input0\nkey1: value1\n')
+        third = parse_template(template_file)
+        # Clean up
+        os.remove(template_file)
+        self.assertIs(first, second)
+        self.assertIsNot(first, third)
+        self.assertIn('key1', third.tree)
+
+
+class TestInstantiateTemplate(unittest.TestCase):
+    def test_instantiate_typed_values(self):
+        parsed_template = parse_template_string("".join([
+            'key0: !input0\n',
+            "key1: '!input1'\n",
+            'key2: !input2\n',
+        ]))
+        input_args = {'input0': 3, 'input1': True, 'input2': ['value0', 'value1']}
+        expected = {'key0': 3, 'key1': True, 'key2': ['value0', 'value1']}
+        self.assertEqual(instantiate_template(parsed_template, input_args), expected)
+
+    def test_instantiate_special_characters(self):
+        parsed_template = parse_template_string('key0: !input0\n')
+        input_args = {'input0': "value: 'with' # special \"chars\""}
+        expected = {'key0': "value: 'with' # special \"chars\""}
+        self.assertEqual(instantiate_template(parsed_template, input_args), expected)
+
+    def test_instantiate_contained_input_names(self):
+        parsed_template = parse_template_string("".join([
+            "source: '!sourceFile'\n",
+            "destDir: '{app}\\!source'\n",
+            "other: '!sourceDir'\n",
+        ]))
+        input_args = {'source': 'myDir', 'sourceFile': 'C:\\LICENSE'}
+        expected = {
+            'source': 'C:\\LICENSE',
+            'destDir': '{app}\\myDir',
+            'other': 'myDirDir'
+        }
+        self.assertEqual(instantiate_template(parsed_template, input_args), expected)
+
+    def test_instantiate_keeps_unknown_placeholders_in_strings(self):
+        parsed_template = parse_template_string("key0: 'Hello!World'\n")
+        self.assertEqual(instantiate_template(parsed_template), {'key0': 'Hello!World'})
+
+    def test_instantiate_does_not_modify_template(self):
+        parsed_template = parse_template_string('section:\n  - key0: !input0\n')
+        first = instantiate_template(parsed_template, {'input0': 'value0'})
+        first['section'].append({'key0': 'value1'})
+        second = instantiate_template(parsed_template, {'input0': 'value2'})
+        self.assertEqual(second, {'section': [{'key0': 'value2'}]})
+
+    def test_instantiate_copies_mutable_inputs(self):
+        parsed_template = parse_template_string("key0: !input0\nkey1: '!input0'\n")
+        input_args = {'input0': ['value0']}
+        instance = instantiate_template(parsed_template, input_args)
+        instance['key0'].append('value1')
+        instance['key1'].append('value2')
+        self.assertEqual(input_args, {'input0': ['value0']})
+        self.assertEqual(instantiate_template(parsed_template, input_args),
+                         {'key0': ['value0'], 'key1': ['value0']})
+
+    def test_instantiate_missing_input(self):
+        parsed_template = parse_template_string('key0: !input0\n')
+        with self.assertRaises(KeyError):
+            instantiate_template(parsed_template)
+
+    def test_instantiate_unknown_input(self):
+        parsed_template = parse_template_string('key0: !input0\n')
+        with self.assertRaises(KeyError):
+            instantiate_template(parsed_template, {'input0': 0, 'input1': 1})
+
+
+class TestMatchInput(unittest.TestCase):
+    def test_match_input(self):
+        input_args = {'source': 0, 'sourceFile': 1}
+        self.assertEqual(match_input('sourceFile', input_args), ('sourceFile', ''))
+        self.assertEqual(match_input('sourceFileName', input_args), ('sourceFile', 'Name'))
+        self.assertEqual(match_input('target', input_args), (None, 'target'))
+
+
+if __name__ == '__main__':
+    unittest.main()
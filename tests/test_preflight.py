@@ -0,0 +1,109 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the preflight module.
+"""
+import os
+import shutil
+import unittest
+from unittest import mock
+
+from src import preflight
+from src.preflight import (
+    list_directory_sizes,
+    group_sources_by_directory,
+    run_preflight,
+    format_preflight_report,
+)
+
+TREE_ROOT = 'preflight_tree'
+
+
+class TestPreflight(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(os.path.join(TREE_ROOT, 'lib'))
+        for name, content in [('app.exe', 'app'), ('lib/a.dll', 'aa'), ('lib/b.dll', 'bbb')]:
+            with open(os.path.join(TREE_ROOT, name), 'w', encoding='utf-8') as file:
+                file.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(TREE_ROOT)
+
+    def test_list_directory_sizes(self):
+        self.assertEqual(
+            list_directory_sizes(os.path.join(TREE_ROOT, 'lib')), {'a.dll': 2, 'b.dll': 3})
+        self.assertIsNone(list_directory_sizes(os.path.join(TREE_ROOT, 'missing')))
+
+    def test_group_sources_by_directory(self):
+        config = {'files': [
+            {'source': f'{TREE_ROOT}\\app.exe'},
+            {'source': f'{TREE_ROOT}/lib/*.dll'},
+            {'source': '{tmp}\\setup.dll'},
+        ]}
+        self.assertEqual(group_sources_by_directory(config), {
+            TREE_ROOT: {'app.exe': f'{TREE_ROOT}\\app.exe'},
+            os.path.join(TREE_ROOT, 'lib'): {'*.dll': f'{TREE_ROOT}/lib/*.dll'},
+        })
+
+    def test_run_preflight(self):
+        config = {'files': [
+            {'source': f'{TREE_ROOT}/app.exe'},
+            {'source': f'{TREE_ROOT}/lib/*.dll'},
+            {'source': f'{TREE_ROOT}/lib/a.dll'},
+            {'source': f'{TREE_ROOT}/lib/c.dll'},
+            {'source': f'{TREE_ROOT}/missing/*.txt'},
+            {'source': f'{TREE_ROOT}/*/b.dll'},
+        ]}
+        # Every directory is listed only once
+        with mock.patch.object(
+                preflight, 'list_directory_sizes',
+                wraps=list_directory_sizes) as mocked_list:
+            report = run_preflight(config)
+        self.assertEqual(mocked_list.call_count, 3)
+        self.assertEqual(sorted(report['missing']), [
+            f'{TREE_ROOT}/lib/c.dll',
+            f'{TREE_ROOT}/missing/*.txt',
+        ])
+        # app.exe, a.dll and b.dll, plus b.dll found through the wildcard directory
+        self.assertEqual(report['files'], 4)
+        self.assertEqual(report['totalSize'], 3 + 2 + 3 + 3)
+
+    def test_run_preflight_brackets(self):
+        with open(os.path.join(TREE_ROOT, 'lib', '[x].dll'), 'w', encoding='utf-8') as file:
+            file.write('x')
+        config = {'files': [
+            {'source': f'{TREE_ROOT}/lib/[x].dll'},
+            {'source': f'{TREE_ROOT}/lib/[x]*'},
+            # A character class for fnmatch, but not for InnoSetup
+            {'source': f'{TREE_ROOT}/lib/[ab].dll'},
+        ]}
+        report = run_preflight(config)
+        self.assertEqual(report['missing'], [f'{TREE_ROOT}/lib/[ab].dll'])
+        self.assertEqual(report['files'], 1)
+
+    def test_run_preflight_glob_entries(self):
+        config = {'files': [
+            {'sourceGlob': f'{TREE_ROOT}/**/*.dll', 'perDirectory': True},
+            {'sourceGlob': f'{TREE_ROOT}/missing/*.dll'},
+        ]}
+        # The glob entries are scanned once, without listing their directories again
+        with mock.patch.object(
+                preflight, 'list_directory_sizes',
+                wraps=list_directory_sizes) as mocked_list:
+            report = run_preflight(config)
+        self.assertEqual(mocked_list.call_count, 0)
+        self.assertEqual(report['missing'], [f'{TREE_ROOT}/missing/*.dll'])
+        self.assertEqual(report['files'], 2)
+        self.assertEqual(report['totalSize'], 2 + 3)
+
+    def test_format_preflight_report(self):
+        report = {'missing': ['a.dll'], 'files': 2, 'totalSize': 10}
+        expected = "\n".join([
+            'Preflight: 2 source files found, 10 bytes in total.',
+            '1 source files are missing:',
+            '  - a.dll',
+        ])
+        self.assertEqual(format_preflight_report(report), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the profiling module.
+"""
+from contextlib import redirect_stderr
+import io
+import os
+import pstats
+import shutil
+import threading
+import unittest
+
+from src.profiling import _NULL_CONTEXT, Profiler, listen_phases, profile, profile_phase
+from tests.helpers import write_config_tree
+from yamelinno import main
+
+TREE_ROOT = os.path.abspath('profiling_tree')
+CONFIG_FILE = os.path.join(TREE_ROOT, 'setup.yml')
+OUTPUT_FILE = os.path.join(TREE_ROOT, 'setup.iss')
+PROFILE_FILE = os.path.join(TREE_ROOT, 'setup.prof')
+SCHEMA_FILE = os.path.abspath('schemas/base-schema.yml')
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        write_config_tree(TREE_ROOT)
+
+    def tearDown(self):
+        shutil.rmtree(TREE_ROOT)
+
+    def test_phases_do_nothing_without_a_profile(self):
+        self.assertIs(profile_phase('load'), _NULL_CONTEXT)
+
+    def test_phases_of_other_threads(self):
+        def run_phase():
+            with profile_phase('fetch'):
+                pass
+
+        def run_in_thread():
+            thread = threading.Thread(target=run_phase)
+            thread.start()
+            thread.join()
+
+        with profile(trace_memory=False) as profiler:
+            with profile_phase('load'):
+                run_in_thread()
+        # The phases of other threads belong to other renders
+        self.assertEqual(list(profiler.phases), [('load',)])
+        profiler = Profiler(trace_memory=False)
+        with listen_phases(profiler, all_threads=True):
+            with profile_phase('load'):
+                run_in_thread()
+        # The phase of the other thread is not nested in the running phase
+        self.assertEqual(list(profiler.phases), [('load',), ('fetch',)])
+
+    def test_nested_phases(self):
+        with profile() as profiler:
+            with profile_phase('load'):
+                for _ in range(3):
+                    with profile_phase('template'):
+                        data = [0] * 100000
+                        del data
+            with profile_phase('render'):
+                pass
+        self.assertEqual(
+            list(profiler.phases), [('load',), ('load', 'template'), ('render',)])
+        load = profiler.phases[('load',)]
+        template = profiler.phases[('load', 'template')]
+        self.assertEqual((load.calls, template.calls), (1, 3))
+        self.assertGreaterEqual(load.seconds, template.seconds)
+        # The peak of a phase includes the peaks of its children
+        self.assertGreaterEqual(template.peak_bytes, 800000)
+        self.assertGreaterEqual(load.peak_bytes, template.peak_bytes)
+
+    def test_without_memory(self):
+        with profile(trace_memory=False) as profiler:
+            with profile_phase('load'):
+                pass
+        self.assertEqual(profiler.phases[('load',)].peak_bytes, 0)
+        self.assertIn('load', profiler.format_report())
+
+    def test_main_profile(self):
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            main([CONFIG_FILE, '-o', OUTPUT_FILE, '-s', SCHEMA_FILE,
+                  '--profile', '--profile-dump', PROFILE_FILE])
+        report = stderr.getvalue()
+        for phase in ('load', '  template:files.yml', 'schema', 'validate',
+                      '  section:files', 'render', 'write'):
+            self.assertIn(f"\n{phase} ", report)
+        self.assertGreater(pstats.Stats(PROFILE_FILE).total_calls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the reading module.
+"""
+import os
+import unittest
+
+import yaml
+
+from src.reading import open_mapped
+
+
+class TestOpenMapped(unittest.TestCase):
+    def test_open_mapped_yaml(self):
+        input_file = 'mapped_input.yml'
+        with open(input_file, 'w', encoding='utf-8') as file:
+            file.write('key0: válue0\nkey1:\n  - value1\n')
+        with open_mapped(input_file) as mapped_file:
+            actual = yaml.load(mapped_file, Loader=yaml.FullLoader)
+        # Clean up
+        os.remove(input_file)
+        self.assertEqual(actual, {'key0': 'válue0', 'key1': ['value1']})
+
+    def test_open_mapped_empty_file(self):
+        input_file = 'mapped_empty.yml'
+        with open(input_file, 'w', encoding='utf-8') as file:
+            file.write('')
+        with open_mapped(input_file) as mapped_file:
+            content = mapped_file.read()
+        # Clean up
+        os.remove(input_file)
+        self.assertEqual(content, b'')
+
+    def test_open_mapped_error_name(self):
+        input_file = 'mapped_invalid.yml'
+        with open(input_file, 'w', encoding='utf-8') as file:
+            file.write('key0: [value0\n')
+        with self.assertRaises(yaml.YAMLError) as context:
+            with open_mapped(input_file) as mapped_file:
+                yaml.load(mapped_file, Loader=yaml.FullLoader)
+        # Clean up
+        os.remove(input_file)
+        self.assertIn(input_file, str(context.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the registry module, against a local registry server.
+"""
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import os
+import shutil
+import threading
+import unittest
+from unittest import mock
+
+from src.dependencies import record_dependencies
+from src.registry import (
+    TemplateRegistry,
+    get_registry_references,
+    parse_registry_reference,
+)
+from src.stats import collect_stats
+from src.templates import load_config
+
+CACHE_DIR = 'registry_cache'
+CONFIG_FILE = 'registry_config.yml'
+
+TEMPLATES = {
+    '/org/setup/1.0': b"setup:\n  appName: Registry App\n",
+    '/org/files/latest': b"files:\n  - source: app.exe\n    destDir: '{app}'\n",
+}
+
+
+class RegistryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests: list = []
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        RegistryHandler.requests.append(self.path)
+        body = TEMPLATES.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        etag = f'"{hashlib.sha256(body).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        RegistryHandler.requests = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), RegistryHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.registry = TemplateRegistry(self.base_url, CACHE_DIR)
+
+    def tearDown(self):
+        self.registry.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        if os.path.exists(CONFIG_FILE):
+            os.remove(CONFIG_FILE)
+
+    def test_parse_registry_reference(self):
+        self.assertEqual(parse_registry_reference('registry://org/setup@1.0'), ('org/setup', '1.0'))
+        self.assertEqual(parse_registry_reference('registry://org/files'), ('org/files', 'latest'))
+        with self.assertRaises(ValueError):
+            parse_registry_reference('registry://')
+
+    def test_fetch(self):
+        path = self.registry.fetch('registry://org/setup@1.0')
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), TEMPLATES['/org/setup/1.0'])
+        # The cache is content-addressed
+        self.assertEqual(
+            os.path.basename(path),
+            hashlib.sha256(TEMPLATES['/org/setup/1.0']).hexdigest() + '.yml')
+
+    def test_fetch_not_found(self):
+        with self.assertRaises(FileNotFoundError):
+            self.registry.fetch('registry://org/missing@1.0')
+
+    def test_revalidation(self):
+        first_path = self.registry.fetch('registry://org/setup@1.0')
+        # A new registry reads the cache index left by the first one
+        registry = TemplateRegistry(self.base_url, CACHE_DIR)
+        with mock.patch.object(registry, '_store') as store:
+            self.assertEqual(registry.fetch('registry://org/setup@1.0'), first_path)
+            store.assert_not_called()
+        registry.pool.close()
+        self.assertEqual(len(RegistryHandler.requests), 2)
+
+    def test_connections_are_reused(self):
+        self.registry.fetch('registry://org/setup@1.0')
+        self.registry.fetch('registry://org/files')
+        idle_connections = list(self.registry.pool.connections.values())
+        self.assertEqual(len(idle_connections), 1)
+        self.assertEqual(idle_connections[0].qsize(), 1)
+
+    def test_offline(self):
+        path = self.registry.fetch('registry://org/setup@1.0')
+        offline_registry = TemplateRegistry(self.base_url, CACHE_DIR, offline=True)
+        self.assertEqual(offline_registry.fetch('registry://org/setup@1.0'), path)
+        with self.assertRaises(FileNotFoundError):
+            offline_registry.fetch('registry://org/files')
+        self.assertEqual(len(RegistryHandler.requests), 1)
+
+    def test_unreachable_registry_uses_cache(self):
+        path = self.registry.fetch('registry://org/setup@1.0')
+        self.server.shutdown()
+        self.server.server_close()
+        self.registry.pool.close()
+        self.assertEqual(self.registry.fetch('registry://org/setup@1.0'), path)
+
+    def test_broken_registry_response_uses_cache(self):
+        path = self.registry.fetch('registry://org/setup@1.0')
+        error = http.client.IncompleteRead(b'')
+        with mock.patch.object(self.registry.pool, 'request', side_effect=error):
+            self.assertEqual(self.registry.fetch('registry://org/setup@1.0'), path)
+            with self.assertRaises(FileNotFoundError):
+                self.registry.fetch('registry://org/files')
+
+    def test_server_error_uses_cache(self):
+        path = self.registry.fetch('registry://org/setup@1.0')
+        with mock.patch.object(self.registry.pool, 'request', return_value=(503, {}, b'')):
+            self.assertEqual(self.registry.fetch('registry://org/setup@1.0'), path)
+            with self.assertRaises(FileNotFoundError):
+                self.registry.fetch('registry://org/files')
+
+    def test_corrupt_index_is_an_empty_cache(self):
+        os.makedirs(CACHE_DIR)
+        with open(os.path.join(CACHE_DIR, 'index.json'), 'w', encoding='utf-8') as file:
+            file.write('{"registry://org/setup@1.0": ')
+        registry = TemplateRegistry(self.base_url, CACHE_DIR)
+        self.assertIsNone(registry.lookup('registry://org/setup@1.0'))
+        self.assertTrue(os.path.exists(registry.fetch('registry://org/setup@1.0')))
+        registry.pool.close()
+
+    def test_index_entries_are_merged(self):
+        # Two registries sharing the cache, as two processes would
+        registry = TemplateRegistry(self.base_url, CACHE_DIR)
+        self.registry.fetch('registry://org/setup@1.0')
+        registry.fetch('registry://org/files')
+        registry.pool.close()
+        merged_registry = TemplateRegistry(self.base_url, CACHE_DIR)
+        self.assertIsNotNone(merged_registry.lookup('registry://org/setup@1.0'))
+        self.assertIsNotNone(merged_registry.lookup('registry://org/files'))
+
+    def test_prefetch(self):
+        with collect_stats() as stats:
+            paths = self.registry.prefetch(
+                ['registry://org/setup@1.0', 'registry://org/files'])
+        self.assertEqual(set(paths), {'registry://org/setup@1.0', 'registry://org/files'})
+        self.assertTrue(all(os.path.exists(path) for path in paths.values()))
+        # Counted by the thread collecting the statistics, not by the workers
+        self.assertEqual(stats.get_caches(), {'registry': {'hits': 0, 'misses': 2}})
+
+    def test_get_registry_references(self):
+        config = {'templates': [
+            'base-template.yml',
+            'registry://org/setup@1.0',
+            {'path': 'registry://org/files', 'inputs': None},
+        ]}
+        self.assertEqual(
+            get_registry_references(config),
+            ['registry://org/setup@1.0', 'registry://org/files'])
+
+    def test_load_config(self):
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as file:
+            file.write(
+                "templates:\n"
+                "  - registry://org/setup@1.0\n"
+                "  - registry://org/files\n"
+                "setup:\n"
+                "  appVersion: '1.0'\n")
+        environment = {'YAMELINNO_REGISTRY': self.base_url, 'YAMELINNO_CACHE': CACHE_DIR}
+        with mock.patch.dict(os.environ, environment), record_dependencies() as dependencies:
+            config = load_config(CONFIG_FILE)
+        self.assertEqual(config['setup'], {'appName': 'Registry App', 'appVersion': '1.0'})
+        # The prefetched templates are still recorded as dependencies
+        self.assertEqual(len(dependencies), 2)
+        self.assertEqual(config['files'], [{'source': 'app.exe', 'destDir': '{app}'}])
+        # The prefetched templates are not fetched again when searched
+        self.assertEqual(len(RegistryHandler.requests), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
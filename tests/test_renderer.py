@@ -0,0 +1,141 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the renderer module.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import io
+import os
+import shutil
+import unittest
+
+from src import placeholders
+from src.renderer import Renderer, get_template_paths, render_file_async
+from src.rendering import load_schema
+
+TREE_ROOT = os.path.abspath('renderer_tree')
+TEMPLATE_DIR = os.path.join(TREE_ROOT, 'shared')
+CONFIG_FILE = os.path.join(TREE_ROOT, 'setup.yml')
+OUTPUT_FILE = os.path.join(TREE_ROOT, 'setup.iss')
+SCHEMA_FILE = os.path.abspath('schemas/base-schema.yml')
+CONFIG = {
+    'templates': ['files.yml'],
+    'setup': {'appName': 'App', 'appVersion': '1.0'},
+    'code': {'raw': ''},
+}
+CONFIG_SOURCE = (
+    "templates:\n  - files.yml\n"
+    "setup:\n  appName: App\n  appVersion: '1.0'\n"
+    "code:\n  raw: ''\n")
+
+
+class TestRenderer(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(TEMPLATE_DIR)
+        # The template is only found through the template directories
+        with open(os.path.join(TEMPLATE_DIR, 'files.yml'), 'w', encoding='utf-8') as file:
+            file.write("files:\n  - source: app.exe\n    destDir: '{app}'\n")
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as file:
+            file.write(CONFIG_SOURCE)
+        self.renderer = Renderer(SCHEMA_FILE, template_dirs=[TEMPLATE_DIR])
+
+    def tearDown(self):
+        shutil.rmtree(TREE_ROOT)
+
+    def assert_rendered(self, script):
+        self.assertIn('AppName="App"', script)
+        self.assertIn('Source: "app.exe"', script)
+
+    def test_render_file(self):
+        self.assert_rendered(self.renderer.render_file(CONFIG_FILE))
+
+    def test_render_file_to_output_file(self):
+        self.assertIsNone(self.renderer.render_file(CONFIG_FILE, OUTPUT_FILE))
+        with open(OUTPUT_FILE, 'r', encoding='utf-8') as file:
+            self.assertEqual(file.read(), self.renderer.render_file(CONFIG_FILE))
+
+    def test_render_string(self):
+        self.assertEqual(
+            self.renderer.render_string(CONFIG_SOURCE, TREE_ROOT),
+            self.renderer.render_file(CONFIG_FILE))
+
+    def test_render_dict_leaves_the_config_untouched(self):
+        self.assert_rendered(self.renderer.render_dict(CONFIG, TREE_ROOT))
+        self.assertEqual(CONFIG['templates'], ['files.yml'])
+
+    def test_render_to_stream(self):
+        stream = io.StringIO()
+        self.renderer.render_to_stream(CONFIG, stream, TREE_ROOT)
+        self.assert_rendered(stream.getvalue())
+
+    def test_schema_can_be_loaded(self):
+        renderer = Renderer(load_schema(SCHEMA_FILE), template_dirs=[TEMPLATE_DIR])
+        self.assertEqual(renderer.render_file(CONFIG_FILE), self.renderer.render_file(CONFIG_FILE))
+
+    def test_template_not_found(self):
+        with self.assertRaises(FileNotFoundError):
+            Renderer(SCHEMA_FILE).render_file(CONFIG_FILE)
+
+    def test_render_string_must_be_a_mapping(self):
+        with self.assertRaises(ValueError):
+            self.renderer.render_string("- a\n- b\n")
+
+    def test_concurrent_renders(self):
+        expected = self.renderer.render_file(CONFIG_FILE)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            scripts = list(executor.map(
+                lambda _: self.renderer.render_dict(CONFIG, TREE_ROOT), range(32)))
+        self.assertEqual(scripts, [expected] * 32)
+
+
+class TestRenderFileAsync(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(TEMPLATE_DIR)
+        with open(os.path.join(TEMPLATE_DIR, 'files.yml'), 'w', encoding='utf-8') as file:
+            file.write(
+                "templates:\n  - nested.yml\n"
+                "files:\n  - source: app.exe\n    destDir: '{app}'\n")
+        with open(os.path.join(TEMPLATE_DIR, 'nested.yml'), 'w', encoding='utf-8') as file:
+            file.write("files:\n  - source: lib.dll\n    destDir: '{app}'\n")
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as file:
+            file.write(CONFIG_SOURCE)
+        self.renderer = Renderer(SCHEMA_FILE, template_dirs=[TEMPLATE_DIR])
+
+    def tearDown(self):
+        shutil.rmtree(TREE_ROOT)
+
+    def test_get_template_paths(self):
+        self.assertEqual(
+            get_template_paths({'templates': ['a.yml', {'path': 'b.yml'}, {'inputs': {}}]}),
+            ['a.yml', 'b.yml'])
+        self.assertEqual(get_template_paths({'setup': {}}), [])
+
+    def test_render_file_async(self):
+        placeholders._PARSED_TEMPLATES.clear()  # pylint: disable=protected-access
+        script = asyncio.run(render_file_async(CONFIG_FILE, renderer=self.renderer))
+        self.assertEqual(script, self.renderer.render_file(CONFIG_FILE))
+        self.assertIn('Source: "lib.dll"', script)
+        # Every template was parsed once, and cached
+        self.assertEqual(len(placeholders._PARSED_TEMPLATES), 2)  # pylint: disable=protected-access
+
+    def test_concurrent_renders_share_a_semaphore(self):
+        async def render_all():
+            semaphore = asyncio.Semaphore(2)
+            return await asyncio.gather(*(
+                render_file_async(CONFIG_FILE, f"{OUTPUT_FILE}.{index}", self.renderer, semaphore)
+                for index in range(16)))
+
+        self.assertEqual(asyncio.run(render_all()), [None] * 16)
+        expected = self.renderer.render_file(CONFIG_FILE)
+        for index in range(16):
+            with open(f"{OUTPUT_FILE}.{index}", 'r', encoding='utf-8') as file:
+                self.assertEqual(file.read(), expected)
+
+    def test_missing_template(self):
+        os.remove(os.path.join(TEMPLATE_DIR, 'nested.yml'))
+        with self.assertRaises(FileNotFoundError):
+            asyncio.run(render_file_async(CONFIG_FILE, renderer=self.renderer))
+
+
+if __name__ == '__main__':
+    unittest.main()
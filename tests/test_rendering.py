@@ -1,4 +1,5 @@
 # pylint: disable=missing-docstring
+import io
 import unittest
 import os
 
@@ -11,8 +12,12 @@ from src.rendering import (
     render_entry,
     render_raw,
     render_section,
-    render
+    render_entry_table,
+    render_to_stream,
+    render,
+    open_output,
 )
+from src.entries import EntryTable
 
 class LoadSchemaTestCase(unittest.TestCase):
     def test_load_schema(self):
@@ -170,6 +175,49 @@ class RenderEntryTestCase(unittest.TestCase):
         with self.assertRaises(Exception):
             render_entry(entry, section_definition)
 
+class RenderEntryTableTestCase(unittest.TestCase):
+    section_definition = {
+        'renderedName': 'SectionName',
+        'children': 'entries',
+        'entry': {
+            'keyName': {
+                'renderedName': 'KeyName',
+                'required': True
+            },
+            'flags': {
+                'renderedName': 'Flags',
+                'required': False
+            }
+        }
+    }
+
+    def test_render_entry_table(self):
+        entry_table = EntryTable([
+            {'keyName': 'value1', 'flags': ['flag1', 'flag2']},
+            {'flags': ['flag1', 'flag2'], 'keyName': 'value2'},
+        ])
+        expected_output = "".join([
+            'KeyName: "value1"; Flags: flag1 flag2\n',
+            'Flags: flag1 flag2; KeyName: "value2"\n'
+        ])
+        rendered_entries = render_entry_table(entry_table, self.section_definition)
+        self.assertEqual(rendered_entries, expected_output)
+
+    def test_render_entry_table_with_missing_required_key(self):
+        entry_table = EntryTable([{'flags': ['flag1']}])
+        with self.assertRaises(KeyError):
+            render_entry_table(entry_table, self.section_definition)
+
+    def test_render_section_with_entry_table(self):
+        entry_table = EntryTable([{'keyName': 'value1'}])
+        expected_output = "".join([
+            '[SectionName]\n',
+            'KeyName: "value1"\n\n'
+        ])
+        rendered_section = render_section(entry_table, self.section_definition)
+        self.assertEqual(rendered_section, expected_output)
+
+
 class RenderRawTestCase(unittest.TestCase):
     def test_render_raw_return(self):
         raw_code = 'A single-line value'
@@ -338,7 +386,94 @@ class RenderSectionTestCase(unittest.TestCase):
         self.assertEqual(rendered_section, expected_output)
 
 
+    def test_render_section_with_raw_file(self):
+        raw_file = 'raw_code.pas'
+        with open(raw_file, 'w', encoding='utf-8') as file:
+            file.write('begin\nend;\n')
+        section = {'raw_file': raw_file}
+        section_definition = {
+            'renderedName': 'Code',
+            'children': 'raw',
+        }
+        expected_output = '[Code]\nbegin\nend;\n\n'
+        rendered_section = render_section(section, section_definition)
+        # Clean up
+        os.remove(raw_file)
+        self.assertEqual(rendered_section, expected_output)
+
+
 class RenderTestCase(unittest.TestCase):
+    def test_render_to_stream_with_raw_file(self):
+        raw_file = 'raw_code_stream.pas'
+        with open(raw_file, 'w', encoding='utf-8') as file:
+            file.write('begin\nend;\n')
+        config = {
+            'sectionName': {'keyName': 'value'},
+            'code': {'raw_file': raw_file}
+        }
+        schema = {
+            'sectionName': {
+                'renderedName': 'SectionName',
+                'children': 'keys',
+                'keys': {'keyName': {'renderedName': 'KeyName'}}
+            },
+            'code': {'renderedName': 'Code', 'children': 'raw'}
+        }
+        expected_output = "".join([
+            '[SectionName]\n',
+            'KeyName="value"\n\n',
+            '[Code]\n',
+            'begin\nend;\n\n'
+        ])
+        stream = io.StringIO()
+        render_to_stream(config, schema, stream)
+        rendered_config = render(config, schema)
+        # Clean up
+        os.remove(raw_file)
+        self.assertEqual(stream.getvalue(), expected_output)
+        self.assertEqual(rendered_config, expected_output)
+
+    def test_render_to_stream_with_crlf_raw_file(self):
+        raw_file = 'raw_code_crlf.pas'
+        with open(raw_file, 'wb') as file:
+            file.write(b'begin\r\nend;\r\n')
+        config = {'code': {'raw_file': raw_file}}
+        schema = {'code': {'renderedName': 'Code', 'children': 'raw'}}
+        stream = io.StringIO()
+        render_to_stream(config, schema, stream)
+        output_file = 'raw_code_crlf.iss'
+        with open_output(output_file) as file:
+            render_to_stream(config, schema, file)
+        with open(output_file, 'rb') as file:
+            rendered = file.read()
+        # Clean up
+        os.remove(raw_file)
+        os.remove(output_file)
+        # The bytes of the raw file are copied unchanged
+        self.assertEqual(stream.getvalue(), '[Code]\nbegin\r\nend;\r\n\n')
+        self.assertIn(b'[Code]' + os.linesep.encode() + b'begin\r\nend;\r\n', rendered)
+
+    def test_open_output_keeps_the_previous_script(self):
+        output_file = 'previous_script.iss'
+        with open(output_file, 'w', encoding='utf-8') as file:
+            file.write('[Setup]\nAppName=App\n')
+        config = {'setup': {'AppName': 'New'}, 'code': {'raw_file': 'missing_raw_file.pas'}}
+        schema = {
+            'setup': {'renderedName': 'Setup', 'children': 'keys',
+                      'keys': {'AppName': {'renderedName': 'AppName', 'type': 'str'}}},
+            'code': {'renderedName': 'Code', 'children': 'raw'},
+        }
+        with self.assertRaises(FileNotFoundError):
+            with open_output(output_file) as file:
+                render_to_stream(config, schema, file)
+        with open(output_file, 'r', encoding='utf-8') as file:
+            previous_script = file.read()
+        leftovers = [name for name in os.listdir('.') if name.startswith(output_file + '.')]
+        # Clean up
+        os.remove(output_file)
+        self.assertEqual(previous_script, '[Setup]\nAppName=App\n')
+        self.assertEqual(leftovers, [])
+
     def test_render_with_keys(self):
         config = {
             'sectionName': {
@@ -0,0 +1,143 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the result_cache module.
+"""
+import os
+import shutil
+import time
+import tomllib
+import unittest
+from unittest import mock
+
+from src.entries import EntryTable
+from src.result_cache import (
+    ResultCache,
+    dependencies_match,
+    get_cache_key,
+    get_tool_version,
+    uses_glob_entries,
+    uses_registry_templates,
+)
+from src.manifest import get_file_record
+from src.registry import get_registry
+from tests.helpers import write_config_tree, write_files_template
+from yamelinno import main
+
+CACHE_DIR = 'result_cache'
+TREE_ROOT = 'result_cache_tree'
+CONFIG_FILE = os.path.join(TREE_ROOT, 'setup.yml')
+TEMPLATE_FILE = os.path.join(TREE_ROOT, 'files.yml')
+OUTPUT_FILE = os.path.join(TREE_ROOT, 'setup.iss')
+SCHEMA = 'schemas/base-schema.yml'
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        write_config_tree(TREE_ROOT)
+
+    def tearDown(self):
+        shutil.rmtree(TREE_ROOT)
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    def render(self):
+        main([CONFIG_FILE, '-s', SCHEMA, '-o', OUTPUT_FILE, '--result-cache', CACHE_DIR])
+        with open(OUTPUT_FILE, 'r', encoding='utf-8') as file:
+            return file.read()
+
+    def test_hit_skips_loading(self):
+        rendered = self.render()
+        os.remove(OUTPUT_FILE)
+        with mock.patch('src.templates.load_config') as load_config:
+            self.assertEqual(self.render(), rendered)
+            load_config.assert_not_called()
+
+    def test_changed_template_misses(self):
+        self.render()
+        write_files_template(TREE_ROOT, ['other.exe'])
+        self.assertIn('other.exe', self.render())
+        # Both renders are kept, and the first one is reused again
+        write_files_template(TREE_ROOT, ['app.exe'])
+        with mock.patch('src.templates.load_config') as load_config:
+            self.assertIn('app.exe', self.render())
+            load_config.assert_not_called()
+
+    def test_dependencies_match(self):
+        record = dict(get_file_record(TEMPLATE_FILE), path=TEMPLATE_FILE)
+        self.assertTrue(dependencies_match([record]))
+        # Touching the file makes it hashed again, but the hash is the same
+        os.utime(TEMPLATE_FILE, ns=(time.time_ns(), time.time_ns() + 10**9))
+        self.assertTrue(dependencies_match([record]))
+        write_files_template(TREE_ROOT, ['other.exe'])
+        self.assertFalse(dependencies_match([record]))
+        os.remove(TEMPLATE_FILE)
+        self.assertFalse(dependencies_match([record]))
+
+    def test_cache_key(self):
+        key = get_cache_key(CONFIG_FILE, SCHEMA, '0.1')
+        self.assertEqual(key, get_cache_key(CONFIG_FILE, SCHEMA, '0.1'))
+        self.assertNotEqual(key, get_cache_key(CONFIG_FILE, SCHEMA, '0.2'))
+        self.assertNotEqual(key, get_cache_key(CONFIG_FILE, 'other.yml', '0.1'))
+        self.assertNotEqual(key, get_cache_key(CONFIG_FILE, SCHEMA))
+
+    def test_cache_key_of_a_copied_tree(self):
+        copied_root = os.path.abspath(TREE_ROOT + '_copy')
+        shutil.copytree(TREE_ROOT, os.path.join(copied_root, TREE_ROOT))
+        try:
+            key = get_cache_key(CONFIG_FILE, SCHEMA)
+            # The same tree in another place, rendered from the same relative directory
+            with mock.patch('os.getcwd', return_value=copied_root):
+                copied_config_file = os.path.join(copied_root, CONFIG_FILE)
+                self.assertEqual(key, get_cache_key(copied_config_file, SCHEMA))
+        finally:
+            shutil.rmtree(copied_root)
+
+    def test_copied_tree_checks_its_own_files(self):
+        self.render()
+        copied_root = os.path.abspath(TREE_ROOT + '_copy')
+        copied_tree = os.path.join(copied_root, TREE_ROOT)
+        shutil.copytree(TREE_ROOT, copied_tree)
+        shutil.copytree('schemas', os.path.join(copied_root, 'schemas'))
+        # The same config in another place, with another template
+        write_files_template(copied_tree, ['other.exe'])
+        copied_output = os.path.join(copied_tree, 'setup.iss')
+        try:
+            with mock.patch('os.getcwd', return_value=copied_root):
+                main([os.path.join(copied_tree, 'setup.yml'), '-s', SCHEMA,
+                      '-o', copied_output, '--result-cache', CACHE_DIR])
+            with open(copied_output, 'r', encoding='utf-8') as file:
+                self.assertIn('other.exe', file.read())
+        finally:
+            shutil.rmtree(copied_root)
+
+    def test_uses_registry_templates(self):
+        with mock.patch.dict('os.environ', {'YAMELINNO_CACHE': os.path.abspath(CACHE_DIR)}):
+            registry = get_registry()
+        self.assertTrue(uses_registry_templates([CONFIG_FILE, registry.get_blob_path('ab')]))
+        self.assertFalse(uses_registry_templates([CONFIG_FILE, TEMPLATE_FILE]))
+
+    def test_tool_version(self):
+        with open('pyproject.toml', 'rb') as file:
+            version = tomllib.load(file)['project']['version']
+        self.assertEqual(get_tool_version(), version)
+
+    def test_uses_glob_entries(self):
+        self.assertFalse(uses_glob_entries({'files': [{'source': 'a.exe'}]}))
+        self.assertTrue(uses_glob_entries({'files': [{'sourceGlob': '*.exe'}]}))
+        self.assertTrue(uses_glob_entries({'files': EntryTable([{'sourceGlob': '*.exe'}])}))
+
+    def test_eviction(self):
+        cache = ResultCache(CACHE_DIR, max_size=1024)
+        for index in range(10):
+            with open(OUTPUT_FILE, 'w', encoding='utf-8') as file:
+                file.write(str(index) * 200)
+            cache.store(f"{index:02d}" + 'a' * 62, OUTPUT_FILE, [CONFIG_FILE])
+        total_size = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(CACHE_DIR) for name in names)
+        self.assertLessEqual(total_size, 1024)
+        # The last result is the most recent one, so it's kept
+        self.assertIsNotNone(cache.lookup('09' + 'a' * 62))
+
+
+if __name__ == '__main__':
+    unittest.main()
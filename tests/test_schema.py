@@ -0,0 +1,215 @@
+# pylint: disable=missing-docstring
+import copy
+import pickle
+import sys
+import unittest
+
+import yaml
+
+from src.schema import (
+    KeyDef,
+    LazySchema,
+    SectionDef,
+    Schema,
+    compile_schema,
+    as_section_def,
+    index_sections,
+    is_section_required,
+    parse_schema,
+)
+from src.validation import get_required_sections, validate_config
+
+SCHEMA_DICT = {
+    'setup': {
+        'renderedName': 'Setup',
+        'children': 'keys',
+        'required': True,
+        'keys': {
+            'appName': {
+                'renderedName': 'AppName',
+                'required': True,
+                'type': 'str'
+            },
+            'appVersion': {
+                'renderedName': 'AppVersion'
+            }
+        }
+    },
+    'files': {
+        'renderedName': 'Files',
+        'children': 'entries',
+        'entry': {
+            'source': {
+                'renderedName': 'Source',
+                'required': True
+            },
+            'flags': {
+                'renderedName': 'Flags',
+                'required': False,
+                'type': 'list'
+            }
+        }
+    }
+}
+
+
+class TestKeyDef(unittest.TestCase):
+    def test_key_def_from_dict(self):
+        key_def = KeyDef.from_dict('appName', SCHEMA_DICT['setup']['keys']['appName'])
+        self.assertEqual(key_def.name, 'appName')
+        self.assertEqual(key_def.rendered_name, 'AppName')
+        self.assertIs(key_def.python_type, str)
+        self.assertTrue(key_def.required)
+
+    def test_key_def_dict_access(self):
+        key_def = KeyDef.from_dict('appVersion', {'renderedName': 'AppVersion'})
+        self.assertEqual(key_def['renderedName'], 'AppVersion')
+        self.assertNotIn('type', key_def)
+        self.assertFalse(key_def.get('required', False))
+        with self.assertRaises(KeyError):
+            _ = key_def['type']
+
+    def test_key_def_has_no_dict(self):
+        key_def = KeyDef('name', 'Name')
+        with self.assertRaises(AttributeError):
+            # The slots don't allow it, which is what is tested
+            key_def.extra = 'value'  # pylint: disable=assigning-non-slot
+
+    def test_key_def_invalid_type(self):
+        with self.assertRaises(ValueError):
+            KeyDef('name', 'Name', type_name='invalid')
+
+
+class TestSectionDef(unittest.TestCase):
+    def test_section_def_keys(self):
+        section_def = SectionDef.from_dict('setup', SCHEMA_DICT['setup'])
+        self.assertEqual(section_def.rendered_name, 'Setup')
+        self.assertEqual(section_def.children, 'keys')
+        self.assertIsInstance(section_def.keys['appName'], KeyDef)
+        self.assertEqual(section_def.required_keys, ('appName',))
+        self.assertEqual(section_def.key_types, (
+            ('appName', str, True),
+            ('appVersion', None, False)
+        ))
+
+    def test_section_def_entries(self):
+        section_def = SectionDef.from_dict('files', SCHEMA_DICT['files'])
+        self.assertIsNone(section_def.keys)
+        self.assertEqual(section_def.required_keys, ('source',))
+        self.assertEqual(section_def['entry']['flags']['renderedName'], 'Flags')
+
+    def test_section_def_round_trip(self):
+        section_def = SectionDef.from_dict('files', SCHEMA_DICT['files'])
+        self.assertEqual(section_def.to_dict(), SCHEMA_DICT['files'])
+        self.assertEqual(section_def, SCHEMA_DICT['files'])
+
+    def test_as_section_def(self):
+        section_def = as_section_def(SCHEMA_DICT['setup'])
+        self.assertIsInstance(section_def, SectionDef)
+        self.assertIs(as_section_def(section_def), section_def)
+
+
+class TestCompileSchema(unittest.TestCase):
+    def test_compile_schema(self):
+        schema = compile_schema(SCHEMA_DICT)
+        self.assertIsInstance(schema, Schema)
+        self.assertIsInstance(schema['setup'], SectionDef)
+        self.assertEqual(schema, SCHEMA_DICT)
+        self.assertIs(compile_schema(schema), schema)
+
+    def test_compile_schema_interns_names(self):
+        schema = compile_schema(SCHEMA_DICT)
+        name = "".join(['app', 'Name'])
+        self.assertIs(schema['setup'].keys['appName'].name, sys.intern(name))
+        self.assertIs(
+            schema['setup'].keys['appName'].rendered_name,
+            compile_schema(SCHEMA_DICT)['setup'].keys['appName'].rendered_name)
+
+
+class TestLazySchema(unittest.TestCase):
+    SOURCE = yaml.dump(SCHEMA_DICT, sort_keys=False)
+
+    def test_index_sections(self):
+        sections = index_sections(self.SOURCE)
+        self.assertEqual(list(sections), ['setup', 'files'])
+        start, end = sections['files']
+        self.assertTrue(self.SOURCE[start:end].startswith('files:'))
+        self.assertEqual(end, len(self.SOURCE))
+
+    def test_index_sections_not_indexable(self):
+        self.assertIsNone(index_sections("setup: {required: true}\n"))
+        self.assertIsNone(index_sections("setup: &setup\n  required: true\nother: *setup\n"))
+        self.assertIsNone(index_sections("# Only a comment\n"))
+
+    def test_is_section_required(self):
+        self.assertTrue(is_section_required("setup:\n  # Comment\n  required: yes  # Yes\n"))
+        self.assertFalse(is_section_required("setup:\n  keys:\n    a:\n      required: true\n"))
+        self.assertFalse(is_section_required("setup:\n  required: false\n"))
+
+    def test_sections_are_compiled_on_use(self):
+        schema = parse_schema(self.SOURCE)
+        self.assertIsInstance(schema, LazySchema)
+        self.assertEqual(list(schema), ['setup', 'files'])
+        self.assertEqual(get_required_sections(schema), ['setup'])
+        self.assertEqual(dict.__len__(schema), 0)
+        self.assertIsInstance(schema['files'], SectionDef)
+        self.assertEqual(dict.__len__(schema), 1)
+        self.assertEqual(schema, compile_schema(SCHEMA_DICT))
+
+    def test_copies_compile_all_sections(self):
+        compiled_schema = compile_schema(SCHEMA_DICT)
+        copies = [
+            dict,
+            lambda schema: {**schema},
+            lambda schema: schema.copy(),
+            copy.copy,
+            copy.deepcopy,
+            lambda schema: pickle.loads(pickle.dumps(schema)),
+            lambda schema: schema | {},
+        ]
+        for make_copy in copies:
+            schema = parse_schema(self.SOURCE)
+            copied_schema = make_copy(schema)
+            self.assertNotIsInstance(copied_schema, LazySchema)
+            self.assertEqual(copied_schema, compiled_schema)
+            self.assertEqual(list(copied_schema), ['setup', 'files'])
+
+    def test_update(self):
+        schema = parse_schema(self.SOURCE)
+        schema |= {'other': schema['setup']}
+        schema.update(files=schema['setup'])
+        self.assertEqual(list(schema), ['setup', 'files', 'other'])
+        self.assertIs(schema['files'], schema['setup'])
+
+    def test_remove_sections(self):
+        schema = parse_schema(self.SOURCE)
+        # The sections are removed before being compiled
+        self.assertIsInstance(schema.pop('files'), SectionDef)
+        self.assertIsNone(schema.pop('files', None))
+        with self.assertRaises(KeyError):
+            del schema['files']
+        self.assertEqual(list(schema), ['setup'])
+        self.assertNotIn('files', schema)
+        self.assertIs(schema.setdefault('files', schema['setup']), schema['setup'])
+        self.assertEqual(get_required_sections(schema), ['setup', 'files'])
+        del schema['setup']
+        self.assertEqual(get_required_sections(schema), ['files'])
+        self.assertEqual(schema.popitem()[0], 'files')
+        schema = parse_schema(self.SOURCE)
+        schema.clear()
+        self.assertEqual((len(schema), list(schema.items())), (0, []))
+        self.assertEqual(get_required_sections(schema), [])
+
+    def test_validate_config_compiles_used_sections(self):
+        schema = parse_schema(self.SOURCE)
+        validate_config({'setup': {'appName': 'App'}}, schema)
+        self.assertEqual(list(dict.keys(schema)), ['setup'])
+
+    def test_parse_schema_fallback(self):
+        schema = parse_schema("setup: {renderedName: Setup, children: keys, keys: {}}\n")
+        self.assertNotIsInstance(schema, LazySchema)
+        self.assertEqual(schema['setup'].rendered_name, 'Setup')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the server module: a server is started in a thread, and the
+client sends it requests.
+"""
+import io
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import mock
+
+from src.server import RenderServer, get_request_environment, run_client, run_request
+from tests.helpers import TREE_CONFIG, write_config_tree, write_files_template
+from yamelinno import main
+
+TREE_ROOT = os.path.abspath('server_tree')
+CONFIG_FILE = os.path.join(TREE_ROOT, 'setup.yml')
+TEMPLATE_FILE = os.path.join(TREE_ROOT, 'files.yml')
+OUTPUT_FILE = os.path.join(TREE_ROOT, 'setup.iss')
+SCHEMA_FILE = os.path.abspath('schemas/base-schema.yml')
+
+
+class TestServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.socket_dir = tempfile.mkdtemp()
+        cls.socket_path = os.path.join(cls.socket_dir, 'yamelinno.sock')
+        cls.server = RenderServer(cls.socket_path, main, workers=1)
+        cls.server.start()
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        shutil.rmtree(cls.socket_dir)
+
+    def setUp(self):
+        write_config_tree(TREE_ROOT)
+
+    def tearDown(self):
+        shutil.rmtree(TREE_ROOT)
+
+    def run_client(self, *argv):
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            status = run_client(self.socket_path, list(argv))
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def test_render_to_stdout(self):
+        status, stdout, _ = self.run_client(CONFIG_FILE, '-s', SCHEMA_FILE)
+        self.assertEqual(status, 0)
+        self.assertIn('AppName="App"', stdout)
+        self.assertIn('Source: "app.exe"', stdout)
+
+    def test_render_to_file(self):
+        status, _, _ = self.run_client(CONFIG_FILE, '-s', SCHEMA_FILE, '-o', OUTPUT_FILE)
+        self.assertEqual(status, 0)
+        with open(OUTPUT_FILE, 'r', encoding='utf-8') as file:
+            self.assertIn('Source: "app.exe"', file.read())
+
+    def test_changed_files_are_reloaded(self):
+        self.run_client(CONFIG_FILE, '-s', SCHEMA_FILE)
+        write_files_template(TREE_ROOT, ['other.exe'])
+        _, stdout, _ = self.run_client(CONFIG_FILE, '-s', SCHEMA_FILE)
+        self.assertIn('Source: "other.exe"', stdout)
+
+    def test_errors_are_returned(self):
+        status, _, stderr = self.run_client('missing.yml')
+        self.assertEqual(status, 2)
+        self.assertIn("Input file 'missing.yml' not found", stderr)
+
+    def test_main_uses_the_server(self):
+        stdout = io.StringIO()
+        with mock.patch.dict(os.environ, {'YAMELINNO_SERVER': self.socket_path}), \
+                mock.patch('src.templates.load_config') as load_config, \
+                redirect_stdout(stdout):
+            main([CONFIG_FILE, '-s', SCHEMA_FILE])
+        load_config.assert_not_called()
+        self.assertIn('AppName="App"', stdout.getvalue())
+
+
+    def read_inline_config(self):
+        # The templates of an inline config are searched from the current directory
+        return TREE_CONFIG.replace('files.yml', TEMPLATE_FILE)
+
+    def test_render_inline_input(self):
+        config = self.read_inline_config()
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            status = run_client(self.socket_path, ['-', '-s', SCHEMA_FILE], config)
+        self.assertEqual(status, 0)
+        self.assertIn('AppName="App"', stdout.getvalue())
+
+    def test_main_sends_the_standard_input(self):
+        config = self.read_inline_config()
+        stdout = io.StringIO()
+        with mock.patch.dict(os.environ, {'YAMELINNO_SERVER': self.socket_path}), \
+                mock.patch('sys.stdin', io.StringIO(config)), \
+                mock.patch('src.templates.load_config') as load_config, \
+                redirect_stdout(stdout):
+            main(['-', '-s', SCHEMA_FILE])
+        load_config.assert_not_called()
+        self.assertIn('Source: "app.exe"', stdout.getvalue())
+
+    def test_socket_permissions(self):
+        self.assertEqual(stat.S_IMODE(os.stat(self.socket_path).st_mode), 0o600)
+
+
+class TestClient(unittest.TestCase):
+    def test_server_not_running(self):
+        self.assertIsNone(run_client(os.path.join(tempfile.gettempdir(), 'missing.sock'), []))
+
+    def test_request_environment(self):
+        environment = {'YAMELINNO_SERVER': 'a.sock', 'YAMELINNO_TEMPLATES': 'templates'}
+        with mock.patch.dict(os.environ, environment):
+            request_environment = get_request_environment()
+        self.assertEqual(request_environment['YAMELINNO_TEMPLATES'], 'templates')
+        self.assertNotIn('YAMELINNO_SERVER', request_environment)
+
+    def test_run_request(self):
+        cwd = os.getcwd()
+        with mock.patch.dict(os.environ):
+            response = run_request(main, {'argv': ['--version'], 'cwd': cwd, 'env': {}})
+        self.assertEqual(response, {'status': 0, 'stdout': 'yamelinno 0.1\n', 'stderr': ''})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the sharding module.
+"""
+import os
+import shutil
+import unittest
+
+from src.sharding import (
+    get_fragment_path,
+    write_if_changed,
+    render_sharded,
+)
+
+OUTPUT_DIR = 'sharding_output'
+SCHEMA = {
+    'setup': {
+        'renderedName': 'Setup',
+        'children': 'keys',
+        'keys': {'appName': {'renderedName': 'AppName'}}
+    },
+    'files': {
+        'renderedName': 'Files',
+        'children': 'entries',
+        'entry': {'source': {'renderedName': 'Source'}}
+    }
+}
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        os.mkdir(OUTPUT_DIR)
+
+    def tearDown(self):
+        shutil.rmtree(OUTPUT_DIR)
+
+    def test_get_fragment_path(self):
+        self.assertEqual(get_fragment_path('out/setup.iss', 'files'), 'out/setup.files.iss')
+        self.assertEqual(get_fragment_path('setup', 'files'), 'setup.files.iss')
+
+    def test_write_if_changed(self):
+        path = os.path.join(OUTPUT_DIR, 'file.iss')
+        self.assertTrue(write_if_changed(path, 'content'))
+        self.assertFalse(write_if_changed(path, 'content'))
+        self.assertTrue(write_if_changed(path, 'CONTENT'))
+        with open(path, 'r', encoding='utf-8') as file:
+            self.assertEqual(file.read(), 'CONTENT')
+
+    def test_render_sharded(self):
+        output_file = os.path.join(OUTPUT_DIR, 'setup.iss')
+        setup_fragment = os.path.join(OUTPUT_DIR, 'setup.setup.iss')
+        files_fragment = os.path.join(OUTPUT_DIR, 'setup.files.iss')
+        config = {
+            'setup': {'appName': 'MyApp'},
+            'files': [{'source': 'app.exe'}]
+        }
+        written = render_sharded(config, SCHEMA, output_file)
+        self.assertEqual(written, [setup_fragment, files_fragment, output_file])
+        with open(output_file, 'r', encoding='utf-8') as file:
+            self.assertEqual(
+                file.read(),
+                '#include "setup.setup.iss"\n#include "setup.files.iss"\n')
+        with open(files_fragment, 'r', encoding='utf-8') as file:
+            self.assertEqual(file.read(), '[Files]\nSource: "app.exe"\n\n')
+
+        # Only the changed section is written again
+        config['files'].append({'source': 'app.dll'})
+        written = render_sharded(config, SCHEMA, output_file)
+        self.assertEqual(written, [files_fragment])
+
+
+if __name__ == '__main__':
+    unittest.main()
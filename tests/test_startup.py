@@ -0,0 +1,128 @@
+# pylint: disable=missing-docstring
+"""
+Startup budget tests: the commands that don't render anything must not
+import the rendering code, and their imports must stay within a time
+budget. The imports are listed and timed with `python -X importtime`, or
+listed from sys.modules, in a fresh interpreter.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'yamelinno.py')
+# The total import time allowed for the script, in milliseconds. It can be
+# raised on slow machines with the YAMELINNO_STARTUP_BUDGET_MS variable.
+STARTUP_BUDGET_MS = int(os.environ.get('YAMELINNO_STARTUP_BUDGET_MS', '150'))
+# The import times are noisy, so the fastest of a few runs is checked
+STARTUP_RUNS = 3
+# Modules only needed to render (or for optional features)
+HEAVY_MODULES = ('yaml', 'http.client', 'zipfile', 'src.templates', 'src.rendering')
+CACHE_DIR = 'startup_cache'
+CONFIG_FILE = 'startup_config.yml'
+OUTPUT_FILE = 'startup_output.iss'
+
+
+def get_import_times(*args) -> dict:
+    """
+    Run the script with -X importtime.
+
+    Returns:
+        dict: The cumulative import time (in microseconds) and the nesting
+            level of every module imported.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', SCRIPT, *args],
+        capture_output=True, text=True, check=True, cwd=ROOT,
+        env=dict(os.environ, YAMELINNO_TEMPLATES='templates', YAMELINNO_SCHEMAS='schemas'))
+    import_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        level = len(name) - len(name.lstrip())
+        import_times[name.strip()] = (int(cumulative), level)
+    return import_times
+
+
+def get_startup_time(*args) -> float:
+    """
+    Measure the total import time of the script, as the fastest of a few
+    runs.
+
+    Returns:
+        float: The total time of the top-level imports, in milliseconds.
+    """
+    startup_times = []
+    for _ in range(STARTUP_RUNS):
+        import_times = get_import_times(*args)
+        top_level = min(level for _, level in import_times.values())
+        startup_times.append(sum(
+            cumulative for cumulative, level in import_times.values()
+            if level == top_level) / 1000)
+    return min(startup_times)
+
+
+def get_imported_modules(code) -> set:
+    """
+    Run some code in a fresh interpreter, from the root of the repository.
+
+    Returns:
+        set: The names of the modules in sys.modules after running it.
+    """
+    code += "\nprint('\\n'.join(sys.modules), file=sys.stderr)"
+    result = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=ROOT)
+    return set(result.stderr.split())
+
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        with open(os.path.join(ROOT, CONFIG_FILE), 'w', encoding='utf-8') as file:
+            file.write(
+                "templates:\n  - base-template.yml\n"
+                "setup:\n  appName: App\n  appVersion: '1.0'\n")
+
+    def tearDown(self):
+        shutil.rmtree(os.path.join(ROOT, CACHE_DIR), ignore_errors=True)
+        for path in (CONFIG_FILE, OUTPUT_FILE):
+            if os.path.exists(os.path.join(ROOT, path)):
+                os.remove(os.path.join(ROOT, path))
+
+    def test_version_does_not_import_rendering_code(self):
+        import_times = get_import_times('--version')
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, import_times)
+
+    def test_version_imports_only_argparse(self):
+        # Everything --version imports, besides the script, is imported by a
+        # bare argparse parser showing its version
+        argparse_modules = get_imported_modules(
+            "import argparse, os, sys\n"
+            "parser = argparse.ArgumentParser()\n"
+            "parser.add_argument('-v', action='version', version='0.1')\n"
+            "try:\n    parser.parse_args(['-v'])\nexcept SystemExit:\n    pass")
+        version_modules = get_imported_modules(
+            "import sys\n"
+            "import yamelinno\n"
+            "try:\n    yamelinno.main(['--version'])\nexcept SystemExit:\n    pass")
+        self.assertEqual(version_modules - argparse_modules, {'yamelinno'})
+
+    def test_startup_budget(self):
+        self.assertLess(get_startup_time('--version'), STARTUP_BUDGET_MS)
+        args = [CONFIG_FILE, '-o', OUTPUT_FILE, '--result-cache', CACHE_DIR]
+        get_import_times(*args)
+        self.assertLess(get_startup_time(*args), STARTUP_BUDGET_MS)
+
+    def test_cache_hit_does_not_import_yaml(self):
+        args = [CONFIG_FILE, '-o', OUTPUT_FILE, '--result-cache', CACHE_DIR]
+        self.assertIn('yaml', get_import_times(*args))
+        import_times = get_import_times(*args)
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, import_times)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the stats module.
+"""
+import io
+import json
+import os
+import shutil
+import threading
+import unittest
+
+from src import placeholders
+from src.stats import CountingWriter, collect_stats, count, count_cache, count_unique
+from yamelinno import main
+
+TREE_ROOT = os.path.abspath('stats_tree')
+CONFIG_FILE = os.path.join(TREE_ROOT, 'setup.yml')
+OUTPUT_FILE = os.path.join(TREE_ROOT, 'setup.iss')
+STATS_FILE = os.path.join(TREE_ROOT, 'stats.json')
+SCHEMA_FILE = os.path.abspath('schemas/base-schema.yml')
+
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(TREE_ROOT)
+        with open(os.path.join(TREE_ROOT, 'file.yml'), 'w', encoding='utf-8') as file:
+            file.write("files:\n  - source: '!source'\n    destDir: '{app}'\n")
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as file:
+            file.write(
+                "templates:\n"
+                "  - path: file.yml\n    foreach:\n"
+                "      - source: a.exe\n      - source: b.exe\n      - source: c.exe\n"
+                "  - path: file.yml\n    inputs:\n      source: d.exe\n"
+                "setup:\n  appName: App\n  appVersion: '1.0'\n"
+                "code:\n  raw: ''\n")
+
+    def tearDown(self):
+        shutil.rmtree(TREE_ROOT)
+
+    def test_counters(self):
+        count('ignored')
+        with collect_stats() as stats:
+            count('bytes_read', 10)
+            count_unique('templates', 'a.yml')
+            count_unique('templates', 'a.yml')
+            count_cache('templates', True)
+            count_cache('templates', False)
+            count_cache('templates', False)
+        count('bytes_read', 10)
+        report = stats.as_dict()
+        self.assertEqual(report['bytes_read'], 10)
+        self.assertEqual(report['templates'], {'resolved': 2, 'unique': 1})
+        self.assertEqual(report['caches'], {'templates': {'hits': 1, 'misses': 2}})
+
+    def test_counters_of_the_thread(self):
+        with collect_stats() as stats:
+            # Another render, in another thread
+            thread = threading.Thread(target=count, args=('bytes_read', 10))
+            thread.start()
+            thread.join()
+            count('bytes_read', 1)
+        self.assertEqual(stats.as_dict()['bytes_read'], 1)
+
+    def test_counting_writer(self):
+        output = io.StringIO()
+        with collect_stats() as stats:
+            CountingWriter(output).write('añb')
+        self.assertEqual(output.getvalue(), 'añb')
+        self.assertEqual(stats.as_dict()['output_bytes'], 4)
+
+    def test_main_stats_json(self):
+        placeholders._PARSED_TEMPLATES.clear()  # pylint: disable=protected-access
+        main([CONFIG_FILE, '-o', OUTPUT_FILE, '-s', SCHEMA_FILE, '--stats-json', STATS_FILE])
+        with open(STATS_FILE, 'r', encoding='utf-8') as file:
+            stats = json.load(file)
+        self.assertTrue(stats['succeeded'])
+        self.assertEqual(stats['templates'], {'resolved': 4, 'unique': 1})
+        # The template is parsed once, and then found in the cache
+        self.assertEqual(stats['caches']['templates'], {'hits': 1, 'misses': 1})
+        self.assertEqual(stats['sections']['files'], 4)
+        self.assertEqual(stats['output_bytes'], os.path.getsize(OUTPUT_FILE))
+        self.assertGreater(stats['bytes_read'], os.path.getsize(CONFIG_FILE))
+        self.assertGreaterEqual(stats['yaml_documents'], 2)
+        self.assertIn('load/template:file.yml', stats['phases'])
+
+    def test_main_stats_json_on_failure(self):
+        os.remove(os.path.join(TREE_ROOT, 'file.yml'))
+        with self.assertRaises(FileNotFoundError):
+            main([CONFIG_FILE, '-o', OUTPUT_FILE, '-s', SCHEMA_FILE, '--stats-json', STATS_FILE])
+        with open(STATS_FILE, 'r', encoding='utf-8') as file:
+            self.assertFalse(json.load(file)['succeeded'])
+
+
+if __name__ == '__main__':
+    unittest.main()
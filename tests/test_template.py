@@ -9,10 +9,11 @@ import os
 from src.templates import (
     search_template,
     load_config,
-    render_template,
     deep_merge_dicts,
     validate_template,
+    get_input_sets,
 )
+from src.entries import EntryTable
 
 def assert_equal_length(iter1, iter2) -> bool:
     """
@@ -206,6 +207,7 @@ class TestSearchTemplate(unittest.TestCase):
         expected_path = f'tmp/{template_file}'
         actual_path = search_template(template_file)
         # Clean up
+        del os.environ['YAMELINNO_TEMPLATES']
         os.remove(f'tmp/{template_file}')
         os.rmdir('tmp')
         self.assertEqual(actual_path, expected_path)
@@ -441,76 +443,236 @@ class TestLoadConfig(unittest.TestCase):
         self.assertTrue(assert_equal_dicts(actual_config, expected_config))
 
 
-class TestRenderTemplate(unittest.TestCase):
-    def test_render_template_no_args(self):
-        src_template = "".join([
-            'key0: value1\n',
-            'key1: value2\n',
-            'key2: value3\n',
-        ])
-        expected_rendered = "".join([
-            'key0: value1\n',
-            'key1: value2\n',
-            'key2: value3\n',
-        ])
-        actual_rendered = render_template(src_template)
-        self.assertEqual(actual_rendered, expected_rendered)
-
-    def test_render_template_with_args(self):
-        src_template = "".join([
-            'key0: value1\n',
-            'key1: value2\n',
-            'key2: !key3\n',
-        ])
-        input_args = {'key3': 'value3'}
-        expected_rendered = "".join([
-            'key0: value1\n',
-            'key1: value2\n',
-            'key2: value3\n',
-        ])
-        actual_rendered = render_template(src_template, input_args)
-        self.assertEqual(actual_rendered, expected_rendered)
-
-    def test_render_template_with_missing_args(self):
-        src_template = "".join([
-            'key0: value1\n',
-            'key1: value2\n',
-            'key2: !key3\n',
-        ])
-        input_args = {'key4': 'value4'}
-        with self.assertRaises(KeyError):
-            render_template(src_template, input_args)
-
-    def test_render_template_without_its_args(self):
-        src_template = "".join([
-            'key0: value1\n',
-            'key1: value2\n',
-            'key2: !key3\n',
-        ])
-        expected_rendered = "".join([
-            'key0: value1\n',
-            'key1: value2\n',
-            'key2: !key3\n',
-        ])
-
-        actual_rendered = render_template(src_template)
-        self.assertEqual(actual_rendered, expected_rendered)
-
-    def test_render_template_without_args_brief(self):
-        src_template = "".join([
-            'key0: value1\n',
-            'key1: value2\n',
-            'key2: value3\n',
-        ])
-
-        expected_rendered = "".join([
-            'key0: value1\n',
-            'key1: value2\n',
-            'key2: value3\n',
-        ])
-        actual_rendered = render_template(src_template, None)
-
-        self.assertEqual(actual_rendered, expected_rendered)
+    def test_load_config_compact(self):
+        template_file = 'template_compact.yml'
+        config_file = 'config_compact.yml'
+        with open(template_file, 'w', encoding='utf-8') as file:
+            file.write('section:\n  - key1: value0\n')
+
+        with open(config_file, 'w', encoding='utf-8') as file:
+            content = "".join([
+                'templates:\n'
+                f'  - {template_file}\n',
+                'key0: value1\n',
+                'section:\n',
+                '  - key1: value1\n',
+            ])
+            file.write(content)
+
+        expected_config = {
+            'key0': 'value1',
+            'section': [
+                {'key1': 'value0'},
+                {'key1': 'value1'}
+            ]
+        }
+        actual_config = load_config(config_file, compact=True)
+        # Clean up
+        os.remove(config_file)
+        os.remove(template_file)
+        self.assertIsInstance(actual_config['section'], EntryTable)
+        self.assertEqual(actual_config, expected_config)
+
+
+    def test_load_config_with_foreach(self):
+        template_file = 'template_foreach.yml'
+        config_file = 'config_foreach.yml'
+        with open(template_file, 'w', encoding='utf-8') as file:
+            file.write("section:\n  - key0: !key0\n    key1: '!key1'\n")
+
+        with open(config_file, 'w', encoding='utf-8') as file:
+            content = "".join([
+                'templates:\n'
+                f'  - path: {template_file}\n',
+                '    inputs:\n',
+                '      key1: common\n',
+                '    foreach:\n',
+                '      - key0: value0\n',
+                '      - key0: value1\n',
+                '      - key0: value2\n',
+                '        key1: other\n',
+            ])
+            file.write(content)
+
+        expected_config = {
+            'section': [
+                {'key0': 'value0', 'key1': 'common'},
+                {'key0': 'value1', 'key1': 'common'},
+                {'key0': 'value2', 'key1': 'other'}
+            ]
+        }
+        actual_config = load_config(config_file)
+        compact_config = load_config(config_file, compact=True)
+        # Clean up
+        os.remove(config_file)
+        os.remove(template_file)
+        self.assertEqual(actual_config, expected_config)
+        self.assertEqual(compact_config, expected_config)
+
+    def test_load_config_with_foreach_overwrite(self):
+        template_file = 'template_foreach_overwrite.yml'
+        config_file = 'config_foreach_overwrite.yml'
+        with open(template_file, 'w', encoding='utf-8') as file:
+            file.write("section:\n  - key0: !key0\n")
+
+        with open(config_file, 'w', encoding='utf-8') as file:
+            content = "".join([
+                'templates:\n'
+                f'  - path: {template_file}\n',
+                '    inputs:\n',
+                '      key0: value0\n',
+                f'  - path: {template_file}\n',
+                '    overwrite: true\n',
+                '    foreach:\n',
+                '      - key0: value1\n',
+                '      - key0: value2\n',
+            ])
+            file.write(content)
+
+        actual_config = load_config(config_file)
+        # Clean up
+        os.remove(config_file)
+        os.remove(template_file)
+        # As with sequential includes, the last instance overwrites the others
+        self.assertEqual(actual_config, {'section': [{'key0': 'value2'}]})
+
+    def test_load_config_with_matrix(self):
+        template_file = 'template_matrix.yml'
+        config_file = 'config_matrix.yml'
+        with open(template_file, 'w', encoding='utf-8') as file:
+            file.write("section:\n  - key0: '!arch-!lang'\n")
+
+        with open(config_file, 'w', encoding='utf-8') as file:
+            content = "".join([
+                'templates:\n'
+                f'  - path: {template_file}\n',
+                '    matrix:\n',
+                '      arch: [x86, x64]\n',
+                '      lang: [en, es]\n',
+            ])
+            file.write(content)
+
+        expected_config = {
+            'section': [
+                {'key0': 'x86-en'},
+                {'key0': 'x86-es'},
+                {'key0': 'x64-en'},
+                {'key0': 'x64-es'}
+            ]
+        }
+        actual_config = load_config(config_file)
+        # Clean up
+        os.remove(config_file)
+        os.remove(template_file)
+        self.assertEqual(actual_config, expected_config)
+
+
+    def test_load_config_resolves_raw_file(self):
+        os.mkdir('tmp_raw')
+        config_file = os.path.join('tmp_raw', 'config_raw.yml')
+        raw_file = os.path.join('tmp_raw', 'code.pas')
+        with open(raw_file, 'w', encoding='utf-8') as file:
+            file.write('begin end;\n')
+        with open(config_file, 'w', encoding='utf-8') as file:
+            file.write('code:\n  raw_file: code.pas\n')
+
+        actual_config = load_config(config_file)
+        # Clean up
+        os.remove(config_file)
+        os.remove(raw_file)
+        os.rmdir('tmp_raw')
+        self.assertEqual(actual_config, {'code': {'raw_file': os.path.abspath(raw_file)}})
+
+    def test_load_config_overrides_raw_file(self):
+        os.mkdir('tmp_raw_override')
+        template_file = os.path.join('tmp_raw_override', 'template.yml')
+        config_file = os.path.join('tmp_raw_override', 'config.yml')
+        raw_file = os.path.join('tmp_raw_override', 'code.pas')
+        with open(raw_file, 'w', encoding='utf-8') as file:
+            file.write('begin end;\n')
+        with open(template_file, 'w', encoding='utf-8') as file:
+            file.write('code:\n  raw_file: code.pas\n')
+        with open(config_file, 'w', encoding='utf-8') as file:
+            file.write('templates:\n  - template.yml\ncode:\n  raw: begin end;\n')
+
+        actual_config = load_config(config_file)
+        # Clean up
+        os.remove(config_file)
+        os.remove(template_file)
+        os.remove(raw_file)
+        os.rmdir('tmp_raw_override')
+        # The raw code of the config replaces the raw file of the template
+        self.assertEqual(actual_config, {'code': {'raw': 'begin end;'}})
+
+    def test_load_config_with_foreach_raw_file(self):
+        os.mkdir('tmp_raw_foreach')
+        template_file = os.path.join('tmp_raw_foreach', 'template.yml')
+        raw_file = os.path.join('tmp_raw_foreach', 'code.pas')
+        config_file = 'config_raw_foreach.yml'
+        with open(raw_file, 'w', encoding='utf-8') as file:
+            file.write('begin end;\n')
+        with open(template_file, 'w', encoding='utf-8') as file:
+            file.write('section:\n  - key0: !key0\ncode:\n  raw_file: code.pas\n')
+        with open(config_file, 'w', encoding='utf-8') as file:
+            file.write("".join([
+                'templates:\n',
+                f'  - path: {template_file}\n',
+                '    foreach:\n',
+                '      - key0: value1\n',
+                '      - key0: value2\n',
+            ]))
+
+        actual_config = load_config(config_file)
+        # Clean up
+        os.remove(config_file)
+        os.remove(template_file)
+        os.remove(raw_file)
+        os.rmdir('tmp_raw_foreach')
+        # The raw file is searched next to the template, not the config
+        self.assertEqual(actual_config['code'], {'raw_file': os.path.abspath(raw_file)})
+
+    def test_load_config_missing_raw_file(self):
+        config_file = 'config_missing_raw.yml'
+        with open(config_file, 'w', encoding='utf-8') as file:
+            file.write('code:\n  raw_file: missing_code.pas\n')
+        with self.assertRaises(FileNotFoundError):
+            load_config(config_file)
+        # Clean up
+        os.remove(config_file)
+
+
+class TestGetInputSets(unittest.TestCase):
+    def test_get_input_sets_foreach(self):
+        template_reference = {
+            'path': 'template.yml',
+            'foreach': [{'key0': 'value0'}, {'key0': 'value1'}]
+        }
+        expected_sets = [{'key0': 'value0'}, {'key0': 'value1'}]
+        self.assertEqual(get_input_sets(template_reference), expected_sets)
+
+    def test_get_input_sets_matrix(self):
+        template_reference = {
+            'path': 'template.yml',
+            'inputs': {'key2': 'value2'},
+            'matrix': {'key0': ['a', 'b'], 'key1': [1]}
+        }
+        expected_sets = [
+            {'key0': 'a', 'key1': 1, 'key2': 'value2'},
+            {'key0': 'b', 'key1': 1, 'key2': 'value2'}
+        ]
+        self.assertEqual(get_input_sets(template_reference), expected_sets)
+
+    def test_get_input_sets_both(self):
+        template_reference = {'path': 'template.yml', 'foreach': [], 'matrix': {}}
+        with self.assertRaises(ValueError):
+            get_input_sets(template_reference)
+
+    def test_get_input_sets_invalid(self):
+        with self.assertRaises(TypeError):
+            get_input_sets({'path': 'template.yml', 'foreach': ['value0']})
+        with self.assertRaises(TypeError):
+            get_input_sets({'path': 'template.yml', 'matrix': {'key0': 'value0'}})
+
 
 class TestDeepMergeDicts(unittest.TestCase):
     def test_deep_merge_dicts_no_conflicts(self):
@@ -625,6 +787,20 @@ class TestDeepMergeDicts(unittest.TestCase):
         actual_merged = deep_merge_dicts(source, destination)
         self.assertTrue(assert_equal_dicts(actual_merged, expected_merged))
 
+    def test_deep_merge_dicts_with_entry_table(self):
+        source = {'key1': EntryTable([{'subkey0': 'subvalue1'}])}
+        destination = {'key1': [{'subkey1': 'subvalue2'}]}
+        actual_merged = deep_merge_dicts(source, destination)
+        self.assertIsInstance(actual_merged['key1'], EntryTable)
+        self.assertEqual(
+            actual_merged['key1'], [{'subkey1': 'subvalue2'}, {'subkey0': 'subvalue1'}])
+
+    def test_deep_merge_dicts_with_entry_table_into_list(self):
+        source = {'key1': EntryTable([{'subkey0': 'subvalue1'}])}
+        destination = {'key1': ['subvalue2']}
+        actual_merged = deep_merge_dicts(source, destination)
+        self.assertEqual(actual_merged['key1'], ['subvalue2', {'subkey0': 'subvalue1'}])
+
     def test_deep_merge_dicts_with_incompatible_types(self):
         source = {
             'key0': 'value1',
@@ -0,0 +1,101 @@
+# pylint: disable=missing-docstring
+"""
+Tests for the tracing module.
+"""
+import json
+import os
+import shutil
+import threading
+import unittest
+
+from src import placeholders
+from src.profiling import profile_phase
+from src.tracing import trace
+from yamelinno import main
+
+TREE_ROOT = os.path.abspath('tracing_tree')
+CONFIG_FILE = os.path.join(TREE_ROOT, 'setup.yml')
+OUTPUT_FILE = os.path.join(TREE_ROOT, 'setup.iss')
+TRACE_FILE = os.path.join(TREE_ROOT, 'trace.json')
+SCHEMA_FILE = os.path.abspath('schemas/base-schema.yml')
+
+
+def contains(parent, child):
+    return parent['ts'] <= child['ts'] and \
+        child['ts'] + child['dur'] <= parent['ts'] + parent['dur']
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        os.makedirs(TREE_ROOT)
+        with open(os.path.join(TREE_ROOT, 'parent.yml'), 'w', encoding='utf-8') as file:
+            file.write(
+                "templates:\n  - child.yml\n"
+                "files:\n  - source: a.exe\n    destDir: '{app}'\n")
+        with open(os.path.join(TREE_ROOT, 'child.yml'), 'w', encoding='utf-8') as file:
+            file.write("files:\n  - source: b.exe\n    destDir: '{app}'\n")
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as file:
+            file.write(
+                "templates:\n  - parent.yml\n"
+                "setup:\n  appName: App\n  appVersion: '1.0'\n"
+                "code:\n  raw: ''\n")
+
+    def tearDown(self):
+        shutil.rmtree(TREE_ROOT)
+
+    def test_spans(self):
+        with trace() as tracer:
+            with profile_phase('load'):
+                with profile_phase('template:a.yml'):
+                    pass
+        load, template = tracer.as_dict()['traceEvents']
+        self.assertEqual((load['name'], template['name']), ('load', 'template:a.yml'))
+        self.assertEqual((load['ph'], template['cat']), ('X', 'template'))
+        self.assertTrue(contains(load, template))
+
+    def test_threads_are_traced_apart(self):
+        barrier = threading.Barrier(2)
+
+        def run():
+            with profile_phase('render'):
+                barrier.wait()
+
+        with trace() as tracer:
+            threads = [threading.Thread(target=run) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len({event['tid'] for event in tracer.events}), 2)
+
+    def test_phase_started_before_the_trace(self):
+        phase = profile_phase('load')
+        with phase:
+            with trace() as tracer:
+                pass
+        self.assertEqual(tracer.events, [])
+
+    def test_main_trace(self):
+        placeholders._PARSED_TEMPLATES.clear()  # pylint: disable=protected-access
+        main([CONFIG_FILE, '-o', OUTPUT_FILE, '-s', SCHEMA_FILE, '--trace', TRACE_FILE])
+        with open(TRACE_FILE, 'r', encoding='utf-8') as file:
+            events = json.load(file)['traceEvents']
+        spans = {}
+        for event in events:
+            spans.setdefault(event['name'], []).append(event)
+        parent, = spans['template:parent.yml']
+        child, = spans['template:child.yml']
+        self.assertTrue(contains(parent, child))
+        for name in ('search', 'parse', 'substitute'):
+            self.assertTrue(any(contains(child, span) for span in spans[name]), name)
+        # The child is merged inside its parent, and the parent next to it
+        self.assertTrue(any(contains(parent, span) for span in spans['merge']))
+        load, = spans['load']
+        self.assertTrue(any(
+            contains(load, span) and span['ts'] >= parent['ts'] + parent['dur']
+            for span in spans['merge']))
+        self.assertIn('section:files', spans)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,8 +9,10 @@ from src.validation import (
     validate_key_types,
     validate_keys,
     validate_section,
-    validate_config
+    validate_config,
+    validate_entry_table,
 )
+from src.entries import EntryTable
 
 class TestValidationGetPythonType(unittest.TestCase):
     def test_get_python_type(self):
@@ -230,6 +232,52 @@ class TestValidationValidateKeyTypes(unittest.TestCase):
             validate_key_types(key_types, keys_dict)
 
 
+    def test_validate_key_types_missing_optional_typed_key(self):
+        key_types = [
+            ('key0', str, True),
+            ('key1', int, False),
+        ]
+        keys_dict = {
+            'key0': 'value0',
+        }
+        # This should not raise an exception
+        validate_key_types(key_types, keys_dict)
+
+
+class TestValidationValidateEntryTable(unittest.TestCase):
+    key_types = [
+        ('key0', str, True),
+        ('key1', list, False),
+        ('key2', None, False),
+    ]
+
+    def test_validate_entry_table_valid(self):
+        entry_table = EntryTable([
+            {'key0': 'value0', 'key1': ['value1']},
+            {'key2': 2, 'key0': 'value2'},
+        ])
+        # This should not raise an exception
+        validate_entry_table(entry_table, self.key_types)
+
+    def test_validate_entry_table_missing_key(self):
+        entry_table = EntryTable([{'key1': ['value1']}])
+        with self.assertRaises(KeyError):
+            validate_entry_table(entry_table, self.key_types)
+
+    def test_validate_entry_table_extra_key(self):
+        entry_table = EntryTable([{'key0': 'value0', 'key3': 'value3'}])
+        with self.assertRaises(KeyError):
+            validate_entry_table(entry_table, self.key_types)
+
+    def test_validate_entry_table_invalid_type(self):
+        entry_table = EntryTable([
+            {'key0': 'value0'},
+            {'key0': 0},
+        ])
+        with self.assertRaises(TypeError):
+            validate_entry_table(entry_table, self.key_types)
+
+
 class TestValidationValidateKeys(unittest.TestCase):
     def test_validate_keys_valid_section(self):
         section = {
@@ -385,6 +433,20 @@ class TestValidationValidateSection(unittest.TestCase):
         with self.assertRaises(KeyError):
             validate_section(section, section_definition)
 
+    def test_validate_section_raw_file(self):
+        section_definition = {
+            'renderedName': 'Code',
+            'required': True,
+            'children': 'raw',
+        }
+        # This should not raise an exception
+        validate_section({'raw_file': 'code.pas'}, section_definition)
+        with self.assertRaises(KeyError):
+            validate_section({'raw': 'begin end;', 'raw_file': 'code.pas'}, section_definition)
+        with self.assertRaises(TypeError):
+            validate_section({'raw_file': ['code.pas']}, section_definition)
+
+
 class TestValidationValidateConfig(unittest.TestCase):
     def test_validate_config(self):
         schema = {
@@ -19,5 +19,25 @@ class TestMain(unittest.TestCase):
         with self.assertRaises(SystemExit):
             main(['--schema', 'tests/data/schema.yml', 'tests/data/invalid.yml'])
 
+    def test_main_manifest_without_output(self):
+        with self.assertRaises(SystemExit):
+            main(['--manifest', 'README.md'])
+
+    def test_main_shard_without_output(self):
+        with self.assertRaises(SystemExit):
+            main(['--shard', 'README.md'])
+
+    def test_main_depfile_without_output(self):
+        with self.assertRaises(SystemExit):
+            main(['-MD', 'README.md'])
+
+    def test_main_multi_document_without_pattern(self):
+        with self.assertRaises(SystemExit):
+            main(['--multi-document', '-o', 'setup.iss', 'README.md'])
+
+    def test_main_name_field_without_multi_document(self):
+        with self.assertRaises(SystemExit):
+            main(['--name-field', 'setup.appName', 'README.md'])
+
 if __name__ == '__main__':
     unittest.main()
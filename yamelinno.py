@@ -3,12 +3,15 @@
 This module contains the main function for rendering a configuration
 using a schema and printing the rendered configuration.
 """
+# The modules of the tool are imported where they are used, so the commands
+# that don't render anything (--version, --help, a render cache hit...) don't
+# pay for importing PyYAML and the rest of the rendering code.
+# pylint: disable=import-outside-toplevel
+import io
 import os
+import sys
 import argparse
 
-from src.templates import load_config
-from src.rendering import render, load_schema
-from src.validation import validate_config
 
 def get_startup_configurations(argv=None) -> argparse.Namespace:
     """
@@ -21,7 +24,9 @@ def get_startup_configurations(argv=None) -> argparse.Namespace:
         prog='yamelinno',
         description='Render a configuration using\
             a schema and print the rendered configuration.')
-    parser.add_argument('input_file', help='Input YAML file')
+    parser.add_argument(
+        'input_file',
+        help='Input YAML file, or - to read it from the standard input.')
     parser.add_argument(
         '-o', '--output',
         dest='output_file',
@@ -33,6 +38,104 @@ def get_startup_configurations(argv=None) -> argparse.Namespace:
         dest='schema_file',
         help='Schema file. If not specified, the schema will be read from \
             "schema.yml", which must be in the same directory as the input file.')
+    parser.add_argument(
+        '--manifest',
+        action='store_true',
+        help='Write a manifest with the hashes of the source files and the \
+            rendered script alongside the output file (<output>.manifest.json). \
+            Whether anything changed since the previous manifest is reported \
+            to stderr.')
+    parser.add_argument(
+        '--unchanged-status',
+        dest='unchanged_status',
+        type=int,
+        help='Exit with this status (e.g. 3) when the manifest did not change, \
+            so a pipeline can skip compiling the installer (requires --manifest).')
+    parser.add_argument(
+        '--preflight',
+        action='store_true',
+        help='Check that every source file referenced by the files section \
+            exists before rendering, reporting all the missing ones at once.')
+    parser.add_argument(
+        '--shard',
+        action='store_true',
+        help='Write every section to its own file (e.g. setup.files.iss for \
+            setup.iss), and make the output file include them. Only the files \
+            whose content changed are rewritten.')
+    parser.add_argument(
+        '-MD',
+        dest='write_depfile',
+        action='store_true',
+        help='Write a Make-style dependency file, listing every file read \
+            (the input, templates and schema), to <output>.d.')
+    parser.add_argument(
+        '--depfile',
+        dest='depfile',
+        help='Write the dependency file to this path (implies -MD).')
+    parser.add_argument(
+        '--result-cache',
+        dest='result_cache',
+        default=os.environ.get('YAMELINNO_RESULT_CACHE'),
+        help='Directory of the render cache (default: the YAMELINNO_RESULT_CACHE \
+            environment variable). If the input file and every file it uses are \
+            unchanged since a cached render, the cached script is copied instead.')
+    parser.add_argument(
+        '--result-cache-size',
+        dest='result_cache_size',
+        type=int,
+        help='Size limit of the render cache, in MiB (512 MiB by default). The \
+            least recently used scripts are evicted beyond it.')
+    parser.add_argument(
+        '--multi-document',
+        action='store_true',
+        help='Read a stream of YAML documents, every one of them the config \
+            of an installer, and render each one to its own output file. The \
+            output file is then a pattern, with the {index} of the document \
+            and/or its {name} (e.g. setup-{index}.iss).')
+    parser.add_argument(
+        '--name-field',
+        dest='name_field',
+        help='Field of the documents giving the {name} of their output file, \
+            with its keys separated by dots (e.g. setup.appName). A top-level \
+            field which is not a section of the schema is removed before rendering.')
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Report the time and peak memory of every phase of the render \
+            (loading every template, merging, validating and rendering every \
+            section, writing) to stderr.')
+    parser.add_argument(
+        '--profile-dump',
+        dest='profile_dump',
+        help='Profile the render with cProfile, and write its statistics to \
+            this file, to be read with pstats (implies --profile).')
+    parser.add_argument(
+        '--stats-json',
+        dest='stats_json',
+        help='Write the statistics of the run to this JSON file: templates \
+            resolved, bytes read, YAML documents parsed, cache hits and misses, \
+            entries per section, bytes written and the time of every phase.')
+    parser.add_argument(
+        '--trace',
+        dest='trace_file',
+        help='Trace the render, with a span for every template (and its \
+            search, read, parse, substitution and merge) and every section, \
+            and write it to this file in the Chrome trace event format, which \
+            can be opened with Perfetto.')
+    parser.add_argument(
+        '--memory-report',
+        dest='memory_report',
+        action='store_true',
+        help='Report the peak memory allocated by the render to stderr, \
+            attributed to every phase, and the templates and sections which \
+            allocated the most memory.')
+    parser.add_argument(
+        '--max-memory',
+        dest='max_memory',
+        type=int,
+        help='Memory budget of the render, in MiB. If the resident memory of \
+            the process goes over it, the render is stopped, reporting the \
+            phase running (instead of being killed by the system).')
     parser.add_argument(
         '-v', '--version',
         action='version',
@@ -41,9 +144,31 @@ def get_startup_configurations(argv=None) -> argparse.Namespace:
     args = parser.parse_args(argv)
 
     # Check if the input file exists
-    if not os.path.exists(args.input_file):
+    if args.input_file != '-' and not os.path.exists(args.input_file):
         parser.error(f"Input file '{args.input_file}' not found")
 
+    if args.manifest and args.output_file == 'stdout':
+        parser.error("--manifest requires an output file")
+    if args.unchanged_status is not None and not args.manifest:
+        parser.error("--unchanged-status requires --manifest")
+    if args.shard and args.output_file == 'stdout':
+        parser.error("--shard requires an output file")
+    if (args.write_depfile or args.depfile) and args.output_file == 'stdout':
+        parser.error("-MD and --depfile require an output file")
+    if args.multi_document:
+        if args.manifest or args.shard or args.preflight or args.write_depfile or args.depfile:
+            parser.error("--multi-document can't be used with --manifest, --shard, \
+--preflight, -MD or --depfile")
+        if args.output_file != 'stdout' and \
+                '{index' not in args.output_file and '{name' not in args.output_file:
+            parser.error("--multi-document requires an output pattern with {index} or {name}")
+    if args.name_field and not args.multi_document:
+        parser.error("--name-field requires --multi-document")
+    if args.max_memory is not None and args.max_memory <= 0:
+        parser.error("--max-memory must be a positive number of MiB")
+    if args.write_depfile and not args.depfile:
+        args.depfile = os.path.splitext(args.output_file)[0] + '.d'
+
     # Check if the schema file is specified
     if not args.schema_file:
         # If not specified, assume the base-schema file from this project
@@ -52,23 +177,433 @@ def get_startup_configurations(argv=None) -> argparse.Namespace:
     return args
 
 
+def run_pack_command(argv) -> None:
+    """
+    Runs the pack subcommand (yamelinno pack build <directory>), which
+    builds a template pack from a directory of templates.
+
+    Args:
+        argv (list): The command line arguments, after 'pack'.
+    """
+    from src.packs import PACK_EXTENSION, build_pack
+
+    parser = argparse.ArgumentParser(
+        prog='yamelinno pack',
+        description='Manage template packs.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser(
+        'build',
+        help='Build a template pack from a directory of templates.')
+    build_parser.add_argument('directory', help='Directory with the templates')
+    build_parser.add_argument(
+        '-o', '--output',
+        dest='pack_file',
+        help=f'Pack file. If not specified, <directory>{PACK_EXTENSION} is used.')
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.directory):
+        parser.error(f"Directory '{args.directory}' not found")
+    pack_file = args.pack_file or args.directory.rstrip('/\\') + PACK_EXTENSION
+    file_count = build_pack(args.directory, pack_file)
+    print(f"Packed {file_count} files into {pack_file}", file=sys.stderr)
+
+
+def run_serve_command(argv) -> None:
+    """
+    Runs the serve subcommand (yamelinno serve), which starts the render
+    server and handles requests until it's interrupted.
+
+    Args:
+        argv (list): The command line arguments, after 'serve'.
+    """
+    import signal
+
+    from src.server import (
+        DEFAULT_CACHE_ENTRIES,
+        DEFAULT_WORKERS,
+        RenderServer,
+        get_default_socket_path,
+    )
+
+    parser = argparse.ArgumentParser(
+        prog='yamelinno serve',
+        description='Run a render server, which keeps the parsed schemas and \
+            templates in memory between renders. The CLI sends its commands \
+            to the server when YAMELINNO_SERVER is set to its socket.')
+    parser.add_argument(
+        '--socket',
+        dest='socket_path',
+        default=os.environ.get('YAMELINNO_SERVER') or get_default_socket_path(),
+        help='Path to the Unix domain socket. Default is YAMELINNO_SERVER, \
+            or yamelinno-<uid>.sock in the temporary directory.')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help='Number of worker processes. Default is the number of CPUs.')
+    parser.add_argument(
+        '--cache-entries',
+        type=int,
+        default=DEFAULT_CACHE_ENTRIES,
+        help='Number of parsed files (templates, schemas, packs) kept in \
+            memory by every worker.')
+    args = parser.parse_args(argv)
+    server = RenderServer(args.socket_path, main, args.workers, args.cache_entries)
+    try:
+        server.start()
+    except OSError as error:
+        parser.error(str(error))
+    print(f"Listening on {args.socket_path}", file=sys.stderr)
+    # Stop cleanly when terminated, as when interrupted
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
 def main(argv=None) -> None:
     """
     Main function that loads the configuration and schema files,
     renders the configuration using the schema, and prints the
     rendered configuration.
     """
+    if argv is None:
+        argv = sys.argv[1:]
+    # An input file named like a subcommand is rendered (as is any input
+    # file after '--')
+    subcommand = argv[0] if argv and not os.path.exists(argv[0]) else None
+    if subcommand == 'pack':
+        run_pack_command(argv[1:])
+        return
+    if subcommand == 'serve':
+        run_serve_command(argv[1:])
+        return
     args = get_startup_configurations(argv)
-    config = load_config(args.input_file)
-    schema = load_schema(args.schema_file)
-    validate_config(config, schema)
-    rendered_config = render(config, schema)
+    if os.environ.get('YAMELINNO_SERVER'):
+        # Thin client mode: the server renders, unless it's not running. The
+        # standard input is read by the client, and sent as inline YAML.
+        from src.server import run_client
 
-    if args.output_file == 'stdout':
-        print(rendered_config)
+        input_text = sys.stdin.read() if args.input_file == '-' else None
+        status = run_client(os.environ['YAMELINNO_SERVER'], argv, input_text)
+        if status is None and input_text is not None:
+            sys.stdin = io.StringIO(input_text)
+        if status is not None:
+            if status:
+                sys.exit(status)
+            return
+    instrumented = any((args.profile, args.profile_dump, args.memory_report, args.max_memory,
+                        args.stats_json, args.trace_file))
+    if instrumented:
+        status = run_instrumented(args)
     else:
-        with open(args.output_file, 'w', encoding='utf-8') as f:
-            f.write(rendered_config)
+        status = render_input(args)
+    if status:
+        sys.exit(status)
+
+
+def run_instrumented(args) -> int:
+    """
+    Renders the input file while profiling it, tracing it, collecting its
+    statistics or keeping it within a memory budget, as requested by the
+    command line arguments, and reports the results.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        int: The exit status of the render (see render_input).
+    """
+    from contextlib import ExitStack
+
+    from src.memory import MemoryBudgetExceeded, format_memory_report
+    from src.stats import write_stats
+
+    budget_error = None
+    status = 0
+    succeeded = False
+    with ExitStack() as stack:
+        stats, profiler = start_instruments(args, stack)
+        try:
+            with get_memory_budget(args):
+                status = render_input(args)
+            succeeded = True
+        except MemoryBudgetExceeded as error:
+            budget_error = error
+        finally:
+            if stats is not None:
+                write_stats(args.stats_json, stats, profiler, succeeded)
+    if args.profile or args.profile_dump:
+        print(profiler.format_report(), end='', file=sys.stderr)
+    if args.memory_report:
+        print(format_memory_report(profiler), end='', file=sys.stderr)
+    if budget_error is not None:
+        sys.exit(f"Error: {budget_error}")
+    return status
+
+
+def start_instruments(args, stack) -> tuple:
+    """
+    Starts the trace, the statistics and the profile of the render, as
+    requested by the command line arguments.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+        stack (contextlib.ExitStack): The stack which stops them.
+
+    Returns:
+        tuple: The statistics and the profiler, or None for each of them
+            which is not started.
+    """
+    from src.profiling import profile
+    from src.stats import collect_stats
+    from src.tracing import trace
+
+    stats = profiler = None
+    if args.trace_file:
+        stack.enter_context(trace(args.trace_file))
+    if args.stats_json:
+        stats = stack.enter_context(collect_stats())
+    # The statistics include the time of every phase, so the run is
+    # profiled, but the memory is only traced for the reports
+    tracing_memory = bool(args.profile or args.profile_dump or args.memory_report)
+    if tracing_memory or args.stats_json:
+        profiler = stack.enter_context(
+            profile(trace_memory=tracing_memory, cprofile_file=args.profile_dump))
+    return stats, profiler
+
+
+def get_memory_budget(args):
+    """
+    Gets the memory budget of the render, as requested by the command line
+    arguments.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        contextlib.AbstractContextManager: The context keeping the render
+            within the --max-memory budget, or a null context without it.
+    """
+    from contextlib import nullcontext
+
+    from src.memory import MIB, get_memory_usage, memory_budget
+
+    if not args.max_memory:
+        return nullcontext()
+    if get_memory_usage() is None:
+        sys.exit("Error: --max-memory is not supported on this platform")
+    return memory_budget(args.max_memory * MIB)
+
+
+def render_input(args) -> int:
+    """
+    Renders the input file as requested by the command line arguments.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        int: The exit status: 0, or the --unchanged-status if the manifest
+            did not change.
+    """
+    from src.profiling import profile_phase
+
+    if args.multi_document:
+        from src.documents import render_documents
+        from src.rendering import load_schema
+
+        with profile_phase('schema'):
+            schema = load_schema(args.schema_file)
+        render_documents(args.input_file, schema, args.output_file, args.name_field)
+        return 0
+    result_cache = get_result_cache(args)
+    if result_cache is not None and copy_cached_result(args, *result_cache):
+        return 0
+    config, schema, dependencies = load_input(args)
+    script_files = render_output(args, config, schema)
+    with profile_phase('write'):
+        return write_outputs(args, config, script_files, dependencies, result_cache)
+
+
+def get_result_cache(args):
+    """
+    Open the render cache, if it's enabled. It's only used for plain renders
+    of a file to a single file.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        tuple: The render cache and the key of the input file, or None if
+            the render doesn't use the cache.
+    """
+    if not args.result_cache or args.shard or args.manifest or args.preflight:
+        return None
+    if args.output_file == 'stdout' or args.input_file == '-':
+        return None
+    from src.profiling import profile_phase
+    from src.result_cache import DEFAULT_MAX_SIZE, ResultCache, get_cache_key
+
+    with profile_phase('cache'):
+        max_size = DEFAULT_MAX_SIZE if args.result_cache_size is None \
+            else args.result_cache_size * 1024 * 1024
+        return ResultCache(args.result_cache, max_size), \
+            get_cache_key(args.input_file, args.schema_file)
+
+
+def copy_cached_result(args, result_cache, cache_key) -> bool:
+    """
+    Copy the cached script of the input file to the output file, if its
+    dependencies are unchanged, and write its dependency file.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+        result_cache (ResultCache): The render cache.
+        cache_key (str): The key of the input file.
+
+    Returns:
+        bool: True if the cached script was copied.
+    """
+    from src.profiling import profile_phase
+    from src.result_cache import resolve_dependency
+    from src.stats import count_cache, count_output_files
+
+    input_directory = os.path.dirname(os.path.abspath(args.input_file))
+    with profile_phase('cache'):
+        cached_entry = result_cache.lookup(cache_key, input_directory)
+        count_cache('result', cached_entry is not None)
+        if cached_entry is None or not result_cache.copy_result(cached_entry, args.output_file):
+            return False
+        count_output_files([args.output_file])
+        if args.depfile:
+            from src.dependencies import write_depfile
+
+            write_depfile(args.depfile, args.output_file, [
+                resolve_dependency(record, input_directory)
+                for record in cached_entry['dependencies']])
+    return True
+
+
+def load_input(args) -> tuple:
+    """
+    Loads the input file and the schema, validates the config and, if
+    requested, runs the preflight checks.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        tuple: The config, the schema, and the files read to load them.
+    """
+    from src.dependencies import record_dependencies
+    from src.profiling import profile_phase
+    from src.rendering import load_schema
+    from src.stats import count_sections
+    from src.templates import load_config
+    from src.validation import validate_config
+
+    with record_dependencies() as dependencies:
+        with profile_phase('load'):
+            if args.input_file == '-':
+                from src.documents import load_stdin_config
+
+                config = load_stdin_config(compact=True)
+            else:
+                config = load_config(args.input_file, compact=True)
+        with profile_phase('schema'):
+            schema = load_schema(args.schema_file)
+    with profile_phase('validate'):
+        validate_config(config, schema)
+    count_sections(config)
+    if args.preflight:
+        from src.preflight import format_preflight_report, run_preflight
+
+        with profile_phase('preflight'):
+            report = run_preflight(config)
+        print(format_preflight_report(report), file=sys.stderr)
+        if report['missing']:
+            sys.exit(1)
+    return config, schema, dependencies
+
+
+def render_output(args, config, schema) -> list:
+    """
+    Renders the config to the output: the standard output, a file, or a
+    file and its fragments. The sections are written as they are rendered.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+        config (dict): The config.
+        schema (Schema): The schema.
+
+    Returns:
+        list: The script files written.
+    """
+    from src.profiling import profile_phase
+    from src.rendering import open_output, render_to_stream
+    from src.stats import CountingWriter, count_output_files
+
+    script_files = [args.output_file]
+    with profile_phase('render'):
+        if args.output_file == 'stdout':
+            stdout = CountingWriter(sys.stdout)
+            render_to_stream(config, schema, stdout)
+            stdout.write("\n")
+        elif args.shard:
+            from src.sharding import get_fragment_path, render_sharded
+
+            render_sharded(config, schema, args.output_file)
+            script_files += [get_fragment_path(args.output_file, name) for name in config]
+        else:
+            with open_output(args.output_file) as f:
+                render_to_stream(config, schema, f)
+        if args.output_file != 'stdout':
+            count_output_files(script_files)
+    return script_files
+
+
+def write_outputs(args, config, script_files, dependencies, result_cache) -> int:
+    """
+    Writes what goes along with the rendered script: the manifest, the
+    dependency file and the entry of the render cache.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+        config (dict): The config.
+        script_files (list): The script files written.
+        dependencies (list): The files read to render the script.
+        result_cache (tuple): The render cache and the key of the input
+            file (see get_result_cache), or None.
+
+    Returns:
+        int: The exit status: 0, or the --unchanged-status if the manifest
+            did not change.
+    """
+    status = 0
+    if args.manifest:
+        from src.manifest import update_manifest
+
+        if update_manifest(config, args.output_file, script_files):
+            print("Manifest changed: the installer has to be compiled", file=sys.stderr)
+        else:
+            print("Manifest unchanged: the installer is up to date", file=sys.stderr)
+            status = args.unchanged_status or 0
+    if args.depfile:
+        from src.dependencies import write_depfile
+
+        input_files = [] if args.input_file == '-' else [args.input_file]
+        write_depfile(args.depfile, args.output_file, input_files + dependencies)
+    if result_cache is not None:
+        from src.result_cache import uses_glob_entries, uses_registry_templates
+
+        if not uses_glob_entries(config) and not uses_registry_templates(dependencies):
+            cache, cache_key = result_cache
+            cache.store(cache_key, args.output_file, [args.input_file] + dependencies,
+                        os.path.dirname(os.path.abspath(args.input_file)))
+    return status
 
 if __name__ == '__main__':
     main()